@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Decoded-PCM asset cache for the files under sound/.
+
+MP3 decoding is the slowest part of starting the sounds server. This module
+transcodes each file once into mono PCM at the audio interface's sample rate
+and stores it as a .npy file in sound/.cache/. A manifest records the
+SHA-256 of every source file, so a cached file is only rebuilt when its MP3
+changes. Loading an asset afterwards is a zero-copy memory map.
+
+Usage:
+    # Pre-build the cache for every file under sound/ (optional, load_asset() builds on demand)
+    uv run audioAssets.py
+    uv run audioAssets.py --rate 48000 --dtype int16
+
+    # From code
+    samples = load_asset("sound/2025/1_Speaker1.mp3", 44100)  # Read-only np.memmap
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import threading
+import time
+import numpy as np
+import soundfile as sf
+from resample import resample
+
+SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+SOUND_DIR = os.path.join(SERVER_DIR, "sound")
+CACHE_DIR = os.path.join(SOUND_DIR, ".cache")
+MANIFEST_PATH = os.path.join(CACHE_DIR, "manifest.json")
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.flac', '.ogg')
+DEFAULT_SAMPLE_RATE = 44100  # Rate the house's sound files and the UMC1820 run at
+INT16_SCALE = 1.0 / 32768  # Multiply int16 PCM by this to get float samples
+CACHE_VERSION = 2  # Bump when decoding/resampling changes so every cached file is rebuilt
+
+_manifest = None  # Loaded lazily, shared by all threads
+_manifest_lock = threading.Lock()
+
+
+def file_hash(path):
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def decode_mono(path, sample_rate):
+    """
+    Decode an audio file to mono float32 samples at sample_rate.
+    This is the slow path that the cache exists to avoid.
+    """
+    data, source_rate = sf.read(path, dtype='float32')
+
+    # Handle stereo/mono - mix to mono
+    if len(data.shape) == 2:  # Stereo
+        samples = data.mean(axis=1)
+    else:  # Mono
+        samples = data
+
+    # Resample to the interface rate if needed (once per file and rate, the result is cached)
+    if source_rate != sample_rate:
+        samples = resample(samples, source_rate, sample_rate)
+
+    return samples
+
+
+def _load_manifest():
+    global _manifest
+    if _manifest is None:
+        try:
+            with open(MANIFEST_PATH) as f:
+                _manifest = json.load(f)
+        except (OSError, ValueError):
+            _manifest = {}
+    return _manifest
+
+
+def _save_manifest():
+    # Write to a temp file and rename so a crash never leaves a half-written manifest
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = f"{MANIFEST_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(_manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+
+def _cache_key(path, sample_rate, dtype):
+    return f"{os.path.relpath(os.path.abspath(path), SOUND_DIR)}@{sample_rate}/{dtype}"
+
+
+def _npy_name(path, sample_rate, dtype):
+    relative = os.path.relpath(os.path.abspath(path), SOUND_DIR).replace(os.sep, '__')
+    return f"{relative}.{sample_rate}.{dtype}.npy"
+
+
+def _is_fresh(entry, path, stat):
+    """Check a manifest entry against the source file, hashing only if size/mtime changed."""
+    if entry is None or entry.get('version') != CACHE_VERSION:
+        return False
+    if not os.path.exists(os.path.join(CACHE_DIR, entry['npy'])):
+        return False
+    if entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+        return True
+    if entry['size'] == stat.st_size and entry['sha256'] == file_hash(path):
+        entry['mtime_ns'] = stat.st_mtime_ns  # Touched but unchanged
+        return True
+    return False
+
+
+def transcode(path, sample_rate, dtype='float32'):
+    """
+    Decode path into the cache and record it in the manifest.
+
+    Returns:
+        Path of the written .npy file
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    stat = os.stat(path)
+    sha256 = file_hash(path)
+    samples = decode_mono(path, sample_rate)
+    if dtype == 'int16':
+        samples = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+
+    key = _cache_key(path, sample_rate, dtype)
+    npy_name = _npy_name(path, sample_rate, dtype)
+    npy_path = os.path.join(CACHE_DIR, npy_name)
+    tmp_path = f"{npy_path}.{os.getpid()}.{threading.get_ident()}.tmp.npy"
+    np.save(tmp_path, samples)
+    os.replace(tmp_path, npy_path)
+
+    with _manifest_lock:
+        _load_manifest()[key] = {
+            'npy': npy_name,
+            'version': CACHE_VERSION,
+            'sha256': sha256,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sample_rate': sample_rate,
+            'dtype': dtype,
+            'frames': len(samples),
+        }
+        _save_manifest()
+    return npy_path
+
+
+def source_hash(path):
+    """
+    SHA-256 of a source file. Taken from the cache manifest when some cached rendition
+    was made from a file of the same size and mtime, so checking a file usually costs a stat.
+    """
+    stat = os.stat(path)
+    prefix = os.path.relpath(os.path.abspath(path), SOUND_DIR) + "@"
+    with _manifest_lock:
+        for key, entry in _load_manifest().items():
+            if key.startswith(prefix) and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+                return entry['sha256']
+    return file_hash(path)
+
+
+def is_cached(path, sample_rate, dtype='float32'):
+    """Return True if load_asset() would memory-map without decoding."""
+    stat = os.stat(path)
+    with _manifest_lock:
+        return _is_fresh(_load_manifest().get(_cache_key(path, sample_rate, dtype)), path, stat)
+
+
+def load_asset(path, sample_rate, dtype='float32'):
+    """
+    Return the mono PCM for an audio file at sample_rate as a read-only memory map.
+    Transcodes into the cache first if the file is new or its contents changed.
+
+    Args:
+        path: Audio file path (e.g. "sound/2025/1_Speaker1.mp3")
+        sample_rate: Output sample rate, normally the audio interface's rate
+        dtype: 'float32' or 'int16' (int16 halves the cache size; scale by INT16_SCALE)
+    """
+    key = _cache_key(path, sample_rate, dtype)
+    stat = os.stat(path)
+    with _manifest_lock:
+        entry = _load_manifest().get(key)
+        fresh = _is_fresh(entry, path, stat)
+
+    npy_path = os.path.join(CACHE_DIR, entry['npy']) if fresh else transcode(path, sample_rate, dtype)
+    return np.load(npy_path, mmap_mode='r')
+
+
+def page_in(samples, frames=None):
+    """
+    Read one sample per memory page so the start of a memory-mapped asset is resident
+    before it plays, instead of page-faulting inside the audio callback.
+
+    Args:
+        samples: Array from load_asset()
+        frames: How many frames from the start to page in (all of them if None)
+
+    Returns:
+        Number of pages touched
+    """
+    stride = max(1, mmap.PAGESIZE // samples.itemsize)
+    head = samples[:frames]
+    float(head[::stride].sum())  # Reading the samples is what faults the pages in
+    return (len(head) + stride - 1) // stride
+
+
+def find_audio_files(sound_dir=SOUND_DIR):
+    """Return every audio file under sound_dir (skipping the cache itself)."""
+    files = []
+    for root, dirs, names in os.walk(sound_dir):
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        for name in sorted(names):
+            if name.lower().endswith(AUDIO_EXTENSIONS):
+                files.append(os.path.join(root, name))
+    return sorted(files)
+
+
+def build_cache(sample_rate, dtype='float32', sound_dir=SOUND_DIR):
+    """Make sure every file under sound_dir is cached, printing what was (re)built."""
+    built = 0
+    start = time.perf_counter()
+    for path in find_audio_files(sound_dir):
+        file_start = time.perf_counter()
+        key = _cache_key(path, sample_rate, dtype)
+        with _manifest_lock:
+            fresh = _is_fresh(_load_manifest().get(key), path, os.stat(path))
+        if fresh:
+            print(f"  cached   {os.path.relpath(path, SERVER_DIR)}")
+            continue
+        transcode(path, sample_rate, dtype)
+        built += 1
+        print(f"  built    {os.path.relpath(path, SERVER_DIR)} ({(time.perf_counter() - file_start) * 1000:.0f} ms)")
+
+    with _manifest_lock:
+        _save_manifest()  # Persist any refreshed mtimes
+    print(f"\n{built} file(s) transcoded in {time.perf_counter() - start:.2f}s, cache: {CACHE_DIR}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pre-build the decoded PCM cache for the files under sound/.')
+    parser.add_argument('--rate', '-r', type=int, default=DEFAULT_SAMPLE_RATE,
+                        help=f'Sample rate to cache at (default: {DEFAULT_SAMPLE_RATE})')
+    parser.add_argument('--dtype', choices=['float32', 'int16'], default='float32', help='Sample format (default: float32)')
+    args = parser.parse_args()
+
+    print(f"Building audio cache at {args.rate} Hz ({args.dtype})...")
+    build_cache(args.rate, args.dtype)
+
+
+if __name__ == "__main__":
+    main()
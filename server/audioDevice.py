@@ -0,0 +1,140 @@
+"""
+Resolve an audio output device once and re-resolve only on failure.
+
+sd.query_devices() enumerates every host audio device, which is too slow to
+do on every trigger. DeviceResolver scans once at startup and caches the
+device index, output channel count and a supported sample rate. Callers
+ask for a rescan only when playback fails (e.g. after the UMC1820 was
+unplugged and plugged back in), and every rescan is timed.
+
+Usage:
+    resolver = DeviceResolver("UMC1820", samplerate=44100)
+    device = resolver.resolve()  # Cached after the first call
+    sd.OutputStream(device=device.index, channels=device.channels, samplerate=device.samplerate)
+
+    # Playback raised an error
+    device = resolver.rescan()
+    print(f"Rescan took {resolver.last_rescan_ms:.1f} ms")
+"""
+
+import time
+import sounddevice as sd
+
+
+def reinitialize_portaudio():
+    """
+    Restart PortAudio so that its device list is enumerated again.
+
+    PortAudio only enumerates devices in Pa_Initialize(), and sounddevice has no public
+    API to re-run it: sd._terminate() and sd._initialize() are the calls its maintainers
+    point to for picking up hot-plugged devices (present in sounddevice 0.3 through 0.5).
+    They are private, so a later sounddevice may rename or drop them. In that case this
+    does nothing and returns False: the rescan still finds devices that were there at
+    startup, but one plugged in later only shows up after a restart.
+
+    Returns:
+        True if PortAudio was re-initialized
+    """
+    terminate = getattr(sd, "_terminate", None)
+    initialize = getattr(sd, "_initialize", None)
+    if not (callable(terminate) and callable(initialize)):
+        return False
+    terminate()
+    initialize()
+    return True
+
+
+class DeviceInfo:
+    """Cached facts about a resolved output device."""
+
+    def __init__(self, index, name, channels, samplerate):
+        self.index = index  # Device index for sounddevice (None = system default)
+        self.name = name
+        self.channels = channels  # Max output channels
+        self.samplerate = samplerate  # A sample rate the device accepts
+
+    def __repr__(self):
+        return f"DeviceInfo(index={self.index}, name={self.name!r}, channels={self.channels}, samplerate={self.samplerate})"
+
+
+class DeviceResolver:
+    """Caches the output device lookup and rescans only when asked to."""
+
+    def __init__(self, device=None, samplerate=None):
+        """
+        Args:
+            device: Device name (partial match), index, or None for the default output device
+            samplerate: Preferred sample rate; falls back to the device's default if unsupported
+        """
+        self.device = device
+        self.preferred_samplerate = samplerate
+        self.info = None
+        self.rescan_count = 0
+        self.last_rescan_ms = None
+        self.rescan_times_ms = []  # Duration of every scan, for reporting
+        self.hotplug = True  # False once a rescan couldn't re-initialize PortAudio (see reinitialize_portaudio)
+
+    def resolve(self):
+        """Return the cached DeviceInfo, scanning only if nothing is cached yet."""
+        if self.info is None:
+            return self.rescan()
+        return self.info
+
+    def invalidate(self):
+        """Forget the cached device so the next resolve() rescans."""
+        self.info = None
+
+    def rescan(self):
+        """
+        Enumerate host devices and refresh the cache.
+
+        After the first scan, PortAudio is re-initialized (if this sounddevice version
+        allows it, see reinitialize_portaudio) so that devices that were unplugged or
+        re-plugged show up; close any open streams before calling this.
+
+        Returns:
+            DeviceInfo, or None if the device could not be found
+        """
+        start = time.perf_counter()
+        try:
+            if self.rescan_count > 0:
+                self.hotplug = reinitialize_portaudio()
+            self.info = self._scan()
+        finally:
+            self.last_rescan_ms = (time.perf_counter() - start) * 1000
+            self.rescan_times_ms.append(self.last_rescan_ms)
+            self.rescan_count += 1
+        return self.info
+
+    def _scan(self):
+        if self.device is None:
+            device_info = sd.query_devices(kind='output')
+            index = None
+        elif isinstance(self.device, int):
+            try:
+                device_info = sd.query_devices(self.device)
+            except (sd.PortAudioError, ValueError):
+                return None
+            index = self.device
+        else:
+            index = None
+            for idx, candidate in enumerate(sd.query_devices()):
+                if self.device.lower() in candidate['name'].lower():
+                    index, device_info = idx, candidate
+                    break
+            if index is None:
+                return None
+
+        channels = device_info['max_output_channels']
+        return DeviceInfo(index, device_info['name'], channels,
+                          self._pick_samplerate(index, channels, device_info['default_samplerate']))
+
+    def _pick_samplerate(self, index, channels, default_samplerate):
+        """Use the preferred sample rate if the device accepts it, otherwise its default."""
+        if self.preferred_samplerate is None:
+            return int(default_samplerate)
+        try:
+            sd.check_output_settings(device=index, channels=channels, samplerate=self.preferred_samplerate)
+            return self.preferred_samplerate
+        except Exception:
+            return int(default_samplerate)
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+One-time loudness analysis and gain manifest for the files under sound/.
+
+Measures the peak and a gated RMS loudness of every asset (using the decoded
+PCM cache, so nothing is decoded twice) and writes sound/gains.json with the
+gain that brings each file to a common target loudness without pushing its
+peak past the ceiling. The players read the manifest and apply the gain as a
+mixer voice gain, so loudness is never computed at trigger time.
+
+Multi-speaker scenes (sound/2025/<scene>_Speaker<n>.mp3) also get one shared
+scene gain, computed from all speakers together, so the balance between
+speakers within a scene is kept while scenes match each other.
+
+Usage:
+    uv run audioGains.py                  # Analyze every file, write sound/gains.json
+    uv run audioGains.py --target -18     # Different target loudness (dBFS)
+
+The manifest stores each file's SHA-256, which is checked the first time a
+file's gain is read. A file that changed since the analysis gets no stale
+gain: file_gain() returns None (the caller peak-matches, as for a file that
+was never analyzed) and scene_gain() peak-matches the file on its own.
+stale_files() lists them; re-run the analysis after changing a sound.
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+import numpy as np
+from audioAssets import DEFAULT_SAMPLE_RATE, SOUND_DIR, file_hash, find_audio_files, load_asset, source_hash
+
+GAINS_PATH = os.path.join(SOUND_DIR, "gains.json")
+TARGET_LOUDNESS_DBFS = -20.0  # Gated RMS every file is brought to
+PEAK_CEILING = 0.9  # Never let a gain push the peak above this
+BLOCK_SECONDS = 0.4  # Loudness measurement block
+ABSOLUTE_GATE_DBFS = -70.0  # Blocks quieter than this are silence
+RELATIVE_GATE_DB = -10.0  # Blocks this far below the ungated loudness are ignored
+SCENE_FILE_PATTERN = re.compile(r'^(\d+)_Speaker\d+\.')
+
+_gains = None  # Manifest contents, loaded lazily
+_checked = {}  # Manifest key -> True if the file still matches its analyzed SHA-256 (checked once per process)
+
+
+def _db(power):
+    return 10 * np.log10(max(power, 1e-20))
+
+
+def measure(samples, sample_rate):
+    """
+    Measure a mono buffer.
+
+    Returns:
+        (gated RMS loudness in dBFS, peak, list of gated block powers)
+    """
+    block = int(BLOCK_SECONDS * sample_rate)
+    frames = len(samples) // block * block
+    if frames == 0:
+        power = float(np.mean(np.square(samples, dtype=np.float64))) if len(samples) else 0.0
+        return _db(power), float(np.abs(samples).max()) if len(samples) else 0.0, [power]
+
+    powers = np.mean(np.square(np.asarray(samples[:frames], dtype=np.float64)).reshape(-1, block), axis=1)
+    powers = powers[powers > 10 ** (ABSOLUTE_GATE_DBFS / 10)]
+    if len(powers):
+        relative_gate = np.mean(powers) * 10 ** (RELATIVE_GATE_DB / 10)
+        powers = powers[powers >= relative_gate]
+    loudness = _db(np.mean(powers)) if len(powers) else ABSOLUTE_GATE_DBFS
+    return loudness, float(np.abs(samples).max()), list(powers)
+
+
+def gain_for(loudness_dbfs, peak, target_dbfs=TARGET_LOUDNESS_DBFS, ceiling=PEAK_CEILING):
+    """Gain that moves loudness to the target, limited so the peak stays under the ceiling."""
+    gain = 10 ** ((target_dbfs - loudness_dbfs) / 20)
+    if peak > 0:
+        gain = min(gain, ceiling / peak)
+    return float(gain)
+
+
+def analyze(sample_rate=DEFAULT_SAMPLE_RATE, target_dbfs=TARGET_LOUDNESS_DBFS, ceiling=PEAK_CEILING):
+    """Analyze every file under sound/ and write the manifest."""
+    files = {}
+    scenes = {}  # Scene key -> {'powers': [...], 'peak': max peak}
+
+    for path in find_audio_files():
+        start = time.perf_counter()
+        key = os.path.relpath(path, SOUND_DIR)
+        samples = load_asset(path, sample_rate)
+        loudness, peak, powers = measure(samples, sample_rate)
+        files[key] = {
+            'sha256': file_hash(path),
+            'loudness_dbfs': round(loudness, 2),
+            'peak': round(peak, 4),
+            'gain': round(gain_for(loudness, peak, target_dbfs, ceiling), 4),
+        }
+
+        match = SCENE_FILE_PATTERN.match(os.path.basename(path))
+        if match:
+            scene_key = os.path.join(os.path.dirname(key), match.group(1))
+            files[key]['scene'] = scene_key
+            scene = scenes.setdefault(scene_key, {'powers': [], 'peak': 0.0})
+            scene['powers'].extend(powers)
+            scene['peak'] = max(scene['peak'], peak)
+
+        print(f"  {key:<60} {loudness:6.1f} dBFS  peak {peak:.3f}  gain {files[key]['gain']:.2f}x"
+              f"  ({(time.perf_counter() - start) * 1000:.0f} ms)")
+
+    scene_entries = {}
+    for scene_key, scene in sorted(scenes.items()):
+        loudness = _db(np.mean(scene['powers'])) if scene['powers'] else ABSOLUTE_GATE_DBFS
+        scene_entries[scene_key] = {
+            'loudness_dbfs': round(loudness, 2),
+            'peak': round(scene['peak'], 4),
+            'gain': round(gain_for(loudness, scene['peak'], target_dbfs, ceiling), 4),
+        }
+        print(f"  scene {scene_key:<54} {loudness:6.1f} dBFS  peak {scene['peak']:.3f}"
+              f"  gain {scene_entries[scene_key]['gain']:.2f}x")
+
+    manifest = {
+        'target_loudness_dbfs': target_dbfs,
+        'peak_ceiling': ceiling,
+        'files': files,
+        'scenes': scene_entries,
+    }
+    with open(GAINS_PATH, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write('\n')
+    return manifest
+
+
+def load_gains():
+    """Return the gain manifest (empty if the analysis has never been run)."""
+    global _gains
+    if _gains is None:
+        try:
+            with open(GAINS_PATH) as f:
+                _gains = json.load(f)
+        except (OSError, ValueError):
+            _gains = {'files': {}, 'scenes': {}}
+    return _gains
+
+
+def _entry(path):
+    """Manifest entry of a file, or None if it was never analyzed or has changed since."""
+    key = os.path.relpath(os.path.abspath(path), SOUND_DIR)
+    entry = load_gains()['files'].get(key)
+    if entry is None:
+        return None
+    if key not in _checked:
+        _checked[key] = os.path.exists(path) and source_hash(path) == entry.get('sha256')
+    return entry if _checked[key] else None
+
+
+def stale_files():
+    """Files whose gain was asked for but that changed since the analysis (re-run audioGains.py)."""
+    return sorted(key for key, fresh in _checked.items() if not fresh)
+
+
+def peak_gain(samples, ceiling=PEAK_CEILING):
+    """Fallback gain that brings a buffer's peak to the ceiling."""
+    peak = float(np.abs(samples).max()) if len(samples) else 0.0
+    return ceiling / peak if peak > 0 else 1.0
+
+
+def file_gain(path):
+    """
+    Gain for a single file, or None if it is not in the manifest or changed since the analysis.
+    Use this when a file plays on its own.
+    """
+    entry = _entry(path)
+    return entry['gain'] if entry else None
+
+
+def scene_gain(path, samples=None):
+    """
+    Gain for a file that plays as part of a multi-speaker scene (the shared scene gain),
+    falling back to its own gain, or 1.0 if it is not in the manifest.
+
+    Args:
+        path: Audio file
+        samples: The file's decoded samples; if the file changed since the analysis its
+            recorded gains no longer apply and it is peak-matched from these instead
+    """
+    key = os.path.relpath(os.path.abspath(path), SOUND_DIR)
+    entry = _entry(path)
+    if entry is None:
+        stale = key in load_gains()['files']
+        return peak_gain(samples) if stale and samples is not None else 1.0
+    scene = load_gains()['scenes'].get(entry.get('scene'))
+    return scene['gain'] if scene else entry['gain']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Analyze loudness of every file under sound/ and write sound/gains.json.')
+    parser.add_argument('--target', '-t', type=float, default=TARGET_LOUDNESS_DBFS,
+                        help=f'Target gated RMS loudness in dBFS (default: {TARGET_LOUDNESS_DBFS})')
+    parser.add_argument('--ceiling', type=float, default=PEAK_CEILING,
+                        help=f'Maximum peak after gain (default: {PEAK_CEILING})')
+    parser.add_argument('--rate', '-r', type=int, default=DEFAULT_SAMPLE_RATE,
+                        help=f'Sample rate of the cached PCM to analyze (default: {DEFAULT_SAMPLE_RATE})')
+    args = parser.parse_args()
+
+    print(f"Analyzing loudness (target {args.target} dBFS, peak ceiling {args.ceiling})...\n")
+    manifest = analyze(args.rate, args.target, args.ceiling)
+    print(f"\nWrote gains for {len(manifest['files'])} file(s) and {len(manifest['scenes'])} scene(s) to {GAINS_PATH}")
+
+
+if __name__ == "__main__":
+    main()
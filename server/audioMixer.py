@@ -0,0 +1,278 @@
+"""
+Persistent multichannel mixer for the UMC1820 audio interface.
+
+Instead of calling sd.stop()/sd.play() for every scene (which reopens the
+PortAudio stream each time and hard-cuts whatever was playing), one
+sounddevice.OutputStream stays open for the life of the server and a mixer
+callback sums the active voices into each output block.
+
+Usage:
+    mixer = Mixer(device_idx, samplerate=44100, channels=18)
+    mixer.start()
+    voice = mixer.play(samples, 3)  # Replaces whatever was on channel 3
+    mixer.play(samples, [1, 7])  # One buffer, two speakers
+    mixer.play(samples, {2: 1.0, 4: 0.5}, gain=0.8)  # Per-channel and overall gain
+    mixer.stop_channel(3)
+    mixer.close()
+
+Each voice is a mono buffer stored once plus a sparse row of the routing/gain
+matrix; it is only rendered into the device's interleaved block inside the
+callback, so no (frames x channels) buffers are ever allocated.
+
+All public methods are thread-safe. Starting a voice only appends it to the
+active list; the audio callback never blocks on the lock.
+"""
+
+import threading
+import time
+import numpy as np
+import sounddevice as sd
+
+DEFAULT_BLOCKSIZE = 512  # Frames per callback (~11.6 ms at 44.1 kHz)
+INT16_SCALE = 1.0 / 32768  # int16 PCM from the asset cache is scaled to float in the callback
+
+
+def make_routes(channels, max_channels):
+    """
+    Turn a channel spec into a voice's sparse routing row.
+
+    Args:
+        channels: 1-indexed output channel, a list of channels, or a {channel: gain} dict
+        max_channels: Number of channels on the device, for validation
+
+    Returns:
+        Tuple of (0-indexed channel, gain) pairs
+    """
+    if isinstance(channels, int):
+        channels = {channels: 1.0}
+    elif not isinstance(channels, dict):
+        channels = {channel: 1.0 for channel in channels}
+    for channel in channels:
+        if channel < 1 or channel > max_channels:
+            raise ValueError(f"Channel {channel} out of range (1-{max_channels})")
+    return tuple((channel - 1, float(route_gain)) for channel, route_gain in channels.items())
+
+
+class Voice:
+    """
+    A mono buffer routed to one or more output channels.
+
+    The buffer is stored once; its row of the routing/gain matrix is kept sparse as
+    (channel index, gain) pairs and applied per block inside the audio callback.
+    """
+
+    def __init__(self, samples, routes, gain=1.0):
+        self.samples = samples  # 1-D float32 (or int16) array at the mixer's sample rate, may be a memmap
+        self.routes = routes  # Tuple of (0-indexed channel, gain); replaced as a whole, never mutated
+        self.gain = gain  # Voice gain, multiplied into every route
+        self.position = 0  # Next frame to play, only advanced by the audio callback
+        self.done = False  # Set when the voice finishes or is stopped
+        self.replaceable = True  # False for beds that scenes play over rather than replace
+        self.first_output_ns = None  # time.monotonic_ns() at which the first sample reaches the DAC
+
+    def next_block(self, frames):
+        """
+        Return up to `frames` samples to play next (called from the audio callback).
+
+        Returns:
+            1-D array (possibly shorter than frames), or None if nothing is left
+        """
+        start = self.position
+        n = min(frames, len(self.samples) - start)
+        self.position = start + max(n, 0)
+        if self.position >= len(self.samples):
+            self.done = True
+        return self.samples[start:start + n] if n > 0 else None
+
+    @property
+    def channels(self):
+        """1-indexed output channels this voice is currently routed to."""
+        return [idx + 1 for idx, _ in self.routes]
+
+
+class Mixer:
+    """Long-lived OutputStream that mixes voices on individual channels."""
+
+    def __init__(self, device, samplerate, channels, blocksize=DEFAULT_BLOCKSIZE):
+        """
+        Args:
+            device: Device index or name passed to sounddevice
+            samplerate: Stream sample rate; every voice must already be at this rate
+            channels: Number of output channels to open on the device
+            blocksize: Frames per callback
+        """
+        self.device = device
+        self.samplerate = samplerate
+        self.channels = channels
+        self.blocksize = blocksize
+        self.stream = None
+        self._lock = threading.Lock()
+        self._voices = []  # Copy-on-write: replaced (never mutated) under _lock
+        self._scratch = np.zeros(blocksize, dtype=np.float32)  # Per-block gain product, reused by the callback
+
+    def start(self):
+        """Open the output stream and start the mixer callback."""
+        self.stream = sd.OutputStream(
+            device=self.device,
+            samplerate=self.samplerate,
+            channels=self.channels,
+            blocksize=self.blocksize,
+            dtype='float32',
+            callback=self._callback,
+        )
+        self.stream.start()
+
+    @property
+    def is_active(self):
+        """True while the output stream is open and running (False after e.g. a USB unplug)."""
+        return self.stream is not None and self.stream.active
+
+    def close(self):
+        """Stop all voices and close the output stream."""
+        self.stop_all()
+        if self.stream is not None:
+            stream, self.stream = self.stream, None
+            try:
+                stream.abort()
+                stream.close()
+            except sd.PortAudioError:
+                pass  # The device may already be gone
+
+    def play(self, samples, channels, gain=1.0, replace=True):
+        """
+        Start a voice on one or more channels.
+
+        Args:
+            samples: 1-D float32 or int16 array at the mixer's sample rate
+            channels: 1-indexed output channel, a list of channels, or a {channel: gain} dict
+            gain: Overall voice gain (applied at mix time, the samples are never copied)
+            replace: If True, stop whatever is already playing on those channels
+
+        Returns:
+            The new Voice (pass it to stop_voice() to stop just this voice)
+        """
+        return self.play_together([(samples, channels, gain)], replace)[0]
+
+    def play_together(self, entries, replace=True):
+        """
+        Start several voices so that they begin in the same audio block.
+
+        Args:
+            entries: List of (samples, channels, gain) tuples, as for play()
+            replace: If True, stop whatever is already playing on those channels
+
+        Returns:
+            List of the new Voices, in the same order as entries
+        """
+        voices = [Voice(samples, make_routes(channels, self.channels), gain) for samples, channels, gain in entries]
+        return self.add_voices(voices, replace)
+
+    def add_voices(self, voices, replace=True):
+        """
+        Start already-built voices (e.g. a StreamingVoice) in the same audio block.
+
+        Args:
+            voices: List of Voice objects
+            replace: If True, stop whatever replaceable voices are already playing on their channels
+
+        Returns:
+            voices
+        """
+        with self._lock:
+            if replace:
+                self._unroute({idx + 1 for voice in voices for idx, _ in voice.routes})
+            self._voices = [v for v in self._voices if not v.done] + list(voices)
+        return voices
+
+    def set_gain(self, voice, gain):
+        """Change a voice's gain; takes effect from the next audio block."""
+        voice.gain = gain
+
+    def stop_voice(self, voice):
+        """Stop a single voice on every channel it plays on."""
+        with self._lock:
+            voice.done = True
+            self._voices = [v for v in self._voices if v is not voice]
+
+    def stop_channel(self, channel):
+        """Stop whatever is playing on a channel (beds included); voices routed elsewhere too keep playing there."""
+        with self._lock:
+            self._unroute({channel}, include_beds=True)
+            self._voices = [v for v in self._voices if not v.done]
+
+    def stop_all(self):
+        """Stop every voice."""
+        with self._lock:
+            for active in self._voices:
+                active.done = True
+            self._voices = []
+
+    def active_voices(self):
+        """Return the voices that are still playing."""
+        return [v for v in self._voices if not v.done]
+
+    def is_channel_busy(self, channel):
+        """Return True if any voice is still playing on the channel."""
+        return any(channel in v.channels for v in self.active_voices())
+
+    def wait_until_idle(self, poll_seconds=0.05):
+        """Block until every voice has finished."""
+        while self.active_voices():
+            time.sleep(poll_seconds)
+
+    def _unroute(self, channels, include_beds=False):
+        """Drop routes to the given 1-indexed channels; voices left with no routes are stopped. Call under _lock."""
+        for active in self._voices:
+            if not (active.replaceable or include_beds):
+                continue
+            if not any(idx + 1 in channels for idx, _ in active.routes):
+                continue
+            routes = tuple(route for route in active.routes if route[0] + 1 not in channels)
+            if routes:
+                active.routes = routes
+            else:
+                active.done = True
+
+    def _dac_time_ns(self, time_info):
+        """Monotonic time at which the current output block will reach the DAC."""
+        now_ns = time.monotonic_ns()
+        ahead = time_info.outputBufferDacTime - time_info.currentTime
+        if not 0 < ahead < 1:
+            # Some host APIs don't report DAC times; fall back to the stream's output latency
+            ahead = self.stream.latency if self.stream is not None else 0
+        return now_ns + int(ahead * 1e9)
+
+    def _callback(self, outdata, frames, time_info, status):
+        """sounddevice callback: sum active voices into the output block."""
+        outdata.fill(0)
+        finished = False
+        dac_ns = None  # Computed once per block, only if a voice starts in it
+
+        # Reading the list reference is atomic; mutators swap in a new list
+        for voice in self._voices:
+            if voice.done:
+                finished = True
+                continue
+            block = voice.next_block(frames)
+            if block is not None:
+                if voice.first_output_ns is None:
+                    if dac_ns is None:
+                        dac_ns = self._dac_time_ns(time_info)
+                    voice.first_output_ns = dac_ns
+                n = len(block)
+                scale = voice.gain * INT16_SCALE if block.dtype == np.int16 else voice.gain
+                if len(self._scratch) < n:
+                    self._scratch = np.zeros(n, dtype=np.float32)
+                scratch = self._scratch[:n]
+                for channel_idx, route_gain in voice.routes:
+                    np.multiply(block, scale * route_gain, out=scratch, casting='unsafe')
+                    outdata[:n, channel_idx] += scratch
+            if voice.done:
+                finished = True
+
+        # Prune finished voices, but never wait on the lock from the audio thread
+        if finished and self._lock.acquire(blocking=False):
+            try:
+                self._voices = [v for v in self._voices if not v.done]
+            finally:
+                self._lock.release()
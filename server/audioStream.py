@@ -0,0 +1,133 @@
+"""
+Streaming voices for long ambient beds.
+
+A StreamingVoice decodes its file in fixed-size blocks on a background
+thread into a fixed-size ring buffer, so memory use is the same no matter
+how long the track is. It can loop seamlessly (the resampler keeps its
+history across the wrap, so there is no click at the loop point) and it is
+not replaceable, so triggered scenes play over it instead of cutting it.
+
+Usage:
+    bed = StreamingVoice("sound/rain-and-thunderstorm-sounds-378432.mp3",
+                         make_routes([1, 2, 3], mixer.channels), mixer.samplerate, gain=0.2)
+    bed.start()  # Starts decoding and waits for the buffer to prefill
+    mixer.add_voices([bed], replace=False)
+    ...
+    mixer.stop_voice(bed)  # The decode thread exits on its own
+"""
+
+import os
+import threading
+import time
+import numpy as np
+import soundfile as sf
+from audioMixer import Voice
+from resample import PolyphaseResampler
+
+STREAM_BUFFER_SECONDS = 2.0  # Ring buffer size
+STREAM_PREFILL_SECONDS = 0.5  # Decoded audio to have ready before the voice starts playing
+DECODE_BLOCK_FRAMES = 8192  # Source frames decoded per read
+
+
+class StreamingVoice(Voice):
+    """A voice that decodes its file on a background thread instead of holding it in memory."""
+
+    def __init__(self, path, routes, samplerate, gain=1.0, loop=True,
+                 buffer_seconds=STREAM_BUFFER_SECONDS, block_frames=DECODE_BLOCK_FRAMES):
+        """
+        Args:
+            path: Audio file to stream
+            routes: Sparse routing row, see audioMixer.make_routes()
+            samplerate: The mixer's sample rate (the file is resampled on the fly if it differs)
+            gain: Voice gain
+            loop: Loop forever (True) or finish at the end of the file (False)
+            buffer_seconds: Ring buffer length
+            block_frames: Source frames decoded per read
+        """
+        super().__init__(None, routes, gain)
+        self.replaceable = False
+        self.path = path
+        self.samplerate = samplerate
+        self.loop = loop
+        self.block_frames = block_frames
+        self.underruns = 0  # Callbacks that found the ring buffer short of samples
+        self.loops = 0  # Times the file wrapped around
+        self.error = None  # Exception that stopped the decode thread, if any
+
+        self._ring = np.zeros(int(buffer_seconds * samplerate), dtype=np.float32)
+        self._read = 0  # Absolute frames consumed (only the audio callback advances this)
+        self._write = 0  # Absolute frames decoded (only the decode thread advances this)
+        self._eof = False
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._decode_loop, daemon=True,
+                                        name=f"stream-{os.path.basename(path)}")
+
+    def start(self, prefill_seconds=STREAM_PREFILL_SECONDS):
+        """Start the decode thread and wait until the buffer holds prefill_seconds of audio."""
+        self._prefill = int(min(prefill_seconds * self.samplerate, len(self._ring) // 2))
+        self._thread.start()
+        self._ready.wait()
+        if self.error is not None:
+            raise self.error
+        return self
+
+    def next_block(self, frames):
+        """Return up to `frames` decoded samples (called from the audio callback, never blocks)."""
+        available = self._write - self._read
+        n = min(frames, available)
+        if n < frames and not self._eof:
+            self.underruns += 1
+        if n <= 0:
+            if self._eof:
+                self.done = True
+            return None
+
+        start = self._read % len(self._ring)
+        end = start + n
+        if end <= len(self._ring):
+            block = self._ring[start:end]
+        else:
+            block = np.concatenate((self._ring[start:], self._ring[:end - len(self._ring)]))
+        self._read += n
+        return block
+
+    def _push(self, samples):
+        """Copy decoded samples into the ring (caller made sure there is space)."""
+        capacity = len(self._ring)
+        start = self._write % capacity
+        first = min(len(samples), capacity - start)
+        self._ring[start:start + first] = samples[:first]
+        self._ring[:len(samples) - first] = samples[first:]
+        self._write += len(samples)
+        if self._write >= self._prefill:
+            self._ready.set()
+
+    def _decode_loop(self):
+        try:
+            with sf.SoundFile(self.path) as f:
+                resampler = PolyphaseResampler(f.samplerate, self.samplerate)
+                # Worst-case output frames for one decoded block
+                max_out = resampler.output_length(self.block_frames) + resampler.taps
+                idle_seconds = len(self._ring) / self.samplerate / 4
+
+                while not self.done:
+                    if len(self._ring) - (self._write - self._read) < max_out:
+                        time.sleep(idle_seconds)  # Buffer is full, let the callback drain it
+                        continue
+
+                    data = f.read(self.block_frames, dtype='float32', always_2d=True)
+                    if len(data) == 0:
+                        if self.loop and f.frames > 0:
+                            # Keep the resampler's history so the wrap is seamless
+                            f.seek(0)
+                            self.loops += 1
+                            continue
+                        self._push(resampler.flush())
+                        break
+
+                    self._push(resampler.process(data.mean(axis=1)))
+        except Exception as e:
+            self.error = e
+        finally:
+            self._eof = True
+            self._ready.set()
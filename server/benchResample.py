@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Benchmark the polyphase resampler against the old np.interp path.
+
+For every file under sound/ whose sample rate differs from the target rate,
+this decodes the file once and then resamples it both ways, reporting wall
+time and peak Python-heap memory (numpy allocations are tracked by
+tracemalloc). It also measures aliasing with a test tone just above the
+target Nyquist frequency, which a correct resampler should remove.
+
+Usage:
+    uv run benchResample.py
+    uv run benchResample.py --rate 48000 --repeat 5
+"""
+
+import argparse
+import time
+import tracemalloc
+import numpy as np
+import soundfile as sf
+from audioAssets import DEFAULT_SAMPLE_RATE, find_audio_files
+from resample import resample
+
+
+def resample_interp(samples, source_rate, target_rate):
+    """The resampling the players used before resample.py."""
+    new_length = int(len(samples) * target_rate / source_rate)
+    return np.interp(
+        np.linspace(0, len(samples) - 1, new_length),
+        np.arange(len(samples)),
+        samples
+    ).astype(np.float32)
+
+
+def measure(func, samples, source_rate, target_rate, repeat):
+    """Return (best time in ms, peak traced memory in MB) over `repeat` runs."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(samples, source_rate, target_rate)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    func(samples, source_rate, target_rate)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best * 1000, peak / 1e6
+
+
+def alias_level_db(func, source_rate, target_rate):
+    """RMS level (dBFS) of what remains of a full-scale tone just above the target Nyquist."""
+    nyquist = min(source_rate, target_rate) / 2
+    tone_hz = min(nyquist * 1.15, source_rate / 2 * 0.98)
+    if tone_hz <= nyquist:
+        return None  # Upsampling: nothing in the source is above the target Nyquist
+    t = np.arange(source_rate * 2) / source_rate
+    tone = np.sin(2 * np.pi * tone_hz * t).astype(np.float32)
+    out = func(tone, source_rate, target_rate)[target_rate // 10:-target_rate // 10]
+    rms = np.sqrt(np.mean(out.astype(np.float64) ** 2))
+    return 20 * np.log10(max(rms, 1e-12))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark polyphase resampling against np.interp.')
+    parser.add_argument('--rate', '-r', type=int, default=DEFAULT_SAMPLE_RATE,
+                        help=f'Target sample rate (default: {DEFAULT_SAMPLE_RATE})')
+    parser.add_argument('--repeat', type=int, default=3, help='Timing runs per method (default: 3)')
+    args = parser.parse_args()
+
+    print(f"Resampling to {args.rate} Hz (best of {args.repeat})")
+    print(f"\n{'File':<44} {'Rate':>6} {'interp ms':>10} {'poly ms':>9} {'interp MB':>10} {'poly MB':>8}")
+    print("-" * 92)
+
+    source_rates = set()
+    for path in find_audio_files():
+        info = sf.info(path)
+        if info.samplerate == args.rate:
+            continue
+        source_rates.add(info.samplerate)
+        data, source_rate = sf.read(path, dtype='float32')
+        samples = data.mean(axis=1) if data.ndim == 2 else data
+
+        interp_ms, interp_mb = measure(resample_interp, samples, source_rate, args.rate, args.repeat)
+        poly_ms, poly_mb = measure(resample, samples, source_rate, args.rate, args.repeat)
+        name = path.split('sound/')[-1][:44]
+        print(f"{name:<44} {source_rate:>6} {interp_ms:>10.1f} {poly_ms:>9.1f} {interp_mb:>10.1f} {poly_mb:>8.1f}")
+
+    if not source_rates:
+        print(f"No files need resampling to {args.rate} Hz")
+        return
+
+    print("\nAliasing of a full-scale tone above the target Nyquist (lower is better):")
+    for source_rate in sorted(source_rates):
+        interp_db = alias_level_db(resample_interp, source_rate, args.rate)
+        if interp_db is None:
+            print(f"  {source_rate} -> {args.rate}: upsampling, no alias test")
+            continue
+        poly_db = alias_level_db(resample, source_rate, args.rate)
+        print(f"  {source_rate} -> {args.rate}: interp {interp_db:6.1f} dBFS, polyphase {poly_db:6.1f} dBFS")
+
+
+if __name__ == "__main__":
+    main()
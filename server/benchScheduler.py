@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark scares per hour with the zone scheduler against the old global prop_active flag.
+
+Simulates visitor groups walking past the props server's props (coffin ->
+werewolf -> scarecrow, in house order) with random arrival and walking
+times. The cooldowns, run times, resources, priorities and staleness timeout
+are imported from hauntedHouseLoop2025.py, so the benchmark follows the
+real configuration. Every policy sees exactly the same visitors. Each
+policy runs on replaySensors.py's virtual clock, which jumps straight to
+the next timer, so an hour of visitors takes well under a second and the
+same seed always gives the same counts.
+
+Policies:
+    flag   - the old global prop_active boolean: a trigger while any prop runs is lost
+    lock   - one house-wide resource in the zone scheduler (serialized, but queued)
+    zones  - the zone scheduler with each prop's PROP_RESOURCES
+
+Usage:
+    uv run benchScheduler.py
+    uv run benchScheduler.py --hours 2 --interval 30
+"""
+
+import argparse
+import asyncio
+import random
+from houseConfig import PROP3, PROP5, PROP6, PROP_NAMES
+from hauntedHouseLoop2025 import PROP_COOLDOWN, PROP_DELAY_SECONDS, PROP_PRIORITY, PROP_RESOURCES, STALE_SECONDS
+from replaySensors import VirtualClockLoop
+from zoneScheduler import ZoneScheduler
+
+# Name, run time (s), cooldown (s), resources, priority of each prop, in house order
+PROPS = [(PROP_NAMES[device_id], PROP_DELAY_SECONDS[device_id], PROP_COOLDOWN[device_id],
+          PROP_RESOURCES[device_id], PROP_PRIORITY[device_id]) for device_id in (PROP3, PROP5, PROP6)]
+WALK_SECONDS = (15, 40)  # Time for a group to walk from one prop to the next (uniform range)
+
+
+def make_visits(hours, interval, seed):
+    """
+    Return the sorted (time, prop index) triggers of every visitor group.
+    Groups arrive as a Poisson process and trigger each prop in house order.
+    """
+    rng = random.Random(seed)
+    visits = []
+    arrival = rng.expovariate(1 / interval)
+    while arrival < hours * 3600:
+        t = arrival
+        for index in range(len(PROPS)):
+            visits.append((t, index))
+            t += rng.uniform(*WALK_SECONDS)
+        arrival += rng.expovariate(1 / interval)
+    return sorted(visits)
+
+
+async def simulate(policy, visits, stale_seconds):
+    """
+    Replay the visits under one policy (on a VirtualClockLoop, so its time is simulated seconds).
+
+    Returns:
+        Dict of counters: triggers, scares, cooldown, busy (lost to prop_active) and stale
+    """
+    now = asyncio.get_running_loop().time
+    scheduler = ZoneScheduler(stale_seconds)
+    last_run = [float('-inf')] * len(PROPS)
+    counts = {'triggers': len(visits), 'scares': 0, 'cooldown': 0, 'busy': 0, 'stale': 0}
+    prop_active = False
+
+    async def trigger(index):
+        nonlocal prop_active
+        name, run_seconds, cooldown, resources, priority = PROPS[index]
+        if now() - last_run[index] < cooldown:
+            counts['cooldown'] += 1
+            return
+
+        if policy == 'flag':
+            if prop_active:
+                counts['busy'] += 1
+                return
+            prop_active = True
+            last_run[index] = now()
+            await asyncio.sleep(run_seconds)
+            prop_active = False
+            counts['scares'] += 1
+            return
+
+        if not await scheduler.acquire(name, {"house"} if policy == 'lock' else resources, priority):
+            counts['stale'] += 1
+            return
+        try:
+            last_run[index] = now()
+            await asyncio.sleep(run_seconds)
+        finally:
+            scheduler.release(name)
+        counts['scares'] += 1
+
+    tasks = []
+    for t, index in visits:
+        delay = t - now()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(trigger(index)))
+    await asyncio.gather(*tasks)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare scares per hour under the zone scheduler and the global prop_active flag.')
+    parser.add_argument('--hours', type=float, default=1.0, help='Simulated hours of visitors (default: 1)')
+    parser.add_argument('--interval', type=float, default=45.0, help='Mean seconds between visitor groups (default: 45)')
+    parser.add_argument('--stale', type=float, default=STALE_SECONDS,
+                        help=f'Scheduler staleness timeout in seconds (default: {STALE_SECONDS})')
+    parser.add_argument('--seed', type=int, default=2025, help='Random seed for the visitors (default: 2025)')
+    args = parser.parse_args()
+
+    visits = make_visits(args.hours, args.interval, args.seed)
+    print(f"{len(visits)} triggers over {args.hours:g} h (a group every {args.interval:g}s on average)\n")
+    print(f"{'policy':<8} {'scares/h':>9} {'scares':>7} {'cooldown':>9} {'busy':>6} {'stale':>6}")
+    for policy in ('flag', 'lock', 'zones'):
+        loop = VirtualClockLoop()
+        try:
+            counts = loop.run_until_complete(simulate(policy, visits, args.stale))
+        finally:
+            loop.close()
+        print(f"{policy:<8} {counts['scares'] / args.hours:>9.1f} {counts['scares']:>7} "
+              f"{counts['cooldown']:>9} {counts['busy']:>6} {counts['stale']:>6}")
+
+
+if __name__ == "__main__":
+    main()
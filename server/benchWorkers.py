@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Benchmark sensor throughput with 1 to N orchestrator workers (see sharding.py).
+
+For each worker count W, W worker processes each run the receiving side of
+the orchestrator (MqttLink -> SensorQueues -> detector -> listener, one
+consumer per device) for their share of the emulated nodes, as
+`main.py --workers W --worker I` would. Each worker subscribes to its own
+devices' topics only. Generator processes from loadGenerator.py publish
+for all the nodes on the firmware's fixed schedule. High readings carry
+their send time, so every detection's publish -> handler latency is known.
+
+Every step reports the offered and processed rates, delivery, detection
+latency percentiles, how evenly the devices were spread (the busiest
+worker's share), and the speedup over one worker.
+
+The broker is part of what is measured. Every worker adds a connection
+and the broker has to match each reading against more subscriptions, so
+run it against the local mosquitto (which is what the house runs), not
+against the house broker. No scaling results are recorded in this repo
+yet; the numbers depend on the machine and the broker it runs on.
+
+Usage:
+    cd ../mosquitto-docker-compose && docker compose up -d   # Local broker
+    uv run benchWorkers.py                                   # 1, 2, 3, 4 workers, 2000 nodes at 0.1 s
+    uv run benchWorkers.py --workers 1,2,4,8 --devices 4000 --interval 0.05 --generators 4
+
+Output: data/workers_YYYYMMDD_HHMMSS.csv
+"""
+
+import argparse
+import asyncio
+import csv
+import multiprocessing
+import os
+import time
+import numpy as np
+from houseConfig import SENSOR_THRESHOLD, DETECT_HIGHS, DETECT_WINDOW
+from loadGenerator import (LOAD_BROKER, DRAIN_SECONDS, SUSTAINED_DELIVERY, SUSTAINED_P95_MS,
+                           LatencyQueues, consume, fake_mac, generator_process)
+from mqttLink import MqttLink
+from sharding import partition
+
+WORKER_STEPS = [1, 2, 3, 4]
+DEVICES = 2000
+INTERVAL_SECONDS = 0.1  # Faster than the firmware's 500 ms, to load the pipeline with fewer connections
+STEP_SECONDS = 15
+GENERATORS = 2  # Generator processes, so the publishing side isn't what saturates
+
+
+def worker_process(worker, workers, device_ids, broker, port, ready, stop, results):
+    """One orchestrator worker: receive and detect for its partition until stop is set."""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    queues = LatencyQueues(device_ids, DETECT_HIGHS, DETECT_WINDOW, SENSOR_THRESHOLD, maxsize=64)
+    link = MqttLink(f"bench_worker_{os.getpid()}", broker, port, log=lambda message: None)
+    link.route_sensors(device_ids, queues.put_threadsafe, wildcard=False)
+    latencies_ms = []
+    consumers = [loop.create_task(consume(queues, queues.listen(device_id), latencies_ms)) for device_id in device_ids]
+    queues.bind(loop)
+    link.start()
+    ready.put((worker, link.connected.wait(10)))
+    try:
+        loop.run_until_complete(loop.run_in_executor(None, stop.wait))
+    finally:
+        for task in consumers:
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*consumers, return_exceptions=True))
+        link.stop()
+        loop.close()
+    results.put((worker, sum(queues.received.values()), latencies_ms))
+
+
+def measure(workers, devices, broker, port, interval, seconds, seed, generators):
+    """
+    Run one step with the given number of workers.
+
+    Returns:
+        Dict with the step's rates, delivery, latency percentiles and balance
+    """
+    device_ids = [fake_mac(i) for i in range(devices)]
+    shares = partition(device_ids, workers)
+    ready, results, sent_counts = multiprocessing.Queue(), multiprocessing.Queue(), multiprocessing.Queue()
+    stop = multiprocessing.Event()
+    processes = [multiprocessing.Process(target=worker_process, daemon=True,
+                                         args=(worker, workers, shares[worker], broker, port, ready, stop, results))
+                 for worker in range(workers)]
+    for process in processes:
+        process.start()
+    connected = [ready.get(timeout=30)[1] for _ in processes]
+    if not all(connected):
+        stop.set()
+        raise ConnectionError(f"A worker could not connect to the MQTT broker at {broker}:{port}")
+
+    # Each generator process emulates a contiguous slice of the nodes (its own seed offset keeps the patterns apart)
+    slices = np.array_split(np.arange(devices), generators)
+    senders = [multiprocessing.Process(target=generator_process, daemon=True,
+                                       args=([device_ids[i] for i in part], broker, port, interval, seconds,
+                                             seed * 1000 + g, sent_counts))
+               for g, part in enumerate(slices) if len(part)]
+    for sender in senders:
+        sender.start()
+    sent = sum(sent_counts.get() for _ in senders)
+    time.sleep(DRAIN_SECONDS)
+    stop.set()
+
+    received, latencies_ms = 0, []
+    for _ in processes:
+        _, count, worker_latencies = results.get(timeout=30)
+        received += count
+        latencies_ms += worker_latencies
+    for process in processes + senders:
+        process.join(timeout=5)
+
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99]) if latencies_ms else (float('nan'),) * 3
+    row = {
+        "workers": workers,
+        "devices": devices,
+        "offered_rate": sent / seconds,
+        "processed_rate": received / seconds,
+        "delivered": received / sent if sent else 0.0,
+        "detections": len(latencies_ms),
+        "p50_ms": p50,
+        "p95_ms": p95,
+        "p99_ms": p99,
+        "busiest_share": max(len(share) for share in shares.values()) / devices,
+    }
+    row["sustained"] = row["delivered"] >= SUSTAINED_DELIVERY and p95 <= SUSTAINED_P95_MS
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark sensor throughput with 1 to N orchestrator workers.')
+    parser.add_argument('--workers', default=",".join(map(str, WORKER_STEPS)), help='Comma-separated worker counts')
+    parser.add_argument('--devices', type=int, default=DEVICES, help='Emulated sensor nodes')
+    parser.add_argument('--interval', type=float, default=INTERVAL_SECONDS, help='Seconds between readings of one node')
+    parser.add_argument('--seconds', type=float, default=STEP_SECONDS, help='Publishing time per step')
+    parser.add_argument('--generators', type=int, default=GENERATORS, help='Generator processes')
+    parser.add_argument('--broker', default=LOAD_BROKER, help=f'MQTT broker (default: {LOAD_BROKER})')
+    parser.add_argument('--port', type=int, default=1883)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default=time.strftime('data/workers_%Y%m%d_%H%M%S.csv'), help='CSV to write')
+    args = parser.parse_args()
+
+    print(f"{args.devices} nodes every {args.interval}s = {args.devices / args.interval:.0f} messages/s offered\n")
+    print(f"{'workers':>8} {'offered/s':>10} {'processed/s':>12} {'delivered':>10} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'busiest':>8} {'speedup':>8}")
+    rows = []
+    for workers in (int(n) for n in args.workers.split(",")):
+        row = measure(workers, args.devices, args.broker, args.port, args.interval, args.seconds,
+                      args.seed, args.generators)
+        row["speedup"] = row["processed_rate"] / rows[0]["processed_rate"] if rows and rows[0]["processed_rate"] else 1.0
+        rows.append(row)
+        print(f"{workers:>8} {row['offered_rate']:>10.0f} {row['processed_rate']:>12.0f} {row['delivered']:>9.1%} "
+              f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['busiest_share']:>7.0%} "
+              f"{row['speedup']:>7.2f}x{'' if row['sustained'] else '  (not sustained)'}")
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
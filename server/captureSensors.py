@@ -20,17 +20,18 @@ To stop capture: Ctrl+C
 The output CSV format is:
     timestamp,device_id,device_name,sensor_value
 
+The capture reconnects by itself if the broker drops (see mqttLink.py).
+
 After capture stops, analyzeSensors.py will automatically run unless --noanalyze is specified.
 """
 
-import paho.mqtt.client as mqtt
-from paho.mqtt.client import CallbackAPIVersion
 import time
 import sys
 import csv
 from datetime import datetime
 import signal
 import subprocess
+from mqttLink import MqttLink
 
 # Sensor definitions with friendly names
 SENSORS = {
@@ -56,56 +57,62 @@ movement_mode = False
 output_filename = None
 
 
-def on_connect(client, userdata, flags, rc, properties=None):
-    """Callback when connected to MQTT broker."""
-    if rc == 0:
-        print(f"Connected to MQTT broker at {MQTT_BROKER}")
-        print("Subscribing to sensor topics...")
+def record(device_id, payload, received_ns):
+    """Write one reading to the CSV (called by MqttLink on its network thread)."""
+    global message_count
 
-        # Subscribe to all sensor topics
-        for device_id, device_name in SENSORS.items():
-            topic = f"device/{device_id}/sensor"
-            client.subscribe(topic)
-            print(f"  {device_name}: {topic}")
+    device_name = SENSORS.get(device_id, "unknown")
 
-        print("\nCapturing sensor data... (Press Ctrl+C to stop)")
-        print("-" * 60)
-    else:
-        print(f"Failed to connect to MQTT broker. Return code: {rc}")
-        sys.exit(1)
+    # Decode sensor value (should be 0 or 1)
+    try:
+        sensor_value = int(payload.decode().strip())
+    except ValueError:
+        sensor_value = payload.decode().strip()
 
+    # Get high-precision timestamp
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]  # millisecond precision
 
-def on_message(client, userdata, message, properties=None):
-    """Callback when a message is received."""
-    global csv_writer, message_count, start_time
+    # Write to CSV
+    if csv_writer:
+        csv_writer.writerow([timestamp, device_id, device_name, sensor_value])
+        csv_file.flush()  # Ensure data is written immediately
 
-    # Extract device ID from topic (format: device/MAC_ADDRESS/sensor)
-    topic_parts = message.topic.split("/")
-    if len(topic_parts) >= 2:
-        device_id = topic_parts[1]
-        device_name = SENSORS.get(device_id, "unknown")
+        message_count += 1
 
-        # Decode sensor value (should be 0 or 1)
-        try:
-            sensor_value = int(message.payload.decode().strip())
-        except ValueError:
-            sensor_value = message.payload.decode().strip()
+        # Print periodic status updates
+        if message_count % 100 == 0:
+            elapsed = time.time() - start_time
+            rate = message_count / elapsed if elapsed > 0 else 0
+            print(f"Captured {message_count} messages ({rate:.1f} msg/sec)")
 
-        # Get high-precision timestamp
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]  # millisecond precision
 
-        # Write to CSV
-        if csv_writer:
-            csv_writer.writerow([timestamp, device_id, device_name, sensor_value])
-            csv_file.flush()  # Ensure data is written immediately
+def capture(transport=None):
+    """
+    Subscribe to the sensors and record until interrupted.
 
-            message_count += 1
+    Args:
+        transport: Transport for the MqttLink (default: the house broker, see transport.py)
+    """
+    global start_time
+
+    # The link subscribes to device/+/sensor and only passes on the sensors listed above
+    link = MqttLink(MQTT_CLIENT_ID, MQTT_BROKER, transport=transport)
+    link.route_sensors(SENSORS, record)
+    for device_id, device_name in SENSORS.items():
+        print(f"  {device_name}: device/{device_id}/sensor")
+
+    # Record start time
+    start_time = time.time()
+    link.start()
+    if not link.connected.wait(10):
+        print(f"Still trying to reach the MQTT broker at {MQTT_BROKER}...")
+    link.connected.wait()
+    print("\nCapturing sensor data... (Press Ctrl+C to stop)")
+    print("-" * 60)
 
-            # Print periodic status updates
-            if message_count % 100 == 0:
-                elapsed = time.time() - start_time
-                rate = message_count / elapsed if elapsed > 0 else 0
-                print(f"Captured {message_count} messages ({rate:.1f} msg/sec)")
+    # The link reconnects by itself; just wait for Ctrl+C
+    while True:
+        time.sleep(1)
 
 
 def signal_handler(sig, frame):
@@ -147,7 +154,7 @@ def signal_handler(sig, frame):
 
 
 def main():
-    global csv_writer, csv_file, start_time, run_analysis, movement_mode, output_filename
+    global csv_writer, csv_file, run_analysis, movement_mode, output_filename
 
     # Set up signal handler for graceful shutdown
     signal.signal(signal.SIGINT, signal_handler)
@@ -197,28 +204,7 @@ def main():
         print(f"Auto-analysis: Disabled")
     print()
 
-    # Connect to MQTT broker
-    # Use clean_session=True to avoid receiving any queued/retained messages
-    client = mqtt.Client(
-        CallbackAPIVersion.VERSION2,
-        client_id=MQTT_CLIENT_ID,
-        clean_session=True
-    )
-    client.on_connect = on_connect
-    client.on_message = on_message
-
-    try:
-        client.connect(MQTT_BROKER)
-    except Exception as e:
-        print(f"Error connecting to MQTT broker: {e}")
-        csv_file.close()
-        sys.exit(1)
-
-    # Record start time
-    start_time = time.time()
-
-    # Start MQTT loop (blocking)
-    client.loop_forever()
+    capture()
 
 
 if __name__ == "__main__":
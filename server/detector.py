@@ -0,0 +1,60 @@
+"""
+Streaming N-of-M motion detector with constant per-sensor state.
+
+Each reading updates a bitmask of the last M readings and a count of the
+highs in it, so a detection check is O(1) and the state never grows, no
+matter how many readings a sensor sends or whether anything consumes them.
+N=2, M=2 is the "two consecutive highs" rule the props have always used.
+
+Usage:
+    detector = Detector(n=2, m=3)  # Fire when 2 of the last 3 readings are high
+    for value in (0, 1, 0, 1):
+        if detector.update(value):
+            print("motion")
+    detector.reset()  # e.g. after a prop's cooldown
+"""
+
+
+class Detector:
+    """Fires while at least n of the last m readings are above the threshold."""
+
+    __slots__ = ('n', 'm', 'threshold', 'window', 'highs', 'run', 'readings', '_mask', '_oldest')
+
+    def __init__(self, n=2, m=2, threshold=0):
+        """
+        Args:
+            n: High readings needed within the window
+            m: Window length in readings (n <= m)
+            threshold: A reading is high when it is greater than this
+        """
+        if not 1 <= n <= m:
+            raise ValueError(f"Need 1 <= n <= m, got n={n}, m={m}")
+        self.n = n
+        self.m = m
+        self.threshold = threshold
+        self._mask = (1 << m) - 1
+        self._oldest = 1 << (m - 1)
+        self.reset()
+
+    def reset(self):
+        """Forget every reading seen so far."""
+        self.window = 0  # Bit i set = the reading i steps ago was high
+        self.highs = 0  # Number of set bits in window
+        self.run = 0  # Consecutive high readings up to the latest one
+        self.readings = 0  # Readings seen since the last reset
+
+    def update(self, value):
+        """
+        Add one reading.
+
+        Returns:
+            True if at least n of the last m readings (including this one) are high
+        """
+        high = value > self.threshold
+        if self.window & self._oldest:
+            self.highs -= 1  # The oldest reading falls out of the window
+        self.window = ((self.window << 1) | high) & self._mask
+        self.highs += high
+        self.run = self.run + 1 if high else 0
+        self.readings += 1
+        return self.highs >= self.n
@@ -2,175 +2,234 @@
 
 
 import asyncio
+import os
 import time
-import paho.mqtt.client as mqtt
-from paho.mqtt.client import CallbackAPIVersion
 import random
+from houseConfig import (PROP3, PROP5, PROP6, PROP7, PROP_NAMES, SENSOR_THRESHOLD,
+                         DETECT_HIGHS, DETECT_WINDOW, STATS_REPORT_SECONDS, LOG_DIR, PROPS_METRICS_PORT)
+from logPipeline import log, log_summary, open_log_file
+from metrics import family, trigger_metrics, start_metrics
+from mqttLink import MqttLink
+from sensorQueues import SensorQueues
+from supervisor import Supervisor
+from zoneScheduler import ZoneScheduler
+from timeline import Timelines
 
-# Constants for device names
-PROP1 = "60:55:F9:7B:98:14" # DOOR SENSOR
-PROP2 = "60:55:F9:7B:5F:2C" # WITCHES AREA SENSOR
-PROP3 = "54:32:04:46:61:88" # COFFIN SENSOR
-PROP4 = "60:55:F9:7B:60:BC" # BUBBA SENSOR
-PROP5 = "60:55:F9:7B:7B:60" # WEREWOLF SENSOR
-PROP6 = "60:55:F9:7B:82:30" # SCARECROW SENSOR  
-PROP7 = "54:32:04:46:61:40" # COFFIN ACTUATOR
-
-SENSOR_THRESHOLD = 0
 COOLDOWN_SECONDS = 40  # Minimum time between runs for each prop
 fogFlipper = True
-prop_active = False  # Track if any prop is currently running
-last_run_time = {PROP3: 0, PROP5: 0, PROP6: 0}  # Track last run time for each prop
-
-# Dictionary to store lists for each device
-queues = {
-    PROP1: [],
-    PROP2: [],
-    PROP3: [],
-    PROP4: [],
-    PROP5: [],
-    PROP6: []
+last_run_time = dict.fromkeys([PROP3, PROP5, PROP6], float('-inf'))  # Monotonic last run time of each prop
+
+# Zones/resources each prop holds while it runs. Props with nothing in common run at the
+# same time; add shared equipment (e.g. "compressor", "fog") to every prop that uses it.
+PROP_RESOURCES = {
+    PROP3: {"coffin-room"},
+    PROP5: {"werewolf-front"},
+    PROP6: {"scarecrow"},
+}
+PROP_PRIORITY = {PROP3: 2, PROP5: 1, PROP6: 0}  # Higher runs first when props need the same resource
+STALE_SECONDS = 15  # Give up on a trigger that has waited this long for its resources
+PROP_COOLDOWN = {PROP3: COOLDOWN_SECONDS, PROP5: COOLDOWN_SECONDS + 25, PROP6: COOLDOWN_SECONDS}  # The werewolf rests longer
+PROP_DELAY_SECONDS = {PROP3: 10, PROP5: 10, PROP6: 20}  # Time a prop keeps its zones after it starts
+scheduler = ZoneScheduler(STALE_SECONDS)
+
+# What each prop does when triggered: (offset seconds, topic, payload) cues
+PROP_TIMELINES = {
+    PROP3: [(0, f"device/{PROP7}/actuator", "S500,300,500,300,1000,300,500,300,500,300,2000")],  # Coffin actuator
+    PROP5: [(0, f"device/{PROP5}/actuator", "X20")],
+    PROP6: [(0, f"device/{PROP6}/actuator", "X2")],
 }
 
-# Define MQTT parameters
-mqtt_broker = "192.168.86.2"
-client = mqtt.Client(CallbackAPIVersion.VERSION2, client_id="server_props")
-client.connect(mqtt_broker)
-
-# Simple logging function with timestamp
-def log(message):
-    timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime()) + f".{int(time.time() * 1000) % 1000:03d}"
-    print(f"[{timestamp}] {message}")
-
-# Function to publish MQTT events
-def publish_event(topic, message):
-    client.publish(topic, message)
-    log(f"Published event: {message} to topic {topic}")
-
-# Function to handle MQTT messages
-def on_message(client, userdata, message, properties=None):
-    device_id = message.topic.split("/")[1]  # Extract device ID from the topic
-    if device_id in queues:
-        queues[device_id].append(message)
-
-# Set up MQTT subscription with updated topic names
-for device_id in queues:
-    client.subscribe(f"device/{device_id}/sensor")  # Updated topic for subscription
-client.on_message = on_message
+# Set by attach(), so importing this module (e.g. from main.py) doesn't connect to anything
+client = None  # MqttLink used to publish actuator events
+clock = time.monotonic  # Cooldown clock (replaySensors.py swaps in its virtual clock)
+timelines = None  # Every prop's cues run off one monotonic timer heap (each publish is logged with its drift)
+listeners = {}  # Prop sensor -> DetectionListener (only the sensors this process owns, see sharding.py)
+shared_state = None  # sharding.SharedState when running as one of several workers
+
+# Per-prop trigger counters, preallocated so counting is a single dict store (served by metrics.py)
+triggers = dict.fromkeys(PROP_TIMELINES, 0)
+suppressed_cooldown = dict.fromkeys(PROP_TIMELINES, 0)  # Detections during the prop's cooldown
+suppressed_busy = dict.fromkeys(PROP_TIMELINES, 0)  # Detections dropped waiting for busy zones (old prop_active)
+
+
+def attach(mqtt_link, sensor_queues, clock_fn=time.monotonic, shared=None):
+    """
+    Hook the prop handlers up to an MQTT link (for publishing) and a sensor pipeline.
+    Used by main() below, by the combined orchestrator in main.py and by replaySensors.py.
+
+    Args:
+        mqtt_link: MqttLink (or anything with publish(topic, payload))
+        sensor_queues: SensorQueues tracking the props' sensors (a worker's share of them with --workers)
+        clock_fn: Monotonic clock in seconds for the cooldowns (the event loop's clock when replaying)
+        shared: sharding.SharedState to share cooldowns and zone locks with other workers, or None
+    """
+    global client, clock, timelines, shared_state
+    client = mqtt_link
+    clock = clock_fn
+    shared_state = shared
+    topics = {topic for cues in PROP_TIMELINES.values() for _, topic, _ in cues}
+    timelines = Timelines(client.publish, log, topics)
+    for device_id in PROP_TIMELINES:
+        if device_id in sensor_queues.device_ids:
+            listeners[device_id] = sensor_queues.listen(device_id)
+    if shared_state is not None:
+        shared_state.track(last_run_time, scheduler, clock)
+
+def create_tasks(supervisor):
+    """Start one supervised handler task per attached prop (a task that raises is restarted on its own)."""
+    tasks = {PROP3: ("props.COFFIN", process_queue_PROP3),
+             PROP5: ("props.WEREWOLF", process_queue_PROP5),
+             PROP6: ("props.SCARECROW", process_queue_PROP6)}
+    for device_id, (name, task) in tasks.items():
+        if device_id in listeners:
+            supervisor.start(name, task)
+
+def mark_run(device_id):
+    """Start a prop's cooldown (shared with the other workers, if any)."""
+    last_run_time[device_id] = clock()
+    if shared_state is not None:
+        shared_state.ran(device_id)
+
+def count_suppressed(device_id, cooled_down):
+    """Count a detection that didn't run its prop: still cooling down, or its zones stayed busy."""
+    (suppressed_busy if cooled_down else suppressed_cooldown)[device_id] += 1
+
+def metrics():
+    """Trigger and per-actuator publish counters for the /metrics endpoint."""
+    published = [({"device": topic.split("/")[1], "topic": topic}, count)
+                 for topic, count in list(timelines.published.items())]
+    return [
+        *trigger_metrics("props", PROP_NAMES, triggers, suppressed_cooldown, suppressed_busy),
+        family("haunted_actuator_publishes_total", "counter", "Actuator cues published", published),
+    ]
+
+def report():
+    """Log the scheduler and timeline counters."""
+    log(scheduler.summary(PROP_NAMES))
+    log(timelines.summary())
+    if shared_state is not None:
+        log(shared_state.summary())
+
+def shutdown():
+    """Cancel running actuator timelines and log the final counters."""
+    timelines.cancel_all()
+    report()
 
 
 # COFFIN
 async def process_queue_PROP3():
-    global prop_active
     while True:
-        await asyncio.sleep(0.3)
-        if len(queues[PROP3]) >= 2:
-            # Copy the queue and keep the last message for next cycle
-            messages = queues[PROP3][:]
-            queues[PROP3] = [messages[-1]]  # Keep last message to check consecutive across cycles
-
-            payloads = [int(message.payload.decode()) for message in messages]  # Extract payloads as integers
-            log(f"PROP3 Payloads: {payloads}  # COFFIN")
-
-            # Check for two consecutive payloads > SENSOR_THRESHOLD
-            consecutive_high = False
-            for i in range(len(payloads) - 1):
-                if payloads[i] > SENSOR_THRESHOLD and payloads[i + 1] > SENSOR_THRESHOLD:
-                    consecutive_high = True
-                    break
-
-            # Check cooldown and prop_active before triggering
-            current_time = time.time()
-            time_since_last_run = current_time - last_run_time[PROP3]
-            if consecutive_high and not prop_active and time_since_last_run >= COOLDOWN_SECONDS:
-                prop_active = True
-                last_run_time[PROP3] = current_time
-                publish_event(f"device/{PROP7}/actuator", "S500,300,500,300,1000,300,500,300,500,300,2000")  # Publish to PROP7 (coffin actuator)
-                await asyncio.sleep(10)  # Delay after running the prop
-                queues[PROP3] = []  # Clear all events that came in during the delay
-                prop_active = False
+        # Wake as soon as the sensor's detector fires
+        await listeners[PROP3].get()
+        log("PROP3 motion detected  # COFFIN")
+
+        # Check cooldown, then wait (up to STALE_SECONDS) until the prop's zones are free
+        time_since_last_run = clock() - last_run_time[PROP3]  # Immune to wall-clock (NTP) jumps
+        if time_since_last_run >= PROP_COOLDOWN[PROP3] and await scheduler.acquire(PROP3, PROP_RESOURCES[PROP3], PROP_PRIORITY[PROP3]):
+            try:
+                mark_run(PROP3)
+                triggers[PROP3] += 1
+                await timelines.start(PROP_NAMES[PROP3], PROP_TIMELINES[PROP3])
+                await asyncio.sleep(PROP_DELAY_SECONDS[PROP3])  # Delay after running the prop
+            finally:
+                scheduler.release(PROP3)
+            listeners[PROP3].reset()  # Ignore detections from readings that came in during the delay
+        else:
+            count_suppressed(PROP3, time_since_last_run >= PROP_COOLDOWN[PROP3])
 
 
 # WEREWOLF
 async def process_queue_PROP5():
-    global prop_active
     while True:
-        await asyncio.sleep(0.3)
-        if len(queues[PROP5]) >= 2:
-            # Copy the queue and keep the last message for next cycle
-            messages = queues[PROP5][:]
-            queues[PROP5] = [messages[-1]]  # Keep last message to check consecutive across cycles
-
-            payloads = [int(message.payload.decode()) for message in messages]  # Extract payloads as integers
-            log(f"PROP5 Payloads: {payloads}  # WEREWOLF")
-
-            # Check for two consecutive payloads > SENSOR_THRESHOLD
-            consecutive_high = False
-            for i in range(len(payloads) - 1):
-                if payloads[i] > SENSOR_THRESHOLD and payloads[i + 1] > SENSOR_THRESHOLD:
-                    consecutive_high = True
-                    break
-
-            # Check cooldown and prop_active before triggering
-            current_time = time.time()
-            time_since_last_run = current_time - last_run_time[PROP5]
-            if consecutive_high and not prop_active and time_since_last_run >= COOLDOWN_SECONDS+25:
-                prop_active = True
-                last_run_time[PROP5] = current_time
-                publish_event(f"device/{PROP5}/actuator", "X20")  # Publish event when two consecutive readings exceed threshold
-                await asyncio.sleep(10)  # Delay after running the prop
-                queues[PROP5] = []  # Clear all events that came in during the delay
-                prop_active = False
+        # Wake as soon as the sensor's detector fires
+        await listeners[PROP5].get()
+        log("PROP5 motion detected  # WEREWOLF")
+
+        # Check cooldown, then wait (up to STALE_SECONDS) until the prop's zones are free
+        time_since_last_run = clock() - last_run_time[PROP5]  # Immune to wall-clock (NTP) jumps
+        if time_since_last_run >= PROP_COOLDOWN[PROP5] and await scheduler.acquire(PROP5, PROP_RESOURCES[PROP5], PROP_PRIORITY[PROP5]):
+            try:
+                mark_run(PROP5)
+                triggers[PROP5] += 1
+                await timelines.start(PROP_NAMES[PROP5], PROP_TIMELINES[PROP5])
+                await asyncio.sleep(PROP_DELAY_SECONDS[PROP5])  # Delay after running the prop
+            finally:
+                scheduler.release(PROP5)
+            listeners[PROP5].reset()  # Ignore detections from readings that came in during the delay
+        else:
+            count_suppressed(PROP5, time_since_last_run >= PROP_COOLDOWN[PROP5])
 
 
 # SCARECROW
 async def process_queue_PROP6():
-    global prop_active
     while True:
-        await asyncio.sleep(0.3)
-        if len(queues[PROP6]) >= 2:
-            # Copy the queue and keep the last message for next cycle
-            messages = queues[PROP6][:]
-            queues[PROP6] = [messages[-1]]  # Keep last message to check consecutive across cycles
-
-            payloads = [int(message.payload.decode()) for message in messages]  # Extract payloads as integers
-            log(f"PROP6 Payloads: {payloads}  # SCARECROW")
-
-            # Check for two consecutive payloads > SENSOR_THRESHOLD
-            consecutive_high = False
-            for i in range(len(payloads) - 1):
-                if payloads[i] > SENSOR_THRESHOLD and payloads[i + 1] > SENSOR_THRESHOLD:
-                    consecutive_high = True
-                    break
-
-            # Check cooldown and prop_active before triggering
-            current_time = time.time()
-            time_since_last_run = current_time - last_run_time[PROP6]
-            if consecutive_high and not prop_active and time_since_last_run >= COOLDOWN_SECONDS:
-                prop_active = True
-                last_run_time[PROP6] = current_time
-                publish_event(f"device/{PROP6}/actuator", "X2")  # Publish event when two consecutive readings exceed threshold
-                await asyncio.sleep(20)  # Delay after running the prop
-                queues[PROP6] = []  # Clear all events that came in during the delay
-                prop_active = False
+        # Wake as soon as the sensor's detector fires
+        await listeners[PROP6].get()
+        log("PROP6 motion detected  # SCARECROW")
+
+        # Check cooldown, then wait (up to STALE_SECONDS) until the prop's zones are free
+        time_since_last_run = clock() - last_run_time[PROP6]  # Immune to wall-clock (NTP) jumps
+        if time_since_last_run >= PROP_COOLDOWN[PROP6] and await scheduler.acquire(PROP6, PROP_RESOURCES[PROP6], PROP_PRIORITY[PROP6]):
+            try:
+                mark_run(PROP6)
+                triggers[PROP6] += 1
+                await timelines.start(PROP_NAMES[PROP6], PROP_TIMELINES[PROP6])
+                await asyncio.sleep(PROP_DELAY_SECONDS[PROP6])  # Delay after running the prop
+            finally:
+                scheduler.release(PROP6)
+            listeners[PROP6].reset()  # Ignore detections from readings that came in during the delay
+        else:
+            count_suppressed(PROP6, time_since_last_run >= PROP_COOLDOWN[PROP6])
 
 
 # Define the event loop
-async def event_loop():
+async def event_loop(sensor_queues, link, supervisor):
     while True:
-        # All this main loop does is print the current time every .5 seconds
-        await asyncio.sleep(0.5)
-        current_time = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime()) + f".{int(time.time() * 1000) % 1000:03d}"
-        # print(current_time)
+        # All this main loop does is report the sensor and scheduler counters periodically
+        await asyncio.sleep(STATS_REPORT_SECONDS)
+        log(sensor_queues.summary(PROP_NAMES))
+        log(link.summary())
+        log(supervisor.summary())
+        log(log_summary())
+        report()
+
+
+def main():
+    """Run the props on their own (main.py runs them together with the sounds)."""
+    open_log_file(os.path.join(LOG_DIR, "props.log"))
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    # One streaming detector per sensor, fed from paho's thread and awaited by the prop coroutines
+    sensor_queues = SensorQueues(list(PROP_TIMELINES), DETECT_HIGHS, DETECT_WINDOW, SENSOR_THRESHOLD)
+    link = MqttLink("server_props", log=log)
+    link.route_sensors(sensor_queues.device_ids, sensor_queues.put_threadsafe)
+
+    attach(link, sensor_queues)
+    supervisor = Supervisor("props", loop, link.publish, log)
+    create_tasks(supervisor)
+    supervisor.start("report", lambda: event_loop(sensor_queues, link, supervisor))
+    supervisor.start_heartbeat()
+    metrics_server = start_metrics(PROPS_METRICS_PORT, loop, sensor_queues, PROP_NAMES, link,
+                                   [metrics, supervisor.metrics], log)
+    sensor_queues.bind(loop)
+    link.start()
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        supervisor.cancel_all()
+        shutdown()
+        log(sensor_queues.summary(PROP_NAMES))
+        log(link.summary())
+        log(supervisor.summary())
+        log(log_summary())
+        link.stop()
+        if metrics_server is not None:
+            metrics_server.stop()
 
 
 # Start the event loop
 if __name__ == "__main__":
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    loop.create_task(event_loop())
-    loop.create_task(process_queue_PROP3())
-    loop.create_task(process_queue_PROP5())
-    loop.create_task(process_queue_PROP6())
-    client.loop_start()
-    loop.run_forever()
+    main()
@@ -2,12 +2,24 @@
 
 
 import asyncio
+import os
 import time
-import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 import sounddevice as sd
-import soundfile as sf
-import paho.mqtt.client as mqtt
-from paho.mqtt.client import CallbackAPIVersion
+from audioAssets import DEFAULT_SAMPLE_RATE, load_asset, page_in
+from audioDevice import DeviceResolver
+from audioGains import file_gain, scene_gain, stale_files
+from audioMixer import Mixer, Voice, make_routes
+from audioStream import StreamingVoice
+from houseConfig import (PROP1, PROP2, PROP3, PROP4, PROP6, SENSOR_IDS, PROP_NAMES, SENSOR_THRESHOLD,
+                         DETECT_HIGHS, DETECT_WINDOW, STATS_REPORT_SECONDS, LOG_DIR, SOUNDS_METRICS_PORT, PATH_MODEL_FILE)
+from latency import LatencyTracker
+from logPipeline import log, log_summary, open_log_file
+from metrics import latency_metrics, trigger_metrics, start_metrics
+from mqttLink import MqttLink
+from pathModel import PathModel, Prearmer
+from sensorQueues import SensorQueues
+from supervisor import Supervisor
 
 # Speaker channel mapping:
 # 1-door
@@ -53,436 +65,591 @@ SCARECROW_SOUNDS = [
     ("sound/2025/6_Speaker4.mp3", 4),
     ("sound/2025/6_Speaker5.mp3", 5),
 ]
-
-# Constants for device names
-PROP1 = "60:55:F9:7B:82:40" # DOOR SENSOR
-PROP2 = "60:55:F9:7B:5F:2C" # WITCHES AREA SENSOR
-PROP3 = "54:32:04:46:61:88" # COFFIN SENSOR
-PROP4 = "60:55:F9:7B:60:BC" # BUBBA SENSOR
-PROP6 = "60:55:F9:7B:82:30" # SCARECROW SENSOR
-
-SENSOR_THRESHOLD = 0
+# Ambient beds stream continuously under the scenes: (audio_file, channels, gain)
+# The gain is relative to the file's loudness-normalized level from sound/gains.json
+AMBIENT_BEDS = [
+    ("sound/rain-and-thunderstorm-sounds-378432.mp3", [1, 2, 3, 4, 5], 0.15),
+    ("sound/034046_crows-howling-graveyard-lo-fi-cassette-39little-town39-russia-920526flac-62614.mp3", [1], 0.25),
+    ("sound/creepy-whistles-66703.mp3", [4], 0.2),
+]
+SCENES = {
+    "DOOR": DOOR_SOUNDS,
+    "WITCHES": WITCHES_SOUNDS,
+    "COFFIN": COFFIN_SOUNDS,
+    "BUBBA": BUBBA_SOUNDS,
+    "SCARECROW": SCARECROW_SOUNDS,
+}
+SAMPLE_RATE = DEFAULT_SAMPLE_RATE  # Preferred mixer sample rate; every sound is resampled to the mixer rate once at load time
+scene_cache = {}  # Scene name -> list of (samples, channel, gain), filled at startup by preload_scenes()
+scene_cache_rate = None  # Sample rate the cached scenes were decoded at
+prepared_voices = {}  # Scene name -> mixer Voices built ahead of a predicted trigger by prepare_scene()
+PREWARM_SECONDS = 5.0  # Audio paged in ahead of a predicted scene (the kernel reads ahead of the rest while it plays)
+device_resolver = DeviceResolver(AUDIO_DEVICE, samplerate=SAMPLE_RATE)  # Scans once, rescans on failure
+mixer = None  # Persistent output stream, opened at startup by start_mixer()
+ambient_voices = []  # StreamingVoices started by start_ambient_beds()
+latency = LatencyTracker()  # Trigger-to-DAC latency per scene
+start_latency = LatencyTracker()  # The same latencies split into "prepared" and "cold" starts (see pathModel.py)
+audio_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="audio")  # Runs all loading and mixer control, in order
+
+SCENE_SENSORS = {PROP1: "DOOR", PROP2: "WITCHES", PROP3: "COFFIN", PROP4: "BUBBA", PROP6: "SCARECROW"}  # Sensor -> scene
 COOLDOWN_SECONDS = 10  # Minimum time between runs for each prop
 MIN_SOUND_PLAY_TIME = 5  # Minimum seconds a sound must play before being interrupted
-sound_started_time = 0  # Track when current sound started playing
-last_run_time = {PROP1: 0, PROP2: 0, PROP3: 0, PROP4: 0, PROP6: 0}  # Track last run time for each prop
-
-# Dictionary to store lists for each device
-queues = {
-    PROP1: [],
-    PROP2: [],
-    PROP3: [],
-    PROP4: [],
-    PROP6: []
-}
+sound_started_time = float('-inf')  # Monotonic time the current sound started playing
+last_run_time = dict.fromkeys(SCENE_SENSORS, float('-inf'))  # Monotonic last run time of each prop
+listeners = {}  # Scene sensor -> DetectionListener, filled by attach()
+clock = time.monotonic  # Cooldown clock (replaySensors.py swaps in its virtual clock)
+scene_player = None  # Coroutine that plays a scene, set by attach() (play_scene_async unless replaying)
 
-# Define MQTT parameters
-mqtt_broker = "192.168.86.2"
-client = mqtt.Client(CallbackAPIVersion.VERSION2, client_id="server_sounds")
-client.connect(mqtt_broker)
+# Per-scene trigger counters, preallocated so counting is a single dict store (served by metrics.py)
+triggers = dict.fromkeys(SCENE_SENSORS, 0)
+suppressed_cooldown = dict.fromkeys(SCENE_SENSORS, 0)  # Detections during the scene's cooldown
+suppressed_busy = dict.fromkeys(SCENE_SENSORS, 0)  # Detections while another sound hadn't played long enough
 
-# Simple logging function with timestamp
-def log(message):
-    timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime()) + f".{int(time.time() * 1000) % 1000:03d}"
-    print(f"[{timestamp}] {message}")
 
 # Audio playback functions
-def find_device_by_name(name):
-    """Find device index by name (partial match)."""
-    devices = sd.query_devices()
-    for idx, device in enumerate(devices):
-        if name.lower() in device['name'].lower():
-            return idx
-    return None
+def start_mixer():
+    """
+    Open the long-lived output stream on the audio device.
+    Every scene is played through this one mixer instead of sd.play().
 
-def play_sound_on_channel(audio_file, channel, device_name):
+    Returns:
+        True if the mixer is running
     """
-    Play an audio file on a specific channel.
-    Stops any currently playing audio first.
+    global mixer
+    device = device_resolver.resolve()
+    if device is None:
+        log(f"Error: Audio device '{AUDIO_DEVICE}' not found")
+        return False
+
+    try:
+        mixer = Mixer(device.index, device.samplerate, device.channels)
+        mixer.start()
+    except sd.PortAudioError as e:
+        log(f"Error opening audio device '{device.name}': {e}")
+        mixer = None
+        return False
+
+    log(f"Mixer started on {device.name} [{device.index}] ({device.channels} channels, {device.samplerate} Hz)")
+    return True
+
+def restart_mixer():
     """
-    # Stop any currently playing audio
-    sd.stop()
+    Re-resolve the audio device after a playback failure (e.g. USB hot-unplug) and reopen the mixer.
 
-    # Find device
-    device_idx = find_device_by_name(device_name)
-    if device_idx is None:
-        log(f"Error: Audio device '{device_name}' not found")
-        return
+    Returns:
+        True if the mixer is running again
+    """
+    global mixer
+    if mixer is not None:
+        mixer.close()
+        mixer = None
+
+    device_resolver.rescan()
+    log(f"Rescanned audio devices in {device_resolver.last_rescan_ms:.1f} ms "
+        f"(rescan #{device_resolver.rescan_count})")
+    if not device_resolver.hotplug:
+        log("This sounddevice version can't re-initialize PortAudio: a re-plugged interface needs a restart")
+    prepared_voices.clear()  # Routed for the old device
+    if not start_mixer():
+        return False
+
+    # Scenes are cached at the mixer rate, so a device at a new rate needs them decoded again
+    if mixer.samplerate != scene_cache_rate:
+        preload_scenes()
+    start_ambient_beds()
+    return True
+
+def start_ambient_beds():
+    """
+    Start streaming every bed in AMBIENT_BEDS on its channels.
+    Beds loop forever with constant memory and keep playing under triggered scenes.
+    """
+    global ambient_voices
+    for voice in ambient_voices:
+        voice.done = True  # Stops the old decode threads
+    ambient_voices = []
 
-    device_info = sd.query_devices(device_idx)
-    max_channels = device_info['max_output_channels']
+    for audio_file, channels, bed_gain in AMBIENT_BEDS:
+        gain = bed_gain * (file_gain(audio_file) or 1.0)
+        try:
+            voice = StreamingVoice(audio_file, make_routes(channels, mixer.channels), mixer.samplerate, gain=gain)
+            voice.start()
+        except Exception as e:
+            log(f"Error starting ambient bed {audio_file}: {e}")
+            continue
+        mixer.add_voices([voice], replace=False)
+        ambient_voices.append(voice)
+        channel_str = ', '.join(map(str, channels))
+        log(f"Streaming {audio_file} on channels {channel_str} (gain {gain:.2f})")
+
+def ensure_mixer():
+    """Return True if the mixer is running, re-resolving the device if playback has failed."""
+    if mixer is not None and mixer.is_active:
+        return True
+    log("Audio stream is not running, re-resolving audio device")
+    return restart_mixer()
 
-    if channel < 1 or channel > max_channels:
-        log(f"Error: Channel {channel} out of range (1-{max_channels})")
+def play_sound_on_channel(audio_file, channel, device_name):
+    """
+    Play an audio file on a specific channel.
+    Replaces whatever is playing on that channel.
+    """
+    if not ensure_mixer():
+        log(f"Error: Audio device '{device_name}' not available")
         return
 
-    # Load audio file
-    data, sample_rate = sf.read(audio_file, dtype='float32')
-
-    # Handle stereo/mono - mix to mono
-    if len(data.shape) == 2:  # Stereo
-        samples = data.mean(axis=1)
-    else:  # Mono
-        samples = data
-
-    # Create multi-channel output array (all channels silent except target)
-    output = np.zeros((len(samples), max_channels), dtype=np.float32)
-    output[:, channel - 1] = samples  # channel-1 for 0-indexed
-
-    # Play audio in the background (non-blocking)
-    sd.play(output, samplerate=sample_rate, device=device_idx)
+    samples = load_asset(audio_file, mixer.samplerate)
+    try:
+        mixer.play(samples, channel, gain=file_gain(audio_file) or 1.0)
+    except ValueError as e:
+        log(f"Error: {e}")
+        return
 
-    duration = len(samples) / sample_rate
+    duration = len(samples) / mixer.samplerate
     log(f"Playing {audio_file} on channel {channel} ({duration:.2f}s)")
 
 def play_sound_on_multiple_channels(audio_file, channels, device_name):
     """
     Play an audio file on multiple channels simultaneously.
-    Stops any currently playing audio first.
+    Replaces whatever is playing on those channels.
     """
-    # Stop any currently playing audio
-    sd.stop()
-
-    # Find device
-    device_idx = find_device_by_name(device_name)
-    if device_idx is None:
-        log(f"Error: Audio device '{device_name}' not found")
+    if not ensure_mixer():
+        log(f"Error: Audio device '{device_name}' not available")
         return
 
-    device_info = sd.query_devices(device_idx)
-    max_channels = device_info['max_output_channels']
-
     # Validate all channels
     for channel in channels:
-        if channel < 1 or channel > max_channels:
-            log(f"Error: Channel {channel} out of range (1-{max_channels})")
+        if channel < 1 or channel > mixer.channels:
+            log(f"Error: Channel {channel} out of range (1-{mixer.channels})")
             return
 
-    # Load audio file
-    data, sample_rate = sf.read(audio_file, dtype='float32')
+    samples = load_asset(audio_file, mixer.samplerate)
+
+    # One voice routed to every channel, the samples are never copied per channel
+    mixer.play(samples, channels, gain=file_gain(audio_file) or 1.0)
 
-    # Handle stereo/mono - mix to mono
-    if len(data.shape) == 2:  # Stereo
-        samples = data.mean(axis=1)
-    else:  # Mono
-        samples = data
+    duration = len(samples) / mixer.samplerate
+    channel_str = ', '.join(map(str, channels))
+    log(f"Playing {audio_file} on channels {channel_str} ({duration:.2f}s)")
 
-    # Create multi-channel output array
-    output = np.zeros((len(samples), max_channels), dtype=np.float32)
+def load_scene_voices(audio_specs, sample_rate):
+    """
+    Load a scene's audio files as per-channel mono buffers.
+    Files come from the decoded-PCM cache (memory-mapped), so only changed MP3s are decoded.
+    Each buffer is paired with its precomputed scene gain from sound/gains.json.
 
-    # Add the same audio to all specified channels
-    for channel in channels:
-        output[:, channel - 1] = samples  # channel-1 for 0-indexed
+    Args:
+        audio_specs: List of (audio_file, channel) tuples
+        sample_rate: Sample rate to resample every file to
+
+    Returns:
+        List of (samples, channel, gain) tuples, or None if any file could not be loaded
+    """
+    voices = []
+    for audio_file, channel in audio_specs:
+        try:
+            samples = load_asset(audio_file, sample_rate)
+            voices.append((samples, channel, scene_gain(audio_file, samples)))
+        except Exception as e:
+            log(f"Error loading {audio_file}: {e}")
+            return None
+    return voices
 
-    # Play audio in the background (non-blocking)
-    sd.play(output, samplerate=sample_rate, device=device_idx)
+def play_voices(voices, label, received_ns=None, prepared=None):
+    """
+    Start a set of (samples, channel, gain) voices together on the mixer.
+    Each voice replaces whatever is playing on its channel; other channels keep playing.
 
-    duration = len(samples) / sample_rate
-    channel_str = ', '.join(map(str, channels))
-    log(f"Playing {audio_file} on channels {channel_str} ({duration:.2f}s)")
+    Args:
+        voices: List of (samples, channel, gain) tuples
+        label: Name for logging and latency tracking
+        received_ns: Monotonic receipt time of the triggering sensor message, if any
+        prepared: The same voices already built as mixer Voices by prepare_scene(), if any
+    """
+    try:
+        started = mixer.add_voices(prepared) if prepared else mixer.play_together(voices)
+    except ValueError as e:
+        log(f"Error: {e}")
+        return
+    latency.track(label, received_ns, started)
+    start_latency.track("prepared" if prepared else "cold", received_ns, started)
 
-def play_different_sounds_on_channels(audio_specs, device_name):
+    duration = max(len(samples) for samples, _, _ in voices) / mixer.samplerate
+    channel_str = ', '.join(str(ch) for _, ch, _ in voices)
+    log(f"Playing {label} on channels {channel_str} ({duration:.2f}s)")
+
+def play_different_sounds_on_channels(audio_specs, device_name, label=None, received_ns=None):
     """
     Play different audio files on different channels simultaneously.
-    Stops any currently playing audio first.
+    Replaces whatever is playing on those channels.
 
     Args:
         audio_specs: List of (audio_file, channel) tuples
         device_name: Audio device name
+        label: Scene name for logging and latency tracking
+        received_ns: Monotonic receipt time of the triggering sensor message, if any
     """
-    # Stop any currently playing audio
-    sd.stop()
-
-    # Find device
-    device_idx = find_device_by_name(device_name)
-    if device_idx is None:
-        log(f"Error: Audio device '{device_name}' not found")
+    if not ensure_mixer():
+        log(f"Error: Audio device '{device_name}' not available")
         return
 
-    device_info = sd.query_devices(device_idx)
-    max_channels = device_info['max_output_channels']
+    voices = load_scene_voices(audio_specs, mixer.samplerate)
+    if not voices:
+        log("Error: No audio files loaded successfully")
+        return
 
-    # Load all audio files
-    loaded_audio = []
-    max_sample_rate = 0
-    max_length = 0
+    play_voices(voices, label or f"{len(voices)} sounds", received_ns)
 
-    for audio_file, channel in audio_specs:
-        if channel < 1 or channel > max_channels:
-            log(f"Error: Channel {channel} out of range (1-{max_channels})")
-            return
+def preload_scenes():
+    """
+    Load every scene in SCENES once and keep the ready-to-play buffers in scene_cache.
+    Scenes are decoded at the mixer's sample rate (SAMPLE_RATE if no mixer is running).
+    Logs the decode time and memory used by each scene.
+    """
+    global scene_cache_rate
+    scene_cache_rate = mixer.samplerate if mixer is not None else SAMPLE_RATE
+    scene_cache.clear()
+    total_bytes = 0
+    for scene_name, audio_specs in SCENES.items():
+        start = time.perf_counter()
+        voices = load_scene_voices(audio_specs, scene_cache_rate)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if voices is None:
+            log(f"Error: Could not preload {scene_name}, it will be decoded on trigger")
+            continue
+        scene_cache[scene_name] = voices
+        scene_bytes = sum(samples.nbytes for samples, _, _ in voices)
+        duration = max(len(samples) for samples, _, _ in voices) / scene_cache_rate
+        total_bytes += scene_bytes
+        log(f"Preloaded {scene_name}: {duration:.2f}s, "
+            f"{scene_bytes / 1e6:.1f} MB mapped, loaded in {elapsed_ms:.0f} ms")
+    log(f"Preloaded {len(scene_cache)}/{len(SCENES)} scenes ({total_bytes / 1e6:.1f} MB total)")
+    if stale_files():
+        log(f"Warning: {', '.join(stale_files())} changed since the loudness analysis, "
+            "peak-matched instead (re-run audioGains.py)")
+
+def play_scene(scene_name, device_name, received_ns=None):
+    """
+    Play a preloaded scene from scene_cache.
+    Falls back to decoding from disk if the scene was not preloaded.
 
-        try:
-            # Load audio file
-            data, sample_rate = sf.read(audio_file, dtype='float32')
+    Args:
+        scene_name: Key into SCENES
+        device_name: Audio device name
+        received_ns: Monotonic receipt time of the triggering sensor message, for latency tracking
+    """
+    if not ensure_mixer():
+        log(f"Error: Audio device '{device_name}' not available")
+        return
 
-            # Handle stereo/mono - mix to mono
-            if len(data.shape) == 2:  # Stereo
-                samples = data.mean(axis=1)
-            else:  # Mono
-                samples = data
+    if scene_name not in scene_cache:
+        play_different_sounds_on_channels(SCENES[scene_name], device_name, scene_name, received_ns)
+        return
 
-            loaded_audio.append({
-                'samples': samples,
-                'sample_rate': sample_rate,
-                'channel': channel,
-                'file': audio_file
-            })
+    play_voices(scene_cache[scene_name], scene_name, received_ns, prepared_voices.pop(scene_name, None))
 
-            max_sample_rate = max(max_sample_rate, sample_rate)
-            max_length = max(max_length, len(samples))
+def prepare_scene(scene_name):
+    """
+    Get a scene ready ahead of a predicted trigger (see pathModel.py). Decodes it if it wasn't
+    preloaded, pages its first PREWARM_SECONDS into memory and builds its mixer voices, which
+    the next play_scene() starts as they are. Voices aren't pre-opened on the mixer at zero
+    gain: they would advance while silent and replace what is playing on their channels.
+    Runs on the audio thread, like play_scene().
+
+    Returns:
+        Milliseconds of work done ahead of the trigger
+    """
+    start = time.perf_counter()
+    rate = scene_cache_rate or SAMPLE_RATE
+    if scene_name not in scene_cache:
+        voices = load_scene_voices(SCENES[scene_name], rate)
+        if voices is None:
+            return 0.0
+        scene_cache[scene_name] = voices
+    for samples, _, _ in scene_cache[scene_name]:
+        page_in(samples, int(PREWARM_SECONDS * rate))
+    if mixer is not None:
+        prepared_voices[scene_name] = [Voice(samples, make_routes(channel, mixer.channels), gain)
+                                       for samples, channel, gain in scene_cache[scene_name]]
+    return (time.perf_counter() - start) * 1000
+
+async def prewarm(device_id):
+    """pathModel.Prearmer warmer: prepare the scene of a sensor that will probably fire soon."""
+    scene_name = SCENE_SENSORS.get(device_id)
+    if scene_name is None:
+        return 0.0
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(audio_executor, prepare_scene, scene_name)
+
+async def play_scene_async(scene_name, device_name, received_ns=None):
+    """
+    Run play_scene() on the audio thread and wait for it to be handed to the mixer.
+    Disk reads, decoding and device rescans happen there, so the event loop (and every
+    other prop's queue) keeps running while a scene is being prepared.
 
-        except Exception as e:
-            log(f"Error loading {audio_file}: {e}")
-            return
+    Args:
+        scene_name: Key into SCENES
+        device_name: Audio device name
+        received_ns: Monotonic receipt time of the triggering sensor message, for latency tracking
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(audio_executor, play_scene, scene_name, device_name, received_ns)
+    except Exception as e:
+        log(f"Error playing {scene_name}: {e}")
 
-    if not loaded_audio:
-        log("Error: No audio files loaded successfully")
-        return
+def attach(sensor_queues, clock_fn=time.monotonic, player=None):
+    """
+    Hook the scene handlers up to a sensor pipeline.
+    Used by main() below, by the combined orchestrator in main.py and by replaySensors.py.
 
-    # Resample all audio to the highest sample rate if needed
-    for audio in loaded_audio:
-        if audio['sample_rate'] != max_sample_rate:
-            ratio = max_sample_rate / audio['sample_rate']
-            new_length = int(len(audio['samples']) * ratio)
-            audio['samples'] = np.interp(
-                np.linspace(0, len(audio['samples']) - 1, new_length),
-                np.arange(len(audio['samples'])),
-                audio['samples']
-            )
-            audio['sample_rate'] = max_sample_rate
-            max_length = max(max_length, len(audio['samples']))
-
-    # Create multi-channel output array
-    output = np.zeros((max_length, max_channels), dtype=np.float32)
-
-    # Mix each audio file into its designated channel
-    for audio in loaded_audio:
-        channel_idx = audio['channel'] - 1  # Convert to 0-indexed
-        samples = audio['samples']
-
-        # Pad with silence if shorter than max_length
-        if len(samples) < max_length:
-            padded = np.zeros(max_length, dtype=np.float32)
-            padded[:len(samples)] = samples
-            samples = padded
-
-        # Add to the output channel
-        output[:, channel_idx] = samples
-
-    # Play audio in the background (non-blocking)
-    sd.play(output, samplerate=max_sample_rate, device=device_idx)
-
-    duration = max_length / max_sample_rate
-    channel_str = ', '.join(str(ch) for _, ch in audio_specs)
-    log(f"Playing {len(audio_specs)} sounds on channels {channel_str} ({duration:.2f}s)")
-
-# Function to handle MQTT messages
-def on_message(client, userdata, message, properties=None):
-    device_id = message.topic.split("/")[1]  # Extract device ID from the topic
-    if device_id in queues:
-        queues[device_id].append(message)
-
-# Set up MQTT subscription with updated topic names
-for device_id in queues:
-    client.subscribe(f"device/{device_id}/sensor")  # Updated topic for subscription
-client.on_message = on_message
+    Args:
+        sensor_queues: SensorQueues tracking at least the scenes' sensors
+        clock_fn: Monotonic clock in seconds for the cooldowns (the event loop's clock when replaying)
+        player: Coroutine function called as player(scene_name, device_name, received_ns)
+            instead of play_scene_async (e.g. to record scenes rather than play them)
+    """
+    global clock, scene_player
+    clock = clock_fn
+    scene_player = player or play_scene_async
+    for device_id in SCENE_SENSORS:
+        listeners[device_id] = sensor_queues.listen(device_id)
+
+def start_audio():
+    """Open the mixer, start the ambient beds and preload every scene."""
+    if start_mixer():
+        start_ambient_beds()
+    log(f"Resolved audio device in {device_resolver.last_rescan_ms:.1f} ms")
+    preload_scenes()
+
+def create_tasks(supervisor):
+    """Start one supervised handler task per scene, plus the latency collector."""
+    supervisor.start("sounds.latency", poll_latency)
+    supervisor.start("sounds.DOOR", process_queue_PROP1)
+    supervisor.start("sounds.WITCHES", process_queue_PROP2)
+    supervisor.start("sounds.COFFIN", process_queue_PROP3)
+    supervisor.start("sounds.BUBBA", process_queue_PROP4)
+    supervisor.start("sounds.SCARECROW", process_queue_PROP6)
+
+def count_suppressed(device_id, cooled_down):
+    """Count a detection that didn't play its scene: still cooling down, or the current sound is too new."""
+    (suppressed_busy if cooled_down else suppressed_cooldown)[device_id] += 1
+
+def metrics():
+    """Trigger counters and trigger-to-sound latency histograms for the /metrics endpoint."""
+    return (trigger_metrics("sounds", PROP_NAMES, triggers, suppressed_cooldown, suppressed_busy)
+            + latency_metrics("haunted_sound_latency_seconds", "Sensor message to first sample at the DAC",
+                              latency)
+            + latency_metrics("haunted_sound_start_latency_seconds",
+                              "Sensor message to first sample at the DAC by start (prepared or cold)",
+                              start_latency, label="start"))
+
+def report():
+    """Log trigger-to-sound latency percentiles."""
+    latency.poll()
+    for line in latency.summary_lines():
+        log(line)
+
+def shutdown():
+    """Write the latency histograms collected this run and close the audio device."""
+    report()
+    latency_path = time.strftime('data/latency_%Y%m%d_%H%M%S.json')
+    latency.write(latency_path)
+    log(f"Latency report written to {latency_path}")
+    audio_executor.shutdown(wait=True, cancel_futures=True)  # Let a scene that is being started finish first
+    if mixer is not None:
+        mixer.close()
+
+async def poll_latency():
+    while True:
+        # Collect trigger-to-sound latencies every .5 seconds
+        await asyncio.sleep(0.5)
+        latency.poll()
+        start_latency.poll()
 
 
 # DOOR
 async def process_queue_PROP1():
     global sound_started_time
     while True:
-        await asyncio.sleep(0.3)
-        if len(queues[PROP1]) >= 2:
-            # Copy the queue and keep the last message for next cycle
-            messages = queues[PROP1][:]
-            queues[PROP1] = [messages[-1]]  # Keep last message to check consecutive across cycles
-
-            payloads = [int(message.payload.decode()) for message in messages]  # Extract payloads as integers
-            log(f"PROP1 Payloads: {payloads}  # DOOR")
-
-            # Check for two consecutive payloads > SENSOR_THRESHOLD
-            consecutive_high = False
-            for i in range(len(payloads) - 1):
-                if payloads[i] > SENSOR_THRESHOLD and payloads[i + 1] > SENSOR_THRESHOLD:
-                    consecutive_high = True
-                    break
-
-            # Check cooldown and if current sound has played long enough
-            current_time = time.time()
-            time_since_last_run = current_time - last_run_time[PROP1]
-            time_since_sound_started = current_time - sound_started_time
-
-            if consecutive_high and time_since_last_run >= COOLDOWN_SECONDS + 40 and time_since_sound_started >= MIN_SOUND_PLAY_TIME:
-                last_run_time[PROP1] = current_time
-                sound_started_time = current_time
-                log("DOOR triggered")
-                # Play different sounds on each speaker channel
-                play_different_sounds_on_channels(DOOR_SOUNDS, AUDIO_DEVICE)
-                await asyncio.sleep(10)  # Delay after running the prop
-                queues[PROP1] = []  # Clear all events that came in during the delay
+        # Wake as soon as the sensor's detector fires
+        received_ns = await listeners[PROP1].get()
+
+        # Check cooldown and if current sound has played long enough
+        current_time = clock()  # Monotonic, immune to wall-clock (NTP) jumps
+        time_since_last_run = current_time - last_run_time[PROP1]
+        time_since_sound_started = current_time - sound_started_time
+
+        if time_since_last_run >= COOLDOWN_SECONDS + 40 and time_since_sound_started >= MIN_SOUND_PLAY_TIME:
+            last_run_time[PROP1] = current_time
+            triggers[PROP1] += 1
+            sound_started_time = current_time
+            log("DOOR triggered")
+            # Play the preloaded scene on its speaker channels (prepared on the audio thread)
+            await scene_player("DOOR", AUDIO_DEVICE, received_ns)
+            await asyncio.sleep(10)  # Delay after running the prop
+            listeners[PROP1].reset()  # Ignore detections from readings that came in during the delay
+        else:
+            count_suppressed(PROP1, time_since_last_run >= COOLDOWN_SECONDS + 40)
 
 
 # WITCHES
 async def process_queue_PROP2():
     global sound_started_time
     while True:
-        await asyncio.sleep(0.3)
-        if len(queues[PROP2]) >= 2:
-            # Copy the queue and keep the last message for next cycle
-            messages = queues[PROP2][:]
-            queues[PROP2] = [messages[-1]]  # Keep last message to check consecutive across cycles
-
-            payloads = [int(message.payload.decode()) for message in messages]  # Extract payloads as integers
-            log(f"PROP2 Payloads: {payloads}  # WITCHES")
-
-            # Check for two consecutive payloads > SENSOR_THRESHOLD
-            consecutive_high = False
-            for i in range(len(payloads) - 1):
-                if payloads[i] > SENSOR_THRESHOLD and payloads[i + 1] > SENSOR_THRESHOLD:
-                    consecutive_high = True
-                    break
-
-            # Check cooldown and if current sound has played long enough
-            current_time = time.time()
-            time_since_last_run = current_time - last_run_time[PROP2]
-            time_since_sound_started = current_time - sound_started_time
-
-            if consecutive_high and time_since_last_run >= COOLDOWN_SECONDS and time_since_sound_started >= MIN_SOUND_PLAY_TIME:
-                last_run_time[PROP2] = current_time
-                sound_started_time = current_time
-                log("WITCHES triggered")
-                # Play different sounds on each speaker channel
-                play_different_sounds_on_channels(WITCHES_SOUNDS, AUDIO_DEVICE)
-                await asyncio.sleep(10)  # Delay after running the prop
-                queues[PROP2] = []  # Clear all events that came in during the delay
+        # Wake as soon as the sensor's detector fires
+        received_ns = await listeners[PROP2].get()
+
+        # Check cooldown and if current sound has played long enough
+        current_time = clock()  # Monotonic, immune to wall-clock (NTP) jumps
+        time_since_last_run = current_time - last_run_time[PROP2]
+        time_since_sound_started = current_time - sound_started_time
+
+        if time_since_last_run >= COOLDOWN_SECONDS and time_since_sound_started >= MIN_SOUND_PLAY_TIME:
+            last_run_time[PROP2] = current_time
+            triggers[PROP2] += 1
+            sound_started_time = current_time
+            log("WITCHES triggered")
+            # Play the preloaded scene on its speaker channels (prepared on the audio thread)
+            await scene_player("WITCHES", AUDIO_DEVICE, received_ns)
+            await asyncio.sleep(10)  # Delay after running the prop
+            listeners[PROP2].reset()  # Ignore detections from readings that came in during the delay
+        else:
+            count_suppressed(PROP2, time_since_last_run >= COOLDOWN_SECONDS)
 
 
 # COFFIN
 async def process_queue_PROP3():
     global sound_started_time
     while True:
-        await asyncio.sleep(0.3)
-        if len(queues[PROP3]) >= 2:
-            # Copy the queue and keep the last message for next cycle
-            messages = queues[PROP3][:]
-            queues[PROP3] = [messages[-1]]  # Keep last message to check consecutive across cycles
-
-            payloads = [int(message.payload.decode()) for message in messages]  # Extract payloads as integers
-            log(f"PROP3 Payloads: {payloads}  # COFFIN")
-
-            # Check for two consecutive payloads > SENSOR_THRESHOLD
-            consecutive_high = False
-            for i in range(len(payloads) - 1):
-                if payloads[i] > SENSOR_THRESHOLD and payloads[i + 1] > SENSOR_THRESHOLD:
-                    consecutive_high = True
-                    break
-
-            # Check cooldown and if current sound has played long enough
-            current_time = time.time()
-            time_since_last_run = current_time - last_run_time[PROP3]
-            time_since_sound_started = current_time - sound_started_time
-
-            if consecutive_high and time_since_last_run >= COOLDOWN_SECONDS and time_since_sound_started >= MIN_SOUND_PLAY_TIME:
-                last_run_time[PROP3] = current_time
-                sound_started_time = current_time
-                log("COFFIN triggered")
-                # Play different sounds on each speaker channel
-                play_different_sounds_on_channels(COFFIN_SOUNDS, AUDIO_DEVICE)
-                await asyncio.sleep(10)  # Delay after running the prop
-                queues[PROP3] = []  # Clear all events that came in during the delay
+        # Wake as soon as the sensor's detector fires
+        received_ns = await listeners[PROP3].get()
+
+        # Check cooldown and if current sound has played long enough
+        current_time = clock()  # Monotonic, immune to wall-clock (NTP) jumps
+        time_since_last_run = current_time - last_run_time[PROP3]
+        time_since_sound_started = current_time - sound_started_time
+
+        if time_since_last_run >= COOLDOWN_SECONDS and time_since_sound_started >= MIN_SOUND_PLAY_TIME:
+            last_run_time[PROP3] = current_time
+            triggers[PROP3] += 1
+            sound_started_time = current_time
+            log("COFFIN triggered")
+            # Play the preloaded scene on its speaker channels (prepared on the audio thread)
+            await scene_player("COFFIN", AUDIO_DEVICE, received_ns)
+            await asyncio.sleep(10)  # Delay after running the prop
+            listeners[PROP3].reset()  # Ignore detections from readings that came in during the delay
+        else:
+            count_suppressed(PROP3, time_since_last_run >= COOLDOWN_SECONDS)
 
 
 # BUBBA
 async def process_queue_PROP4():
     global sound_started_time
     while True:
-        await asyncio.sleep(0.3)
-        if len(queues[PROP4]) >= 2:
-            # Copy the queue and keep the last message for next cycle
-            messages = queues[PROP4][:]
-            queues[PROP4] = [messages[-1]]  # Keep last message to check consecutive across cycles
-
-            payloads = [int(message.payload.decode()) for message in messages]  # Extract payloads as integers
-            log(f"PROP4 Payloads: {payloads}  # BUBBA")
-
-            # Check for two consecutive payloads > SENSOR_THRESHOLD
-            consecutive_high = False
-            for i in range(len(payloads) - 1):
-                if payloads[i] > SENSOR_THRESHOLD and payloads[i + 1] > SENSOR_THRESHOLD:
-                    consecutive_high = True
-                    break
-
-            # Check cooldown and if current sound has played long enough
-            current_time = time.time()
-            time_since_last_run = current_time - last_run_time[PROP4]
-            time_since_sound_started = current_time - sound_started_time
-
-            if consecutive_high and time_since_last_run >= COOLDOWN_SECONDS and time_since_sound_started >= MIN_SOUND_PLAY_TIME:
-                last_run_time[PROP4] = current_time
-                sound_started_time = current_time
-                log("BUBBA triggered")
-                # Play different sounds on each speaker channel
-                play_different_sounds_on_channels(BUBBA_SOUNDS, AUDIO_DEVICE)
-                await asyncio.sleep(10)  # Delay after running the prop
-                queues[PROP4] = []  # Clear all events that came in during the delay
+        # Wake as soon as the sensor's detector fires
+        received_ns = await listeners[PROP4].get()
+
+        # Check cooldown and if current sound has played long enough
+        current_time = clock()  # Monotonic, immune to wall-clock (NTP) jumps
+        time_since_last_run = current_time - last_run_time[PROP4]
+        time_since_sound_started = current_time - sound_started_time
+
+        if time_since_last_run >= COOLDOWN_SECONDS and time_since_sound_started >= MIN_SOUND_PLAY_TIME:
+            last_run_time[PROP4] = current_time
+            triggers[PROP4] += 1
+            sound_started_time = current_time
+            log("BUBBA triggered")
+            # Play the preloaded scene on its speaker channels (prepared on the audio thread)
+            await scene_player("BUBBA", AUDIO_DEVICE, received_ns)
+            await asyncio.sleep(10)  # Delay after running the prop
+            listeners[PROP4].reset()  # Ignore detections from readings that came in during the delay
+        else:
+            count_suppressed(PROP4, time_since_last_run >= COOLDOWN_SECONDS)
 
 
 # SCARECROW
 async def process_queue_PROP6():
     global sound_started_time
     while True:
-        await asyncio.sleep(0.3)
-        if len(queues[PROP6]) >= 2:
-            # Copy the queue and keep the last message for next cycle
-            messages = queues[PROP6][:]
-            queues[PROP6] = [messages[-1]]  # Keep last message to check consecutive across cycles
-
-            payloads = [int(message.payload.decode()) for message in messages]  # Extract payloads as integers
-            log(f"PROP6 Payloads: {payloads}  # SCARECROW")
-
-            # Check for two consecutive payloads > SENSOR_THRESHOLD
-            consecutive_high = False
-            for i in range(len(payloads) - 1):
-                if payloads[i] > SENSOR_THRESHOLD and payloads[i + 1] > SENSOR_THRESHOLD:
-                    consecutive_high = True
-                    break
-
-            # Check cooldown and if current sound has played long enough
-            current_time = time.time()
-            time_since_last_run = current_time - last_run_time[PROP6]
-            time_since_sound_started = current_time - sound_started_time
-
-            if consecutive_high and time_since_last_run >= COOLDOWN_SECONDS and time_since_sound_started >= MIN_SOUND_PLAY_TIME:
-                last_run_time[PROP6] = current_time
-                sound_started_time = current_time
-                log("SCARECROW triggered")
-                # Play different sounds on each speaker channel
-                play_different_sounds_on_channels(SCARECROW_SOUNDS, AUDIO_DEVICE)
-                await asyncio.sleep(10)  # Delay after running the prop
-                queues[PROP6] = []  # Clear all events that came in during the delay
+        # Wake as soon as the sensor's detector fires
+        received_ns = await listeners[PROP6].get()
+
+        # Check cooldown and if current sound has played long enough
+        current_time = clock()  # Monotonic, immune to wall-clock (NTP) jumps
+        time_since_last_run = current_time - last_run_time[PROP6]
+        time_since_sound_started = current_time - sound_started_time
+
+        if time_since_last_run >= COOLDOWN_SECONDS and time_since_sound_started >= MIN_SOUND_PLAY_TIME:
+            last_run_time[PROP6] = current_time
+            triggers[PROP6] += 1
+            sound_started_time = current_time
+            log("SCARECROW triggered")
+            # Play the preloaded scene on its speaker channels (prepared on the audio thread)
+            await scene_player("SCARECROW", AUDIO_DEVICE, received_ns)
+            await asyncio.sleep(10)  # Delay after running the prop
+            listeners[PROP6].reset()  # Ignore detections from readings that came in during the delay
+        else:
+            count_suppressed(PROP6, time_since_last_run >= COOLDOWN_SECONDS)
 
 
 # Define the event loop
-async def event_loop():
+async def event_loop(sensor_queues, link, supervisor, prearmer):
     while True:
-        # All this main loop does is print the current time every .5 seconds
-        await asyncio.sleep(0.5)
-        current_time = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime()) + f".{int(time.time() * 1000) % 1000:03d}"
-        # print(current_time)
+        # All this main loop does is report latency and the sensor counters periodically
+        await asyncio.sleep(STATS_REPORT_SECONDS)
+        report()
+        log(sensor_queues.summary(PROP_NAMES))
+        log(link.summary())
+        log(supervisor.summary())
+        log(prearmer.summary(PROP_NAMES))
+        log(log_summary())
+
+
+def main():
+    """Run the sounds on their own (main.py runs them together with the props)."""
+    open_log_file(os.path.join(LOG_DIR, "sounds.log"))
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    # One streaming detector per sensor, fed from paho's thread and awaited by the scene coroutines.
+    # Sensors without a scene are tracked too, so the path model sees the whole walk.
+    sensor_queues = SensorQueues(SENSOR_IDS, DETECT_HIGHS, DETECT_WINDOW, SENSOR_THRESHOLD)
+    link = MqttLink("server_sounds", log=log)
+    link.route_sensors(sensor_queues.device_ids, sensor_queues.put_threadsafe)
+
+    attach(sensor_queues)
+    start_audio()
+    supervisor = Supervisor("sounds", loop, link.publish, log)
+    create_tasks(supervisor)
+    # Prepare the scenes visitors will probably reach next (see pathModel.py)
+    prearmer = Prearmer(PathModel.load(PATH_MODEL_FILE, SENSOR_IDS), log=log, latency=start_latency)
+    for device_id in SCENE_SENSORS:
+        prearmer.add_warmer(device_id, prewarm)
+    prearmer.create_tasks(supervisor, sensor_queues, PROP_NAMES)
+    supervisor.start("report", lambda: event_loop(sensor_queues, link, supervisor, prearmer))
+    supervisor.start_heartbeat()
+    metrics_server = start_metrics(SOUNDS_METRICS_PORT, loop, sensor_queues, PROP_NAMES, link,
+                                   [metrics, supervisor.metrics, prearmer.metrics], log)
+    sensor_queues.bind(loop)
+    link.start()
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        supervisor.cancel_all()
+        shutdown()
+        log(sensor_queues.summary(PROP_NAMES))
+        log(link.summary())
+        log(supervisor.summary())
+        log(prearmer.summary(PROP_NAMES))
+        log(log_summary())
+        link.stop()
+        if metrics_server is not None:
+            metrics_server.stop()
 
 
 # Start the event loop
 if __name__ == "__main__":
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    loop.create_task(event_loop())
-    loop.create_task(process_queue_PROP1())
-    loop.create_task(process_queue_PROP2())
-    loop.create_task(process_queue_PROP3())
-    loop.create_task(process_queue_PROP4())
-    loop.create_task(process_queue_PROP6())
-
-    client.loop_start()
-    loop.run_forever()
+    main()
@@ -0,0 +1,37 @@
+"""
+Settings shared by every haunted house server process.
+
+The sensor MACs used to be copied into each server, and the copies drifted
+apart (the props server had a stale MAC for the door sensor). They live
+here now, and the servers and main.py import them.
+
+Usage:
+    from houseConfig import MQTT_BROKER, PROP1, PROP_NAMES
+"""
+
+# MQTT broker on the house network (see mosquitto-docker-compose/)
+MQTT_BROKER = "192.168.86.2"
+
+# Constants for device names
+PROP1 = "60:55:F9:7B:82:40" # DOOR SENSOR
+PROP2 = "60:55:F9:7B:5F:2C" # WITCHES AREA SENSOR
+PROP3 = "54:32:04:46:61:88" # COFFIN SENSOR
+PROP4 = "60:55:F9:7B:60:BC" # BUBBA SENSOR
+PROP5 = "60:55:F9:7B:7B:60" # WEREWOLF SENSOR
+PROP6 = "60:55:F9:7B:82:30" # SCARECROW SENSOR
+PROP7 = "54:32:04:46:61:40" # COFFIN ACTUATOR
+
+SENSOR_IDS = [PROP1, PROP2, PROP3, PROP4, PROP5, PROP6]
+PROP_NAMES = {PROP1: "DOOR", PROP2: "WITCHES", PROP3: "COFFIN", PROP4: "BUBBA", PROP5: "WEREWOLF", PROP6: "SCARECROW"}
+
+# Motion detection, the same for every consumer of a sensor
+SENSOR_THRESHOLD = 0
+DETECT_HIGHS = 2  # A sensor fires when DETECT_HIGHS of its last DETECT_WINDOW readings are high
+DETECT_WINDOW = 2
+
+STATS_REPORT_SECONDS = 300  # How often the servers log their counters
+METRICS_PORT = 9108  # Prometheus /metrics on localhost for main.py (see metrics.py); worker I of --workers uses +I
+PROPS_METRICS_PORT = METRICS_PORT + 10  # hauntedHouseLoop2025.py run on its own (./runLoop.sh)
+SOUNDS_METRICS_PORT = METRICS_PORT + 11  # hauntedHouseSounds2025.py run on its own, alongside it (./runSounds.sh)
+LOG_DIR = "logs"  # Rotated log files (house.log, props.log, sounds.log), see logPipeline.py
+PATH_MODEL_FILE = "data/path_model.json"  # Learned by pathModel.py; the house order (SENSOR_IDS) is used without it
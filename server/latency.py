@@ -0,0 +1,143 @@
+"""
+End-to-end trigger-to-sound latency tracking.
+
+Every sensor message is stamped with time.monotonic_ns() when on_message
+receives it. When a scene fires, the stamp of the message that completed
+the detection is handed to track() together with the scene's mixer voices.
+The mixer callback stamps each voice with the monotonic time its first
+sample reaches the DAC, and poll() turns those pairs into per-scene
+latency samples.
+
+Usage:
+    latency = LatencyTracker()
+    voices = mixer.play_together(...)
+    latency.track("DOOR", received_ns, voices)
+    ...
+    latency.poll()  # Periodically, e.g. from the event loop
+    for line in latency.summary_lines():
+        log(line)
+    latency.write("data/latency.json")  # On shutdown
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+import numpy as np
+
+MAX_SAMPLES = 2000  # Most recent latencies kept per scene for percentiles
+BUCKETS_MS = (5, 10, 20, 50, 100, 200, 300, 500, 1000, 2000)  # Histogram upper bounds (plus +Inf)
+PENDING_TIMEOUT_NS = 10_000_000_000  # Give up on a scene whose audio never started
+
+
+class LatencyTracker:
+    """Per-scene trigger-to-DAC latency histograms."""
+
+    def __init__(self, max_samples=MAX_SAMPLES):
+        self.max_samples = max_samples
+        self.samples = {}  # Scene -> deque of latencies in ms
+        self.buckets = {}  # Scene -> list of counts, one per BUCKETS_MS entry plus +Inf
+        self.totals = {}  # Scene -> [count, sum_ms]
+        self.missed = 0  # Tracked scenes whose audio never reached the DAC
+        self._pending = []  # (scene, received_ns, voices)
+        self._lock = threading.Lock()
+
+    def track(self, scene, received_ns, voices):
+        """Remember a triggered scene until the mixer reports its first output time."""
+        if received_ns is None or not voices:
+            return
+        with self._lock:
+            self._pending.append((scene, received_ns, voices))
+
+    def record(self, scene, latency_ms):
+        """Add one latency sample for a scene."""
+        with self._lock:
+            if scene not in self.samples:
+                self.samples[scene] = deque(maxlen=self.max_samples)
+                self.buckets[scene] = [0] * (len(BUCKETS_MS) + 1)
+                self.totals[scene] = [0, 0.0]
+            self.samples[scene].append(latency_ms)
+            bucket = next((i for i, bound in enumerate(BUCKETS_MS) if latency_ms <= bound), len(BUCKETS_MS))
+            self.buckets[scene][bucket] += 1
+            self.totals[scene][0] += 1
+            self.totals[scene][1] += latency_ms
+
+    def poll(self):
+        """
+        Move scenes whose first buffer has been output into the histograms.
+
+        Returns:
+            Number of new samples recorded
+        """
+        now_ns = time.monotonic_ns()
+        recorded = 0
+        with self._lock:
+            pending, self._pending = self._pending, []
+
+        still_pending = []
+        for scene, received_ns, voices in pending:
+            output_times = [v.first_output_ns for v in voices if v.first_output_ns is not None]
+            if output_times:
+                self.record(scene, (min(output_times) - received_ns) / 1e6)
+                recorded += 1
+            elif now_ns - received_ns > PENDING_TIMEOUT_NS:
+                self.missed += 1
+            else:
+                still_pending.append((scene, received_ns, voices))
+
+        with self._lock:
+            self._pending = still_pending + self._pending
+        return recorded
+
+    def percentiles(self, scene):
+        """Return {'count', 'p50', 'p95', 'p99', 'max'} in ms for a scene, or None if no samples."""
+        with self._lock:
+            values = list(self.samples.get(scene, ()))
+        if not values:
+            return None
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        return {'count': len(values), 'p50': p50, 'p95': p95, 'p99': p99, 'max': max(values)}
+
+    def scenes(self):
+        """Scenes with at least one sample, sorted (safe to call while another thread records)."""
+        with self._lock:
+            return sorted(self.totals)
+
+    def histogram(self, scene):
+        """
+        Cumulative histogram of a scene, read consistently from any thread (for metrics.py).
+
+        Returns:
+            (counts, count, sum_ms): counts[i] is the number of samples <= BUCKETS_MS[i]
+        """
+        with self._lock:
+            counts = list(self.buckets[scene])
+            count, sum_ms = self.totals[scene]
+        cumulative = []
+        for bucket_count in counts[:-1]:  # The last bucket is +Inf, i.e. count
+            cumulative.append((cumulative[-1] if cumulative else 0) + bucket_count)
+        return cumulative, count, sum_ms
+
+    def summary_lines(self):
+        """One human-readable line per scene."""
+        lines = []
+        for scene in sorted(self.samples):
+            stats = self.percentiles(scene)
+            if stats:
+                lines.append(f"Latency {scene}: n={stats['count']} p50={stats['p50']:.1f}ms "
+                             f"p95={stats['p95']:.1f}ms p99={stats['p99']:.1f}ms max={stats['max']:.1f}ms")
+        return lines
+
+    def write(self, path):
+        """Write percentiles, histograms and raw samples to a JSON file."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        report = {'buckets_ms': list(BUCKETS_MS), 'missed': self.missed, 'scenes': {}}
+        for scene in sorted(self.samples):
+            report['scenes'][scene] = {
+                'percentiles_ms': self.percentiles(scene),
+                'histogram': self.buckets[scene],
+                'samples_ms': [round(v, 3) for v in self.samples[scene]],
+            }
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Load test the sensor pipeline with hundreds of emulated ESP32 sensor nodes.
+
+For each device count N, a separate generator process emulates N sensor
+nodes. Like the firmware, each node publishes device/<MAC>/sensor every
+500 ms (TIMER0_INTERVAL_MS), and its readings follow a PIR pattern: rare
+single-reading noise plus walk-through bursts of highs lasting a few
+seconds. On the receiving side, this process runs the orchestrator's own
+pipeline (MqttLink -> SensorQueues -> Detector -> DetectionListener) with
+one consumer per device, as main.py does for the props and scenes.
+
+A high reading carries its send time (time.monotonic_ns(), which is
+system-wide on Linux) instead of "1". Any positive value counts as high
+for the detectors, so the end-to-end detection latency can be measured
+from the moment a reading is published to the moment the handler
+coroutine wakes on the detection it completed.
+
+Each step reports the offered and processed message rates, the share of
+messages delivered, detection latency percentiles and event loop lag. The
+maximum sustained rate is the highest processed rate of a step that
+delivered at least 99% of its messages with a p95 latency under 100 ms.
+
+With --in-process, no broker is needed. The generator runs on a thread of
+this process and publishes into an InMemoryBroker (transport.py), so the
+numbers are the cost of the pipeline alone, without the network or the
+broker. The generator then shares the GIL with the pipeline.
+
+Usage:
+    cd ../mosquitto-docker-compose && docker compose up -d   # Local broker
+    uv run loadGenerator.py                                  # 6 to 1600 devices, 15 s each
+    uv run loadGenerator.py --devices 100,500,2000 --seconds 30 --interval 0.25
+    uv run loadGenerator.py --broker 192.168.86.2            # Against the house broker (careful)
+    uv run loadGenerator.py --in-process                     # No broker, no network (see transport.py)
+
+Output: data/load_YYYYMMDD_HHMMSS.csv and a .png of the scaling curve
+"""
+
+import argparse
+import asyncio
+import csv
+import multiprocessing
+import os
+import queue
+import random
+import threading
+import time
+import numpy as np
+from houseConfig import SENSOR_THRESHOLD, DETECT_HIGHS, DETECT_WINDOW
+from metrics import LoopLagMonitor
+from mqttLink import MqttLink
+from sensorQueues import SensorQueues
+from transport import InMemoryBroker, PahoTransport
+
+LOAD_BROKER = "localhost"  # mosquitto-docker-compose on this machine
+DEVICE_STEPS = [6, 25, 50, 100, 200, 400, 800, 1600]
+STEP_SECONDS = 15
+PUBLISH_INTERVAL_SECONDS = 0.5  # Firmware TIMER0_INTERVAL_MS
+DEVICES_PER_CLIENT = 100  # Emulated nodes sharing one MQTT connection in the generator
+NOISE_PROBABILITY = 0.002  # Chance of a lone spurious high per reading
+VISIT_SECONDS = 20  # Mean time between walk-throughs past one sensor
+BURST_SECONDS = (2, 8)  # How long a walk-through keeps a sensor high
+DRAIN_SECONDS = 2  # Wait for in-flight messages after the generator stops
+SUSTAINED_DELIVERY = 0.99
+SUSTAINED_P95_MS = 100
+
+
+def fake_mac(index):
+    """Locally administered MAC for emulated node #index (can't clash with a real ESP32)."""
+    return "02:00:" + ":".join(f"{(index >> shift) & 0xFF:02X}" for shift in (24, 16, 8, 0))
+
+
+class PirPattern:
+    """Readings of one HC-SR501: mostly low, rare noise, and bursts of highs when someone walks by."""
+
+    def __init__(self, rng, interval):
+        self.rng = rng
+        self.visit_probability = interval / VISIT_SECONDS  # Per reading
+        self.burst_until = 0.0
+
+    def high(self, now):
+        if now < self.burst_until:
+            return True
+        if self.rng.random() < self.visit_probability:
+            self.burst_until = now + self.rng.uniform(*BURST_SECONDS)
+            return True
+        return self.rng.random() < NOISE_PROBABILITY
+
+
+async def emulate_devices(device_ids, transports, interval, seconds, seed):
+    """
+    Publish every device's readings on its own fixed 500 ms schedule (random phase).
+
+    Args:
+        device_ids: MACs of the emulated nodes
+        transports: Connected transports, one per DEVICES_PER_CLIENT nodes
+
+    Returns:
+        Number of messages published
+    """
+    sent = 0
+
+    async def device(index, device_id):
+        nonlocal sent
+        rng = random.Random(seed * 100003 + index)
+        pattern = PirPattern(rng, interval)
+        transport = transports[index // DEVICES_PER_CLIENT]
+        topic = f"device/{device_id}/sensor"
+        loop = asyncio.get_running_loop()
+        first = loop.time() + rng.uniform(0, interval)
+        end = first + seconds
+        tick = 0
+        while True:
+            due = first + tick * interval  # Fixed schedule, so a late tick doesn't push the rest back
+            if due >= end:
+                return
+            await asyncio.sleep(max(0.0, due - loop.time()))
+            # A high reading carries its send time; the detectors treat any value > 0 as high
+            payload = str(time.monotonic_ns()) if pattern.high(due) else "0"
+            transport.publish(topic, payload)
+            sent += 1
+            tick += 1
+
+    await asyncio.gather(*(device(i, device_id) for i, device_id in enumerate(device_ids)))
+    return sent
+
+
+def generator_process(device_ids, broker, port, interval, seconds, seed, results):
+    """Entry point of the generator process (kept apart so it doesn't compete for our GIL)."""
+    transports = []
+    for start in range(0, len(device_ids), DEVICES_PER_CLIENT):
+        transport = PahoTransport(f"load_gen_{os.getpid()}_{start}", broker, port, log=lambda message: None)
+        connected = threading.Event()
+        transport.on_connect = connected.set
+        transports.append(transport.start())
+        if not connected.wait(10):
+            raise ConnectionError(f"Load generator could not connect to {broker}:{port}")
+    sent = asyncio.run(emulate_devices(device_ids, transports, interval, seconds, seed))
+    time.sleep(0.5)  # Let paho flush what is still queued
+    for transport in transports:
+        transport.stop()
+    results.put(sent)
+
+
+def generator_thread(device_ids, broker, interval, seconds, seed, results):
+    """In-process generator: same schedule, published straight into an InMemoryBroker."""
+    transports = [broker.transport(f"load_gen_{start}").start()
+                  for start in range(0, len(device_ids), DEVICES_PER_CLIENT)]
+    results.put(asyncio.run(emulate_devices(device_ids, transports, interval, seconds, seed)))
+    for transport in transports:
+        transport.stop()
+
+
+class LatencyQueues(SensorQueues):
+    """SensorQueues that remembers the send time carried by each reading that completed a detection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sent_ns = {}  # received_ns of a detection -> its reading's send time
+
+    def _update(self, device_id, payload, received_ns):
+        detections = self.detections[device_id]
+        super()._update(device_id, payload, received_ns)
+        if self.detections[device_id] != detections:
+            self.sent_ns[received_ns] = int(payload)
+
+
+async def consume(queues, listener, latencies_ms):
+    """Stand-in for a handler coroutine: wake on each detection and note its publish -> wake latency."""
+    while True:
+        received_ns = await listener.get()
+        woke_ns = time.monotonic_ns()
+        sent_ns = queues.sent_ns.pop(received_ns, None)
+        if sent_ns is not None:
+            latencies_ms.append((woke_ns - sent_ns) / 1e6)
+
+
+def measure(devices, broker, port, interval, seconds, seed, in_process=False):
+    """
+    Run one load step.
+
+    Args:
+        devices: Number of emulated sensor nodes
+        broker, port: MQTT broker
+        interval: Seconds between readings of one node
+        seconds: How long the nodes publish
+        in_process: Use an InMemoryBroker and a generator thread instead of the broker and a process
+
+    Returns:
+        Dict with the step's rates, delivery, latency percentiles and loop lag
+    """
+    device_ids = [fake_mac(i) for i in range(devices)]
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    queues = LatencyQueues(device_ids, DETECT_HIGHS, DETECT_WINDOW, SENSOR_THRESHOLD, maxsize=64)
+    memory_broker = InMemoryBroker() if in_process else None
+    link = MqttLink(f"load_test_{devices}", broker, port, log=lambda message: None,
+                    transport=memory_broker.transport(f"load_test_{devices}") if in_process else None)
+    link.route_sensors(device_ids, queues.put_threadsafe)
+    latencies_ms = []
+    consumers = [loop.create_task(consume(queues, queues.listen(device_id), latencies_ms)) for device_id in device_ids]
+    lag_monitor = LoopLagMonitor(interval=0.05)
+    consumers.append(loop.create_task(lag_monitor.run()))
+    queues.bind(loop)
+    link.start()
+    if not link.connected.wait(10):
+        link.stop()
+        loop.close()
+        raise ConnectionError(f"Could not connect to the MQTT broker at {broker}:{port}")
+
+    if in_process:
+        results = queue.Queue()
+        generator = threading.Thread(
+            target=generator_thread, args=(device_ids, memory_broker, interval, seconds, seed, results), daemon=True)
+    else:
+        results = multiprocessing.Queue()
+        generator = multiprocessing.Process(
+            target=generator_process, args=(device_ids, broker, port, interval, seconds, seed, results), daemon=True)
+    generator.start()
+
+    async def wait_for_generator():
+        sent = await loop.run_in_executor(None, results.get)
+        await asyncio.sleep(DRAIN_SECONDS)
+        return sent
+
+    try:
+        sent = loop.run_until_complete(wait_for_generator())
+    finally:
+        generator.join(timeout=5)
+        for task in consumers:
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*consumers, return_exceptions=True))
+        link.stop()
+        loop.close()
+
+    received = sum(queues.received.values())
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99]) if latencies_ms else (float('nan'),) * 3
+    row = {
+        "devices": devices,
+        "offered_rate": sent / seconds,  # Over the publishing window (the generator's startup excluded)
+        "processed_rate": received / seconds,
+        "delivered": received / sent if sent else 0.0,
+        "detections": len(latencies_ms),
+        "p50_ms": p50,
+        "p95_ms": p95,
+        "p99_ms": p99,
+        "max_ms": max(latencies_ms, default=float('nan')),
+        "loop_lag_max_ms": lag_monitor.max_ms,
+    }
+    row["sustained"] = row["delivered"] >= SUSTAINED_DELIVERY and p95 <= SUSTAINED_P95_MS
+    return row
+
+
+def plot(rows, path):
+    """Save the scaling curve: message rates and detection latency against device count."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    devices = [row["devices"] for row in rows]
+    fig, (rates, latency) = plt.subplots(2, 1, figsize=(10, 8), sharex=True)
+    rates.plot(devices, [row["offered_rate"] for row in rows], "o--", label="offered")
+    rates.plot(devices, [row["processed_rate"] for row in rows], "o-", label="processed")
+    rates.set_ylabel("messages / s")
+    rates.set_title("Sensor pipeline scaling")
+    rates.legend()
+    rates.grid(True, alpha=0.3)
+
+    for key in ("p50_ms", "p95_ms", "p99_ms"):
+        latency.plot(devices, [row[key] for row in rows], "o-", label=key[:3])
+    latency.plot(devices, [row["loop_lag_max_ms"] for row in rows], "x:", label="max loop lag")
+    latency.axhline(SUSTAINED_P95_MS, color="red", alpha=0.4, linestyle="--", label="p95 limit")
+    latency.set_xscale("log")
+    latency.set_yscale("log")
+    latency.set_xlabel("emulated sensor nodes")
+    latency.set_ylabel("publish -> handler wake (ms)")
+    latency.legend()
+    latency.grid(True, which="both", alpha=0.3)
+
+    plt.tight_layout()
+    plt.savefig(path, dpi=150, bbox_inches='tight')
+    plt.close(fig)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the sensor pipeline with emulated ESP32 nodes.')
+    parser.add_argument('--devices', default=",".join(map(str, DEVICE_STEPS)),
+                        help='Comma-separated device counts to step through')
+    parser.add_argument('--seconds', type=float, default=STEP_SECONDS, help='Publishing time per step')
+    parser.add_argument('--interval', type=float, default=PUBLISH_INTERVAL_SECONDS,
+                        help='Seconds between readings of one node (firmware: 0.5)')
+    parser.add_argument('--broker', default=LOAD_BROKER, help=f'MQTT broker (default: {LOAD_BROKER})')
+    parser.add_argument('--port', type=int, default=1883)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--in-process', action='store_true',
+                        help='No broker: generate into an in-memory broker in this process (pipeline cost only)')
+    parser.add_argument('--output', default=time.strftime('data/load_%Y%m%d_%H%M%S.csv'), help='CSV to write')
+    args = parser.parse_args()
+
+    rows = []
+    print(f"{'devices':>8} {'offered/s':>10} {'processed/s':>12} {'delivered':>10} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'lag ms':>8}")
+    for devices in (int(n) for n in args.devices.split(",")):
+        row = measure(devices, args.broker, args.port, args.interval, args.seconds, args.seed, args.in_process)
+        rows.append(row)
+        print(f"{devices:>8} {row['offered_rate']:>10.0f} {row['processed_rate']:>12.0f} {row['delivered']:>9.1%} "
+              f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['loop_lag_max_ms']:>8.1f}"
+              f"{'' if row['sustained'] else '  (not sustained)'}")
+
+    sustained = [row for row in rows if row["sustained"]]
+    if sustained:
+        best = max(sustained, key=lambda row: row["processed_rate"])
+        print(f"\nMax sustained rate: {best['processed_rate']:.0f} messages/s ({best['devices']} devices)")
+    else:
+        print("\nNo step was sustained")
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    plot_path = os.path.splitext(args.output)[0] + ".png"
+    plot(rows, plot_path)
+    print(f"Results written to {args.output} and {plot_path}")
+
+
+if __name__ == "__main__":
+    main()
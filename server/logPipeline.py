@@ -0,0 +1,187 @@
+"""
+Non-blocking logging for the haunted house servers.
+
+log() used to format a timestamp (time.strftime plus two time.time() calls)
+and print() synchronously on the event loop, so a slow terminal, SSH
+session or disk stalled sensor handling. Here log() only appends a
+(time.monotonic_ns(), message) tuple to a queue. A background writer
+thread drains the queue in batches, formats the timestamps, writes each
+batch to stdout with a single write and appends it to a size-rotated log
+file.
+
+Timestamps are taken when log() is called, not when the line is written,
+so they stay accurate however far behind the writer is. The offset from
+the monotonic clock to wall time is re-read for every batch, so an NTP
+step during a long night moves the timestamps with it.
+
+Usage:
+    from logPipeline import log, open_log_file, stop_logging
+
+    open_log_file("logs/house.log")  # Optional, stdout only until called
+    log("COFFIN triggered")
+    ...
+    stop_logging()  # Flush everything still queued (also runs at exit)
+"""
+
+import atexit
+import os
+import queue
+import sys
+import threading
+import time
+
+MAX_BATCH = 256  # Lines formatted and written per write() call at most
+MAX_LOG_BYTES = 10 * 1024 * 1024  # Rotate the log file at this size
+LOG_BACKUPS = 5  # Keep house.log.1 .. house.log.5
+
+
+class RotatingFile:
+    """Append-only UTF-8 log file that rolls over to path.1, path.2, ... at max_bytes (encoded size)."""
+
+    def __init__(self, path, max_bytes=MAX_LOG_BYTES, backups=LOG_BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "ab")
+        self._size = self._file.tell()
+
+    def write(self, text):
+        data = text.encode("utf-8")  # Counted in bytes, so non-ASCII lines don't overshoot max_bytes
+        if self._size and self._size + len(data) > self.max_bytes:
+            self._rotate()
+        self._file.write(data)
+        self._file.flush()
+        self._size += len(data)
+
+    def _rotate(self):
+        self._file.close()
+        for index in range(self.backups - 1, 0, -1):
+            older = f"{self.path}.{index}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{index + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        self._file = open(self.path, "wb")
+        self._size = 0
+
+    def close(self):
+        self._file.close()
+
+
+class LogPipeline:
+    """Queue of (monotonic_ns, message) tuples drained by one writer thread."""
+
+    def __init__(self, stream=sys.stdout, max_batch=MAX_BATCH):
+        """
+        Args:
+            stream: Where every line is echoed (None for file only)
+            max_batch: Lines written per batch at most
+        """
+        self.stream = stream
+        self.max_batch = max_batch
+        self.file = None  # RotatingFile, set by open_file()
+        self.written = 0  # Lines written by the writer thread
+        self.batches = 0  # write() calls it needed for them
+        self.errors = 0  # Batches that failed to write (the lines are lost, the servers keep running)
+        self._queue = queue.SimpleQueue()
+        # Wall clock at monotonic 0, so the writer can turn monotonic stamps into local times
+        # (re-read for every batch in _run, so it follows NTP steps)
+        self._wall_offset_ns = time.time_ns() - time.monotonic_ns()
+        self._second = None  # Last formatted second and its text, reused for every line in it
+        self._second_text = ""
+        self._thread = threading.Thread(target=self._run, daemon=True, name="log")
+        self._thread.start()
+
+    def log(self, message):
+        """Queue one line; safe to call from any thread and never blocks on I/O."""
+        self._queue.put((time.monotonic_ns(), message))
+
+    def open_file(self, path, max_bytes=MAX_LOG_BYTES, backups=LOG_BACKUPS):
+        """Also append every line to a rotated log file (lines already queued included)."""
+        self._queue.put((None, RotatingFile(path, max_bytes, backups)))
+
+    def stop(self, timeout=2.0):
+        """Write everything queued so far, then stop the writer thread."""
+        if self._thread.is_alive():
+            self._queue.put((None, None))
+            self._thread.join(timeout)
+
+    def pending(self):
+        """Lines queued but not yet written."""
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]  # Block until there is something to write
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._wall_offset_ns = time.time_ns() - time.monotonic_ns()
+            if not self._write(batch):
+                break
+
+    def _write(self, batch):
+        """Format and write one batch. Returns False once the stop marker was seen."""
+        lines = []
+        running = True
+        for stamp_ns, message in batch:
+            if stamp_ns is None:  # Control item: a new log file, or the stop marker
+                self._flush(lines)
+                lines = []
+                if message is None:
+                    running = False
+                    break
+                if self.file is not None:
+                    self.file.close()
+                self.file = message
+                continue
+            lines.append(f"[{self._timestamp(stamp_ns)}] {message}\n")
+        self._flush(lines)
+        if not running and self.file is not None:
+            self.file.close()
+            self.file = None
+        return running
+
+    def _flush(self, lines):
+        if not lines:
+            return
+        text = "".join(lines)
+        try:
+            if self.stream is not None:
+                self.stream.write(text)
+                self.stream.flush()
+            if self.file is not None:
+                self.file.write(text)
+        except (OSError, ValueError):
+            self.errors += 1
+            return
+        self.written += len(lines)
+        self.batches += 1
+
+    def _timestamp(self, stamp_ns):
+        # Same format the servers always printed: 2025-10-31 19:42:07.123
+        wall_ns = stamp_ns + self._wall_offset_ns
+        second, remainder_ns = divmod(wall_ns, 1_000_000_000)
+        if second != self._second:
+            self._second = second
+            self._second_text = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(second))
+        return f"{self._second_text}.{remainder_ns // 1_000_000:03d}"
+
+    def summary(self):
+        """One human-readable line with the writer's counters."""
+        return (f"Log: {self.written} line(s) in {self.batches} batch(es), {self.pending()} pending, "
+                f"{self.errors} failed write(s)")
+
+
+# One pipeline per process, shared by every module that imports log()
+_pipeline = LogPipeline()
+log = _pipeline.log
+open_log_file = _pipeline.open_file
+stop_logging = _pipeline.stop
+log_summary = _pipeline.summary
+atexit.register(stop_logging)
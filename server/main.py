@@ -1,5 +1,133 @@
+#!/usr/bin/env python3
+"""
+Haunted house orchestrator: props and sounds in one process.
+
+Subscribes to every sensor once (mqttLink.py), runs one streaming detector per sensor
+(sensorQueues.py) and fans each detection out in-process to both the
+actuator handlers (hauntedHouseLoop2025.py) and the audio handlers
+(hauntedHouseSounds2025.py). The broker delivers each reading once instead
+of once per server, and a prop and its sound react to the very same
+detection.
+
+Usage:
+    uv run main.py              # Props and sounds
+    uv run main.py --no-sounds  # Props only (same as hauntedHouseLoop2025.py)
+    uv run main.py --no-props   # Sounds only (same as hauntedHouseSounds2025.py)
+    uv run main.py --no-sounds --workers 3 --worker 0   # One of three props workers (sharding.py)
+
+Run it with ./runHouse.sh for auto-restart.
+"""
+
+import argparse
+import asyncio
+import os
+from houseConfig import (SENSOR_IDS, PROP_NAMES, SENSOR_THRESHOLD,
+                         DETECT_HIGHS, DETECT_WINDOW, STATS_REPORT_SECONDS, LOG_DIR, METRICS_PORT, PATH_MODEL_FILE)
+from logPipeline import log, log_summary, open_log_file
+from metrics import start_metrics
+from mqttLink import MqttLink
+from pathModel import PathModel, Prearmer
+from sensorQueues import SensorQueues
+from sharding import SharedState, owned_devices
+from supervisor import Supervisor
+import hauntedHouseLoop2025 as props
+
+
+async def event_loop(sensor_queues, link, supervisor, prearmer, handlers):
+    while True:
+        # Report the shared sensor/MQTT/task counters and each handler's own counters periodically
+        await asyncio.sleep(STATS_REPORT_SECONDS)
+        log(sensor_queues.summary(PROP_NAMES))
+        log(link.summary())
+        log(supervisor.summary())
+        log(prearmer.summary(PROP_NAMES))
+        log(log_summary())
+        for handler in handlers:
+            handler.report()
+
+
 def main():
-    print("Hello from server!")
+    parser = argparse.ArgumentParser(description='Run the haunted house props and sounds in one process.')
+    parser.add_argument('--no-props', action='store_true', help="Don't run the actuator handlers")
+    parser.add_argument('--no-sounds', action='store_true', help="Don't run the audio handlers")
+    parser.add_argument('--metrics-port', type=int, default=METRICS_PORT,
+                        help=f'Serve Prometheus metrics on this localhost port, 0 to disable (default: {METRICS_PORT})')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Split the sensors between this many worker processes (see sharding.py)')
+    parser.add_argument('--worker', type=int, default=0, help='Which worker this process is, 0 to WORKERS-1')
+    args = parser.parse_args()
+    if not 0 <= args.worker < args.workers:
+        parser.error("--worker must be between 0 and WORKERS-1")
+    sharded = args.workers > 1
+    if sharded and not args.no_sounds:
+        parser.error("The sounds need the audio interface, run them in one process (--no-props) and shard with --no-sounds")
+
+    handlers = []
+    sounds = None
+    if not args.no_props:
+        handlers.append(props)
+    if not args.no_sounds:
+        import hauntedHouseSounds2025 as sounds  # Only here, so a props-only process doesn't need the audio stack
+        handlers.append(sounds)
+    if not handlers:
+        parser.error("Nothing to run")
+
+    open_log_file(os.path.join(LOG_DIR, f"house{args.worker}.log" if sharded else "house.log"))
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    # One MQTT connection and one detector per sensor, shared by every handler.
+    # A worker only subscribes to its own share of the sensors, with zones kept together.
+    device_ids = owned_devices(SENSOR_IDS, args.workers, args.worker, props.PROP_RESOURCES) if sharded else SENSOR_IDS
+    sensor_queues = SensorQueues(device_ids, DETECT_HIGHS, DETECT_WINDOW, SENSOR_THRESHOLD)
+    name = f"house{args.worker}" if sharded else "house"
+    link = MqttLink(f"server_{name}", log=log)
+    link.route_sensors(sensor_queues.device_ids, sensor_queues.put_threadsafe, wildcard=not sharded)
+    # Cooldowns and zone locks are shared with the other workers through retained topics
+    shared = SharedState(link, args.worker, loop, log) if sharded else None
+    # Every long-running task is restarted on its own if it raises (see supervisor.py)
+    supervisor = Supervisor(name, loop, link.publish, log)
+
+    if props in handlers:
+        props.attach(link, sensor_queues, shared=shared)
+        props.create_tasks(supervisor)
+    if sounds is not None:
+        sounds.attach(sensor_queues)
+        sounds.start_audio()
+        sounds.create_tasks(supervisor)
+    # Warm the scenes visitors will probably reach next, and score those predictions (see pathModel.py)
+    prearmer = Prearmer(PathModel.load(PATH_MODEL_FILE, SENSOR_IDS), log=log,
+                        latency=sounds.start_latency if sounds is not None else None)
+    if sounds is not None:
+        for device_id in sounds.SCENE_SENSORS:
+            prearmer.add_warmer(device_id, sounds.prewarm)
+    prearmer.create_tasks(supervisor, sensor_queues, PROP_NAMES)
+    supervisor.start("report", lambda: event_loop(sensor_queues, link, supervisor, prearmer, handlers))
+    supervisor.start_heartbeat()
+
+    metrics_port = args.metrics_port + args.worker if args.metrics_port else 0  # Workers can share a machine
+    metrics = start_metrics(metrics_port, loop, sensor_queues, PROP_NAMES, link,
+                            [handler.metrics for handler in handlers] + [supervisor.metrics, prearmer.metrics], log)
+    sensor_queues.bind(loop)
+    link.start()
+    log(f"Running {' and '.join(h.__name__ for h in handlers)} for {len(device_ids)} sensors"
+        + (f" as worker {args.worker} of {args.workers}" if sharded else ""))
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        supervisor.cancel_all()
+        for handler in handlers:
+            handler.shutdown()
+        log(sensor_queues.summary(PROP_NAMES))
+        log(link.summary())
+        log(supervisor.summary())
+        log(prearmer.summary(PROP_NAMES))
+        log(log_summary())
+        link.stop()
+        if metrics is not None:
+            metrics.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,287 @@
+"""
+Prometheus-format /metrics endpoint for the haunted house servers.
+
+The servers already keep their counters in plain dicts preallocated per
+device (SensorQueues, Timelines, each handler's trigger counts), so
+updating a counter on the event loop is a single dict store and nothing on
+the hot path knows about Prometheus. On each scrape, a ThreadingHTTPServer
+thread reads those dicts through the registered collectors and renders the
+text exposition format. The dicts are never resized after startup, so
+reading them from another thread is safe.
+
+Usage:
+    metrics = start_metrics(METRICS_PORT, loop, sensor_queues, PROP_NAMES, link, [props.metrics, sounds.metrics], log)
+    ...
+    metrics.stop()
+
+    curl http://localhost:9108/metrics
+"""
+
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from latency import BUCKETS_MS
+
+METRICS_HOST = "127.0.0.1"
+LAG_INTERVAL_SECONDS = 0.25  # How often the event loop lag probe wakes up
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def family(name, kind, help_text, samples):
+    """
+    One metric family, as returned by collectors.
+
+    Args:
+        name: Metric name, e.g. "haunted_sensor_messages_total"
+        kind: "counter", "gauge" or "histogram"
+        help_text: One-line description
+        samples: Iterable of (labels_dict, value), or (suffix, labels_dict, value) for the
+            _bucket/_sum/_count series of a histogram
+
+    Returns:
+        (name, kind, help_text, samples) tuple
+    """
+    return name, kind, help_text, list(samples)
+
+
+def render(families):
+    """
+    Render families in the Prometheus text format. Families with the same name
+    (e.g. haunted_triggers_total from both the props and the sounds) are merged.
+    """
+    merged = {}
+    for name, kind, help_text, samples in families:
+        if name in merged:
+            merged[name][2].extend(samples)
+        else:
+            merged[name] = (kind, help_text, list(samples))
+    lines = []
+    for name, (kind, help_text, samples) in merged.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for sample in samples:
+            suffix, labels, value = sample if len(sample) == 3 else ("", *sample)
+            if labels:
+                label_text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+                lines.append(f"{name}{suffix}{{{label_text}}} {value}")
+            else:
+                lines.append(f"{name}{suffix} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def device_labels(device_id, names):
+    """Labels for one device: its MAC and, if it has one, its prop name."""
+    return {"device": device_id, "name": names.get(device_id, "")}
+
+
+def sensor_metrics(sensor_queues, names):
+    """
+    Per-sensor message, rate, jitter, queue and detection metrics from a SensorQueues.
+
+    Args:
+        sensor_queues: The shared SensorQueues
+        names: {device_id: label}, e.g. PROP_NAMES
+    """
+    devices = sensor_queues.device_ids
+    labels = {device_id: device_labels(device_id, names) for device_id in devices}
+    return [
+        family("haunted_sensor_messages_total", "counter", "Sensor readings received",
+                [(labels[d], sensor_queues.received[d]) for d in devices]),
+        family("haunted_sensor_dropped_total", "counter", "Sensor readings dropped (malformed or no event loop)",
+                [(labels[d], sensor_queues.dropped[d]) for d in devices]),
+        family("haunted_sensor_message_rate", "gauge", "Smoothed sensor readings per second",
+                [(labels[d], f"{sensor_queues.rate(d):.3f}") for d in devices]),
+        family("haunted_sensor_interarrival_jitter_seconds", "gauge",
+                "Smoothed deviation of the time between readings from its mean",
+                [(labels[d], f"{sensor_queues.jitter_ms[d] / 1000:.6f}") for d in devices]),
+        family("haunted_sensor_queue_depth", "gauge", "Detections waiting in the sensor's listener queues",
+                [(labels[d], sensor_queues.queue_depth(d)) for d in devices]),
+        family("haunted_sensor_detections_total", "counter", "Times the sensor's detector fired",
+                [(labels[d], sensor_queues.detections[d]) for d in devices]),
+        family("haunted_sensor_overflow_total", "counter", "Detections dropped because a listener queue was full",
+                [(labels[d], sensor_queues.overflowed(d)) for d in devices]),
+    ]
+
+
+def trigger_metrics(handler, names, triggers, suppressed_cooldown, suppressed_busy):
+    """
+    Trigger counters of one handler module (props or sounds).
+
+    Args:
+        handler: Label value, e.g. "props"
+        names: {device_id: label}
+        triggers, suppressed_cooldown, suppressed_busy: Preallocated {device_id: count}
+    """
+    def samples(counts):
+        return [({"handler": handler, **device_labels(d, names)}, count) for d, count in counts.items()]
+
+    return [
+        family("haunted_triggers_total", "counter", "Detections that ran the prop or scene", samples(triggers)),
+        family("haunted_triggers_suppressed_total", "counter", "Detections ignored because of the cooldown or a busy prop",
+                [({**labels, "reason": "cooldown"}, value) for labels, value in samples(suppressed_cooldown)]
+                + [({**labels, "reason": "busy"}, value) for labels, value in samples(suppressed_busy)]),
+    ]
+
+
+def latency_metrics(name, help_text, tracker, label="scene"):
+    """
+    A LatencyTracker as a Prometheus histogram in seconds, one series per scene.
+
+    Args:
+        name: Metric name, e.g. "haunted_sound_latency_seconds"
+        help_text: One-line description
+        tracker: latency.LatencyTracker
+        label: Label holding the tracker's scene names
+    """
+    samples = []
+    for scene in tracker.scenes():
+        cumulative, count, sum_ms = tracker.histogram(scene)
+        for bound_ms, bucket_count in zip(BUCKETS_MS, cumulative):
+            samples.append(("_bucket", {label: scene, "le": f"{bound_ms / 1000:g}"}, bucket_count))
+        samples += [("_bucket", {label: scene, "le": "+Inf"}, count),
+                    ("_sum", {label: scene}, f"{sum_ms / 1000:.6f}"),
+                    ("_count", {label: scene}, count)]
+    return [family(name, "histogram", help_text, samples)]
+
+
+def link_metrics(link):
+    """Connection counters of an MqttLink."""
+    return [
+        family("haunted_mqtt_connects_total", "counter", "Successful MQTT connections", [({}, link.connects)]),
+        family("haunted_mqtt_connected", "gauge", "1 while connected and subscribed",
+                [({}, int(link.connected.is_set()))]),
+        family("haunted_mqtt_unrouted_total", "counter", "Sensor messages from untracked devices",
+                [({}, link.unrouted)]),
+        family("haunted_mqtt_publish_failures_total", "counter", "Publishes dropped because the connection was down",
+                [({}, link.transport.publish_failures)]),
+        family("haunted_mqtt_recoveries_total", "counter", "Reconnects after a lost connection",
+                [({}, len(link.recoveries_ms))]),
+        family("haunted_mqtt_last_recovery_seconds", "gauge", "Disconnect to resubscribed time of the last bounce",
+                [({}, f"{link.recoveries_ms[-1] / 1000 if link.recoveries_ms else 0:.3f}")]),
+    ]
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes a sleeping coroutine."""
+
+    def __init__(self, interval=LAG_INTERVAL_SECONDS):
+        self.interval = interval
+        self.last_ms = 0.0  # Lag of the most recent probe
+        self.max_ms = 0.0  # Worst lag seen
+        self.total_ms = 0.0
+        self.probes = 0
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag_ms = max(0.0, (loop.time() - start - self.interval) * 1000)
+            self.last_ms = lag_ms
+            self.max_ms = max(self.max_ms, lag_ms)
+            self.total_ms += lag_ms
+            self.probes += 1
+
+    def metrics(self):
+        return [
+            family("haunted_event_loop_lag_seconds", "gauge", "How late the last lag probe woke up",
+                    [({}, f"{self.last_ms / 1000:.6f}")]),
+            family("haunted_event_loop_lag_max_seconds", "gauge", "Worst event loop lag seen",
+                    [({}, f"{self.max_ms / 1000:.6f}")]),
+            family("haunted_event_loop_lag_seconds_total", "counter", "Summed event loop lag of all probes",
+                    [({}, f"{self.total_ms / 1000:.6f}")]),
+            family("haunted_event_loop_lag_probes_total", "counter", "Event loop lag probes run",
+                    [({}, self.probes)]),
+        ]
+
+
+def start_metrics(port, loop, sensor_queues, names, link, collectors, log=print):
+    """
+    Serve the shared pipeline's and the handlers' metrics (used by main.py and both servers).
+
+    Args:
+        port: TCP port on METRICS_HOST (0 disables the endpoint)
+        loop: Event loop to probe for lag
+        sensor_queues: The shared SensorQueues
+        names: {device_id: label} for the labels
+        link: The MqttLink
+        collectors: The handlers' metrics() functions (hauntedHouseLoop2025, hauntedHouseSounds2025)
+
+    Returns:
+        The running MetricsServer, or None
+    """
+    if not port:
+        return None
+    lag_monitor = LoopLagMonitor()
+    loop.create_task(lag_monitor.run())
+    server = MetricsServer(port, log=log)
+    server.register(lambda: sensor_metrics(sensor_queues, names))
+    server.register(lambda: link_metrics(link))
+    server.register(lag_monitor.metrics)
+    for collector in collectors:
+        server.register(collector)
+    return server if server.start() else None
+
+
+class MetricsServer:
+    """Serves the registered collectors at /metrics from a background thread."""
+
+    def __init__(self, port, host=METRICS_HOST, log=print):
+        self.port = port
+        self.host = host
+        self.log = log
+        self.scrapes = 0
+        self._collectors = []
+        self._server = None
+
+    def register(self, collector):
+        """Add a collector, called on every scrape and returning a list of family() tuples."""
+        self._collectors.append(collector)
+
+    def render(self):
+        families = []
+        for collector in self._collectors:
+            families.extend(collector())
+        return render(families)
+
+    def start(self):
+        """Start serving; logs and carries on without metrics if the port is taken."""
+        metrics_server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                try:
+                    body = metrics_server.render().encode()
+                except Exception as e:
+                    self.send_error(500, str(e))
+                    return
+                metrics_server.scrapes += 1
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # One line per scrape would drown the server's own log
+
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        except OSError as e:
+            self.log(f"Error: Could not serve metrics on {self.host}:{self.port}: {e}")
+            return False
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True, name="metrics").start()
+        self.log(f"Serving metrics at http://{self.host}:{self.port}/metrics")
+        return True
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
@@ -0,0 +1,157 @@
+"""
+Shared MQTT connection for the haunted house servers.
+
+Subscribes to device/+/sensor from on_connect, so the subscription is
+restored every time the connection is (re)established; without that a
+broker restart used to leave the servers connected but silent. Incoming
+messages are routed with one dict lookup on the raw topic bytes instead of
+splitting every topic string. The time from losing the connection to being
+resubscribed is measured for every bounce.
+
+The connection itself is a transport (transport.py): by default a
+PahoTransport, whose network thread reconnects with exponential backoff
+plus full jitter so a fleet of clients doesn't hammer a broker that just
+came back, or an InMemoryBroker's transport to run without a network.
+
+Usage:
+    link = MqttLink("server_house")
+    link.route_sensors(SENSOR_IDS, sensor_queues.put_threadsafe)
+    link.start()
+    link.publish(f"device/{PROP5}/actuator", "X20")
+    ...
+    log(link.summary())
+    link.stop()
+
+    link = MqttLink("server_house", transport=broker.transport("server_house"))  # In-process
+"""
+
+import threading
+import time
+from houseConfig import MQTT_BROKER
+from transport import PahoTransport, topic_matches
+
+SENSOR_TOPIC = "device/+/sensor"
+
+
+class MqttLink:
+    """One transport with wildcard sensor routing and resubscribe-on-connect."""
+
+    def __init__(self, client_id, broker=MQTT_BROKER, port=1883, log=print, transport=None):
+        """
+        Args:
+            client_id: MQTT client ID
+            broker, port: Broker for the default PahoTransport
+            log: Called with connection and recovery lines
+            transport: Transport to use instead of a PahoTransport (e.g. InMemoryBroker.transport())
+        """
+        self.log = log
+        self.transport = transport if transport is not None else PahoTransport(client_id, broker, port, log)
+        self.transport.on_connect = self._on_connect
+        self.transport.on_subscribed = self._on_subscribed
+        self.transport.on_disconnect = self._connection_lost
+        self.transport.on_message = self._on_message
+
+        self.connected = threading.Event()  # Set while connected and subscribed
+        self.connects = 0  # Successful connections (the first one included)
+        self.unrouted = 0  # Sensor messages from devices nobody asked for
+        self.recoveries_ms = []  # Disconnect -> resubscribed time of every bounce
+        self._routes = {}  # Raw topic bytes -> device ID
+        self._handler = None
+        self._sensor_filters = [SENSOR_TOPIC]  # Restored on every connect; connected is set once all are acked
+        self._unacked = set()
+        self._subscriptions = {}  # Other topic filters -> handler(topic, payload)
+        self._lost_at = None  # Monotonic time the connection dropped
+
+    def route_sensors(self, device_ids, handler, wildcard=True):
+        """
+        Deliver device/<id>/sensor messages for the given devices to handler.
+
+        Args:
+            device_ids: Devices to route (other devices' messages are counted and dropped)
+            handler: Called as handler(device_id, payload_bytes, received_ns) on the transport's thread
+            wildcard: Subscribe to device/+/sensor; False subscribes to just these devices' topics,
+                so a worker that owns a share of a big venue isn't sent the other workers' readings
+        """
+        self._routes = {f"device/{device_id}/sensor".encode(): device_id for device_id in device_ids}
+        self._handler = handler
+        self._sensor_filters = [SENSOR_TOPIC] if wildcard else [topic.decode() for topic in self._routes]
+
+    def subscribe(self, topic_filter, handler):
+        """
+        Also subscribe to a non-sensor topic filter (restored after every reconnect like the sensors).
+        Call before start().
+
+        Args:
+            topic_filter: MQTT filter, e.g. "house/state/#"
+            handler: Called as handler(topic_str, payload_bytes) on the transport's thread
+        """
+        self._subscriptions[topic_filter] = handler
+
+    def start(self):
+        """Start the transport; a PahoTransport connects (retrying until the broker answers) in the background."""
+        self.transport.start()
+        return self
+
+    def stop(self):
+        """Disconnect and stop the transport."""
+        self.transport.stop()
+
+    def publish(self, topic, payload, retain=False):
+        """Publish from any thread. Returns False if it was dropped because the connection is down."""
+        return self.transport.publish(topic, payload, retain)
+
+    def _connection_lost(self):
+        self.connected.clear()
+        if self._lost_at is None:
+            self._lost_at = time.monotonic()
+
+    def _on_connect(self):
+        self.connects += 1
+        # Subscribing here restores the subscriptions after every reconnect
+        self._unacked = set(self._sensor_filters)
+        for topic_filter in self._subscriptions:
+            self.transport.subscribe(topic_filter)
+        for topic_filter in self._sensor_filters:
+            self.transport.subscribe(topic_filter)
+
+    def _on_subscribed(self, topic_filter):
+        if topic_filter not in self._unacked:
+            return
+        self._unacked.discard(topic_filter)
+        if self._unacked:
+            return
+        self.connected.set()
+        if self._lost_at is None:
+            subscribed = (SENSOR_TOPIC if self._sensor_filters == [SENSOR_TOPIC]
+                          else f"{len(self._sensor_filters)} sensor topic(s)")
+            self.log(f"Connected to MQTT broker at {self.transport.address}, subscribed to {subscribed}")
+            return
+        recovery_ms = (time.monotonic() - self._lost_at) * 1000
+        self._lost_at = None
+        self.recoveries_ms.append(recovery_ms)
+        self.log(f"Reconnected to MQTT broker and resubscribed {recovery_ms:.0f} ms after the connection dropped")
+
+    def _on_message(self, topic, payload, received_ns):
+        device_id = self._routes.get(topic)  # Raw topic bytes, no decode or split
+        if device_id is not None:
+            self._handler(device_id, payload, received_ns)
+            return
+        if self._subscriptions:  # Rare: coordination topics, not sensor readings
+            topic = topic.decode()
+            handlers = [handler for topic_filter, handler in self._subscriptions.items()
+                        if topic_matches(topic_filter, topic)]
+            for handler in handlers:
+                handler(topic, payload)
+            if handlers:
+                return
+        self.unrouted += 1
+
+    def summary(self):
+        """One human-readable line with connection and recovery counters."""
+        line = f"MQTT: {self.connects} connect(s), {self.unrouted} unrouted message(s)"
+        if self.transport.publish_failures:
+            line += f", {self.transport.publish_failures} publish(es) dropped while disconnected"
+        if self.recoveries_ms:
+            line += (f", {len(self.recoveries_ms)} recovery(ies), last {self.recoveries_ms[-1]:.0f} ms, "
+                     f"max {max(self.recoveries_ms):.0f} ms")
+        return line
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Visitor path model and predictive pre-arming of the next scenes.
+
+Visitors walk through the house in a mostly fixed order (door -> witches ->
+coffin -> bubba -> werewolf -> scarecrow). The path model is learned from
+movement captures (captureSensors.py --movement). The captures are run
+through the same N-of-M detector as the servers. A sensor's detections
+less than VISIT_GAP_SECONDS apart count as one visit. For every visit, the
+next visit to a different sensor within MAX_TRANSITION_SECONDS is a
+transition. The model keeps each transition's probability and its 10th to
+90th percentile travel time. Without a learned model, the house order is
+used, with DEFAULT_GAP_SECONDS between sensors.
+
+When a sensor starts a visit, the Prearmer warms the handlers of the
+sensors likely to fire next (probability >= MIN_PROBABILITY). For the
+sounds (hauntedHouseSounds2025.prewarm), that means paging the scene's
+audio into memory and building its mixer voices, so the audio callback
+doesn't take page faults once the scene starts. A prediction stays open
+until the slowest expected arrival plus PREDICTION_SLACK_SECONDS. It is
+scored as follows:
+    hit          the predicted sensor fired while its prediction was open
+    miss         the prediction expired (the warm-up was wasted)
+    unpredicted  a sensor fired without an open prediction (the cold start was paid)
+What pre-arming buys is measured, not assumed: the sounds server tracks
+trigger-to-DAC latency (latency.LatencyTracker) separately for scenes
+started from prepared voices and for cold starts. The Prearmer reports the
+two sets of percentiles side by side.
+
+Usage:
+    uv run pathModel.py data/sensor_data_20251031_*.csv     # Learn, print, save to data/path_model.json
+    uv run pathModel.py capture.csv --output my_model.json
+
+    model = PathModel.load(PATH_MODEL_FILE, SENSOR_IDS)      # Falls back to the house order
+    prearmer = Prearmer(model, log=log, latency=sounds.start_latency)
+    prearmer.add_warmer(PROP3, sounds.prewarm)
+    prearmer.create_tasks(supervisor, sensor_queues, PROP_NAMES)
+    log(prearmer.summary(PROP_NAMES))
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime
+import numpy as np
+from detector import Detector
+from houseConfig import SENSOR_IDS, PROP_NAMES, SENSOR_THRESHOLD, DETECT_HIGHS, DETECT_WINDOW, PATH_MODEL_FILE
+from metrics import device_labels, family
+
+VISIT_GAP_SECONDS = 20.0  # Detections of one sensor closer than this are one visit
+MAX_TRANSITION_SECONDS = 120.0  # A later visit elsewhere counts as the next step only within this time
+MIN_PROBABILITY = 0.3  # Warm a next sensor at least this likely
+PREDICTION_SLACK_SECONDS = 10.0  # Added to the slowest expected arrival before a prediction expires
+DEFAULT_GAP_SECONDS = (5.0, 60.0)  # Travel time between neighbouring sensors without a learned model
+
+
+def detection_times(readings, device_ids):
+    """
+    Run readings through one Detector per sensor, as the servers do.
+
+    Args:
+        readings: Sorted [(seconds, device_id, payload bytes)] (see replaySensors.load_capture)
+        device_ids: Sensors to detect on
+
+    Returns:
+        [(seconds, device_id)] of every detection
+    """
+    detectors = {device_id: Detector(DETECT_HIGHS, DETECT_WINDOW, SENSOR_THRESHOLD) for device_id in device_ids}
+    detections = []
+    for seconds, device_id, payload in readings:
+        try:
+            value = int(payload)
+        except ValueError:
+            continue
+        if detectors[device_id].update(value):
+            detections.append((seconds, device_id))
+    return detections
+
+
+def visit_starts(detections, gap=VISIT_GAP_SECONDS):
+    """Collapse detections into visits: the first detection after a quiet gap on that sensor."""
+    last = {}
+    visits = []
+    for seconds, device_id in detections:
+        if seconds - last.get(device_id, float('-inf')) > gap:
+            visits.append((seconds, device_id))
+        last[device_id] = seconds
+    return visits
+
+
+class PathModel:
+    """Next-sensor probabilities and travel times."""
+
+    def __init__(self, transitions, visits=None, source="house order"):
+        """
+        Args:
+            transitions: {from_id: {to_id: {"count", "probability", "gap_seconds": [p10, median, p90]}}}
+            visits: {device_id: visits seen} (empty for the house-order model)
+            source: Where the model came from, for logs
+        """
+        self.transitions = transitions
+        self.visits = visits or {}
+        self.source = source
+
+    @classmethod
+    def house_order(cls, order, gap_seconds=DEFAULT_GAP_SECONDS):
+        """Every sensor is followed by the next one in order, with probability 1."""
+        low, high = gap_seconds
+        return cls({a: {b: {"count": 0, "probability": 1.0, "gap_seconds": [low, (low + high) / 2, high]}}
+                    for a, b in zip(order, order[1:])})
+
+    @classmethod
+    def learn(cls, paths, device_ids):
+        """
+        Learn the transitions from one or more captureSensors.py CSVs.
+
+        Args:
+            paths: Capture files
+            device_ids: Sensors to model
+
+        Returns:
+            PathModel
+        """
+        from replaySensors import load_capture  # Only needed when learning
+        visits = {device_id: 0 for device_id in device_ids}
+        gaps = {}  # (from, to) -> [seconds]
+        for path in paths:
+            _, readings = load_capture(path, set(device_ids))
+            starts = visit_starts(detection_times(readings, device_ids))
+            for i, (seconds, device_id) in enumerate(starts):
+                visits[device_id] += 1
+                for later, next_id in starts[i + 1:]:
+                    if later - seconds > MAX_TRANSITION_SECONDS:
+                        break
+                    if next_id != device_id:
+                        gaps.setdefault((device_id, next_id), []).append(later - seconds)
+                        break
+
+        transitions = {}
+        for (a, b), seconds in gaps.items():
+            p10, median, p90 = np.percentile(seconds, [10, 50, 90])
+            transitions.setdefault(a, {})[b] = {
+                "count": len(seconds),
+                "probability": round(len(seconds) / visits[a], 4),
+                "gap_seconds": [round(p10, 1), round(median, 1), round(p90, 1)],
+            }
+        return cls(transitions, visits, source=", ".join(os.path.basename(path) for path in paths))
+
+    @classmethod
+    def load(cls, path, fallback_order):
+        """Load a saved model, or the house-order model if there is none (or it can't be read)."""
+        try:
+            with open(path) as f:
+                saved = json.load(f)
+            return cls(saved["transitions"], saved.get("visits"), saved.get("source", path))
+        except (OSError, ValueError, KeyError):
+            return cls.house_order(fallback_order)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"created": datetime.now().isoformat(timespec="seconds"), "source": self.source,
+                       "visits": self.visits, "transitions": self.transitions}, f, indent=2)
+
+    def predict(self, device_id, min_probability=MIN_PROBABILITY):
+        """
+        Sensors likely to fire after device_id.
+
+        Returns:
+            [(next_id, probability, latest expected arrival in seconds)], most likely first
+        """
+        nexts = self.transitions.get(device_id, {})
+        return sorted(((next_id, t["probability"], t["gap_seconds"][2]) for next_id, t in nexts.items()
+                       if t["probability"] >= min_probability), key=lambda p: -p[1])
+
+    def describe(self, names=None):
+        """Human-readable lines, one per transition."""
+        names = names or {}
+        lines = [f"Path model ({self.source}):"]
+        for a, nexts in self.transitions.items():
+            for b, t in sorted(nexts.items(), key=lambda item: -item[1]["probability"]):
+                low, median, high = t["gap_seconds"]
+                lines.append(f"  {names.get(a, a):>10} -> {names.get(b, b):<10} {t['probability']:5.0%} "
+                             f"({t['count']} seen), {low:.0f}-{high:.0f}s, median {median:.0f}s")
+        return lines
+
+
+class Prearmer:
+    """Warms the handlers of the sensors a visitor will probably reach next, and scores the predictions."""
+
+    def __init__(self, model, clock=time.monotonic, log=print, min_probability=MIN_PROBABILITY, latency=None):
+        """
+        Args:
+            model: PathModel
+            clock: Seconds clock (the event loop's clock when replaying)
+            log: Called with warm-up errors
+            min_probability: Predictions less likely than this aren't acted on
+            latency: LatencyTracker with "prepared" and "cold" trigger-to-sound samples, or None
+        """
+        self.model = model
+        self.clock = clock
+        self.log = log
+        self.min_probability = min_probability
+        self.latency = latency
+        self.warmers = {}  # device_id -> [coroutine function warm(device_id) returning ms of work done]
+        devices = sorted(set(model.transitions) | {b for nexts in model.transitions.values() for b in nexts})
+        # Per-sensor counters, preallocated so counting is a single dict store (served by metrics.py)
+        self.predictions = dict.fromkeys(devices, 0)
+        self.hits = dict.fromkeys(devices, 0)
+        self.misses = dict.fromkeys(devices, 0)
+        self.unpredicted = dict.fromkeys(devices, 0)
+        self.warmup_ms = dict.fromkeys(devices, 0.0)  # Time the warmers spent, whether or not the prediction hit
+        self._open = {}  # device_id -> clock time its prediction expires
+        self._last = {}  # device_id -> clock time of its last detection (for visit grouping)
+        self._tasks = set()
+
+    def add_warmer(self, device_id, warm):
+        """Call warm(device_id) (a coroutine function returning the ms of work it did) when device_id is predicted."""
+        self.warmers.setdefault(device_id, []).append(warm)
+
+    def create_tasks(self, supervisor, sensor_queues, names=None):
+        """Start one supervised task per modelled sensor that feeds its detections to observe()."""
+        names = names or {}
+        for device_id in self.predictions:
+            if device_id in sensor_queues:
+                listener = sensor_queues.listen(device_id)
+                supervisor.start(f"prearm.{names.get(device_id, device_id)}",
+                                 lambda device_id=device_id, listener=listener: self._watch(device_id, listener))
+
+    async def _watch(self, device_id, listener):
+        while True:
+            await listener.get()
+            self.observe(device_id)
+
+    def observe(self, device_id):
+        """A sensor detected motion: score its open prediction, then predict and warm what comes next."""
+        now = self.clock()
+        self.expire(now)
+        last = self._last.get(device_id, float('-inf'))
+        self._last[device_id] = now
+        if now - last <= VISIT_GAP_SECONDS:
+            return  # Same visit, already scored and predicted from
+        if device_id in self.hits:
+            if self._open.pop(device_id, None) is not None:
+                self.hits[device_id] += 1
+            else:
+                self.unpredicted[device_id] += 1
+
+        for next_id, _, latest in self.model.predict(device_id, self.min_probability):
+            expires = now + latest + PREDICTION_SLACK_SECONDS
+            if next_id in self._open:
+                self._open[next_id] = max(self._open[next_id], expires)
+                continue
+            self._open[next_id] = expires
+            self.predictions[next_id] += 1
+            if next_id in self.warmers:
+                task = asyncio.get_running_loop().create_task(self._warm(next_id))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    def expire(self, now=None):
+        """Count predictions whose time ran out as misses."""
+        now = self.clock() if now is None else now
+        for device_id in [d for d, expires in self._open.items() if expires < now]:
+            del self._open[device_id]
+            self.misses[device_id] += 1
+
+    async def _warm(self, device_id):
+        for warm in self.warmers[device_id]:
+            try:
+                self.warmup_ms[device_id] += await warm(device_id) or 0.0
+            except Exception as e:
+                self.log(f"Error pre-arming {device_id}: {e}")
+
+    def start_latency(self):
+        """{"prepared"/"cold": LatencyTracker percentiles} of the starts measured so far (empty without a tracker)."""
+        if self.latency is None:
+            return {}
+        self.latency.poll()
+        stats = {start: self.latency.percentiles(start) for start in ("prepared", "cold")}
+        return {start: percentiles for start, percentiles in stats.items() if percentiles}
+
+    def metrics(self):
+        """Prediction counters for the /metrics endpoint."""
+        def samples(counts, scale=1):
+            return [(device_labels(d, PROP_NAMES), f"{count * scale:g}") for d, count in counts.items()]
+
+        return [
+            family("haunted_prearm_predictions_total", "counter", "Times a sensor was predicted to fire next",
+                   samples(self.predictions)),
+            family("haunted_prearm_hits_total", "counter", "Predicted sensors that fired in time", samples(self.hits)),
+            family("haunted_prearm_misses_total", "counter", "Predictions that expired", samples(self.misses)),
+            family("haunted_prearm_unpredicted_total", "counter", "Visits that started without a prediction",
+                   samples(self.unpredicted)),
+            family("haunted_prearm_warmup_seconds_total", "counter", "Time the warmers spent preparing predicted sensors",
+                   samples(self.warmup_ms, 1 / 1000)),
+            family("haunted_prearm_trigger_latency_seconds", "gauge",
+                   "Trigger-to-sound latency of scenes started prepared or cold",
+                   [({"start": start, "quantile": q}, f"{stats[key] / 1000:g}")
+                    for start, stats in self.start_latency().items()
+                    for q, key in (("0.5", "p50"), ("0.95", "p95"))]),
+        ]
+
+    def summary(self, names=None):
+        """One human-readable line with the prediction counters."""
+        names = names or {}
+        hits, misses, unpredicted = sum(self.hits.values()), sum(self.misses.values()), sum(self.unpredicted.values())
+        scored = hits + misses
+        visits = hits + unpredicted
+        parts = [f"{names.get(d, d)} {self.hits[d]}/{self.misses[d]}/{self.unpredicted[d]}"
+                 for d in self.predictions if self.predictions[d] or self.unpredicted[d]]
+        starts = self.start_latency()
+        latency = "".join(f"{start} p50={stats['p50']:.1f}ms p95={stats['p95']:.1f}ms (n={stats['count']}), "
+                          for start, stats in starts.items())
+        if len(starts) == 2:
+            latency += f"p50 prepared vs cold {starts['prepared']['p50'] - starts['cold']['p50']:+.1f}ms, "
+        return (f"Pre-arming ({self.model.source}): {hits / scored if scored else 0:.0%} of predictions hit, "
+                f"{hits / visits if visits else 0:.0%} of visits predicted, {latency}"
+                f"hits/misses/unpredicted: {', '.join(parts) or 'none'}")
+
+
+def evaluate(model, detections):
+    """
+    Score a model on [(seconds, device_id)] detections without running any warmers.
+
+    Returns:
+        The Prearmer with its counters filled in
+    """
+    now = [0.0]
+    prearmer = Prearmer(model, clock=lambda: now[0])
+    for seconds, device_id in detections:
+        now[0] = seconds
+        prearmer.observe(device_id)
+    prearmer.expire(float('inf'))
+    return prearmer
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Learn the visitor path model from movement captures.')
+    parser.add_argument('captures', nargs='+', help='CSVs written by captureSensors.py')
+    parser.add_argument('--output', default=PATH_MODEL_FILE, help=f'Model to write (default: {PATH_MODEL_FILE})')
+    args = parser.parse_args()
+
+    model = PathModel.learn(args.captures, SENSOR_IDS)
+    if not model.transitions:
+        print("No transitions between sensors found in the captures")
+        sys.exit(1)
+    for line in model.describe(PROP_NAMES):
+        print(line)
+
+    # How a learned model and the plain house order do on a night the model hasn't seen: with
+    # several captures, learn from all but the last and score on the last one. With a single
+    # capture there is nothing to hold out, and the score is in-sample (optimistic).
+    from replaySensors import load_capture
+    held_out = args.captures[-1:] if len(args.captures) > 1 else args.captures
+    trained = PathModel.learn(args.captures[:-1], SENSOR_IDS) if len(args.captures) > 1 else model
+    detections = []
+    for path in held_out:
+        offset = detections[-1][0] + MAX_TRANSITION_SECONDS * 2 if detections else 0.0  # Keep nights apart
+        detections += [(offset + seconds, device_id)
+                       for seconds, device_id in detection_times(load_capture(path, set(SENSOR_IDS))[1], SENSOR_IDS)]
+    if len(args.captures) > 1:
+        print(f"\nScored on {os.path.basename(held_out[0])}, held out of the {len(args.captures) - 1} capture(s) learned from:")
+    else:
+        print("\nScored in-sample on the capture it was learned from (pass several nights to hold the last one out):")
+    for label, candidate in (("learned", trained), ("house order", PathModel.house_order(SENSOR_IDS))):
+        print(f"{label:>12}: {evaluate(candidate, detections).summary(PROP_NAMES)}")
+
+    model.save(args.output)
+    print(f"\nModel written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
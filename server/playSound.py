@@ -20,18 +20,39 @@ Usage:
     uv run playSound.py file1.mp3:1 file2.mp3:2 file3.mp3:3 file4.mp3:4 file5.mp3:5 --device "UMC1820"
 """
 
+import time
+
+START_NS = time.monotonic_ns()  # Launch time, for reporting time to first sound
+
 import sys
 import argparse
 import signal
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import sounddevice as sd
 import soundfile as sf
+from audioAssets import DEFAULT_SAMPLE_RATE, is_cached, load_asset
+from audioDevice import DeviceResolver
+from audioGains import file_gain, stale_files
+from audioMixer import Mixer, Voice, make_routes
+from audioStream import StreamingVoice
+
+active_mixer = None  # Mixer that is currently playing, closed by the Ctrl+C handler
+active_pool = None  # Decode pool, whose queued work is cancelled by the Ctrl+C handler
+
+
+def stop_playback():
+    """Close the mixer and drop any decoding that hasn't started."""
+    if active_mixer is not None:
+        active_mixer.close()  # Stop any playing audio
+    if active_pool is not None:
+        active_pool.shutdown(wait=False, cancel_futures=True)
 
 
 def signal_handler(sig, frame):
     """Handle Ctrl+C gracefully."""
     print("\n\nPlayback interrupted by user")
-    sd.stop()  # Stop any playing audio
+    stop_playback()
     print("Audio stopped. Exiting...")
     sys.exit(0)
 
@@ -50,13 +71,40 @@ def list_audio_devices():
     print("\n")
 
 
-def find_device_by_name(name):
-    """Find device index by name (partial match)."""
-    devices = sd.query_devices()
-    for idx, device in enumerate(devices):
-        if name.lower() in device['name'].lower():
-            return idx
-    return None
+def prepare_audio(audio_file, channel, sample_rate, max_channels, full_decode, gain=1.0):
+    """
+    Get one file ready to play (runs on the decode pool).
+
+    Cached files are memory-mapped. Uncached files become a StreamingVoice that is
+    ready as soon as its first blocks are decoded; the caller fills the cache once
+    playback is over, so the file isn't decoded twice while playback is starting.
+    With full_decode (needed to measure the peak of a file that is not in the gain
+    manifest) the file is decoded into the cache first instead.
+
+    Returns:
+        Dict with the ready-to-add 'voice', 'channel', 'file', 'duration', 'cached' and 'ready_ms'
+    """
+    start = time.perf_counter()
+    routes = make_routes(channel, max_channels)
+    cached = is_cached(audio_file, sample_rate)
+    if cached or full_decode:
+        samples = load_asset(audio_file, sample_rate)
+        voice = Voice(samples, routes, gain)
+        duration = len(samples) / sample_rate
+    else:
+        voice = StreamingVoice(audio_file, routes, sample_rate, gain=gain, loop=False)
+        voice.replaceable = True
+        voice.start()
+        duration = sf.info(audio_file).duration
+
+    return {
+        'voice': voice,
+        'channel': channel,
+        'file': audio_file,
+        'duration': duration,
+        'cached': cached,
+        'ready_ms': (time.perf_counter() - start) * 1000,
+    }
 
 
 def play_audio_to_channels(audio_specs, device=None, normalize=False):
@@ -66,148 +114,139 @@ def play_audio_to_channels(audio_specs, device=None, normalize=False):
     Args:
         audio_specs: List of (audio_file, channel) tuples
         device: Device name or index (None = default device)
-        normalize: If True, normalize all audio to the same peak level
+        normalize: If True, apply each file's gain from sound/gains.json (files missing
+            from the manifest are normalized to the same peak level instead)
     """
     if len(audio_specs) > 8:
         print(f"Warning: Maximum 8 simultaneous sounds supported. Using first 8.")
         audio_specs = audio_specs[:8]
 
-    print(f"\nLoading {len(audio_specs)} audio file(s)...")
-    if normalize:
-        print("Volume normalization: ENABLED")
-
-    # Load all audio files
-    loaded_audio = []
-    max_sample_rate = 0
-
-    for audio_file, channel in audio_specs:
-        print(f"\n  [{channel}] {audio_file}")
-
-        try:
-            # Load audio file with soundfile
-            data, sample_rate = sf.read(audio_file, dtype='float32')
-
-            # Handle stereo/mono - mix to mono
-            if len(data.shape) == 2:  # Stereo
-                samples = data.mean(axis=1)
-            else:  # Mono
-                samples = data
-
-            duration = len(samples) / sample_rate
-            print(f"      Duration: {duration:.2f}s, Sample rate: {sample_rate} Hz")
-
-            loaded_audio.append({
-                'samples': samples,
-                'sample_rate': sample_rate,
-                'channel': channel,
-                'file': audio_file
-            })
-
-            max_sample_rate = max(max_sample_rate, sample_rate)
-
-        except Exception as e:
-            print(f"      Error loading file: {e}")
-            continue
-
-    if not loaded_audio:
-        print("Error: No audio files loaded successfully")
+    # Resolve device first (enumerates host devices once) so files are loaded at its sample rate
+    resolver = DeviceResolver(device, samplerate=DEFAULT_SAMPLE_RATE)
+    device_info = resolver.resolve()
+    if device_info is None:
+        print(f"Error: Device '{device}' not found")
+        print("Use --list to see available devices")
         return
+    device_idx = device_info.index
+    max_channels = device_info.channels
+    sample_rate = device_info.samplerate
 
-    # Resample all audio to the highest sample rate if needed
-    for audio in loaded_audio:
-        if audio['sample_rate'] != max_sample_rate:
-            # Simple resampling by repeating/skipping samples
-            ratio = max_sample_rate / audio['sample_rate']
-            new_length = int(len(audio['samples']) * ratio)
-            audio['samples'] = np.interp(
-                np.linspace(0, len(audio['samples']) - 1, new_length),
-                np.arange(len(audio['samples'])),
-                audio['samples']
-            )
-            audio['sample_rate'] = max_sample_rate
-
-    # Normalize audio levels if requested
-    if normalize and loaded_audio:
-        print("\nNormalizing audio levels...")
-        target_peak = 0.9  # Target peak level (90% of max to avoid clipping)
-
-        for audio in loaded_audio:
-            current_peak = np.abs(audio['samples']).max()
-            if current_peak > 0:
-                # Calculate gain to reach target peak
-                gain = target_peak / current_peak
-                audio['samples'] = audio['samples'] * gain
-                print(f"  [{audio['channel']}] {audio['file']}")
-                print(f"      Peak: {current_peak:.3f} -> {target_peak:.3f} (gain: {gain:.2f}x)")
-
-    # Find the longest audio duration
-    max_length = max(len(audio['samples']) for audio in loaded_audio)
-
-    print(f"\nTotal playback duration: {max_length / max_sample_rate:.2f} seconds")
-
-    # Find device
-    device_idx = None
     if device is not None:
-        if isinstance(device, int):
-            device_idx = device
-        else:
-            device_idx = find_device_by_name(device)
-            if device_idx is None:
-                print(f"Error: Device '{device}' not found")
-                print("Use --list to see available devices")
-                return
-
-    # Get device info
-    if device_idx is not None:
-        device_info = sd.query_devices(device_idx)
-        print(f"\nUsing device: {device_info['name']}")
-        print(f"  Output channels available: {device_info['max_output_channels']}")
-        max_channels = device_info['max_output_channels']
+        print(f"\nUsing device: {device_info.name}")
+        print(f"  Output channels available: {max_channels}")
     else:
-        default_device = sd.query_devices(kind='output')
-        print(f"\nUsing default output device: {default_device['name']}")
-        max_channels = default_device['max_output_channels']
-
-    # Validate all channel numbers
-    channels_used = []
-    for audio in loaded_audio:
-        channel = audio['channel']
+        print(f"\nUsing default output device: {device_info.name}")
+
+    # Validate all channel numbers before loading anything
+    for _, channel in audio_specs:
         if channel < 1 or channel > max_channels:
             print(f"Error: Channel {channel} is out of range (1-{max_channels})")
             return
-        channels_used.append(channel)
 
-    print(f"\nPlaying on channel(s): {', '.join(map(str, sorted(channels_used)))}")
-    print("Press Ctrl+C to stop playback")
+    # Open the output stream now so device-open latency overlaps with decoding
+    global active_mixer
+    try:
+        active_mixer = Mixer(device_idx, sample_rate, max_channels)
+        active_mixer.start()
+    except sd.PortAudioError as e:
+        # The device may have been unplugged or renumbered since it was resolved
+        print(f"\nOpening the device failed ({e}), rescanning audio devices...")
+        device_info = resolver.rescan()
+        print(f"  Rescan took {resolver.last_rescan_ms:.1f} ms")
+        if device_info is None:
+            print(f"Error: Device '{device}' not found")
+            return
+        # The interface may have come back with another rate or channel count; the files
+        # are loaded below, so they are decoded (or read from the cache) at the new rate
+        sample_rate = device_info.samplerate
+        max_channels = device_info.channels
+        for _, channel in audio_specs:
+            if channel > max_channels:
+                print(f"Error: Channel {channel} is out of range (1-{max_channels}) after the rescan")
+                return
+        active_mixer = Mixer(device_info.index, sample_rate, max_channels)
+        active_mixer.start()
+
+    print(f"\nLoading {len(audio_specs)} audio file(s) at {sample_rate} Hz...")
+    # Precomputed gains from the loudness analysis (None = not in the manifest)
+    gains = [file_gain(audio_file) if normalize else None for audio_file, _ in audio_specs]
+    if normalize:
+        missing = sum(gain is None for gain in gains)
+        print("Volume normalization: ENABLED (gains from sound/gains.json)")
+        if missing:
+            print(f"  {missing} file(s) not in the gain manifest (or changed since it was written) are decoded"
+                  " fully to measure their peak (run audioGains.py to analyze them)")
+        for key in stale_files():
+            print(f"  Warning: {key} changed since the loudness analysis, its manifest gain is ignored")
+
+    # Prepare every file in parallel (libsndfile releases the GIL while decoding).
+    # Cached files are memory-mapped; uncached ones stream, ready once their first blocks are decoded.
+    global active_pool
+    pool = active_pool = ThreadPoolExecutor(max_workers=len(audio_specs), thread_name_prefix="decode")
+    futures = [pool.submit(prepare_audio, audio_file, channel, sample_rate, max_channels,
+                           normalize and gain is None, 1.0 if gain is None else gain)
+               for (audio_file, channel), gain in zip(audio_specs, gains)]
 
     # Set up signal handler for graceful interruption
     signal.signal(signal.SIGINT, signal_handler)
+    print("Press Ctrl+C to stop playback")
 
-    # Create multi-channel output array (all channels start silent)
-    output = np.zeros((max_length, max_channels), dtype=np.float32)
-
-    # Mix each audio file into its designated channel
-    for audio in loaded_audio:
-        channel_idx = audio['channel'] - 1  # Convert to 0-indexed
-        samples = audio['samples']
-
-        # Pad with silence if shorter than max_length
-        if len(samples) < max_length:
-            padded = np.zeros(max_length, dtype=np.float32)
-            padded[:len(samples)] = samples
-            samples = padded
-
-        # Add to the output channel
-        output[:, channel_idx] = samples
-
-    # Play audio
     try:
-        sd.play(output, samplerate=max_sample_rate, device=device_idx)
-        sd.wait()  # Wait for playback to finish
+        loaded_audio = []
+        for (audio_file, channel), gain, future in zip(audio_specs, gains, futures):
+            print(f"\n  [{channel}] {audio_file}")
+            try:
+                audio = future.result()
+            except Exception as e:
+                print(f"      Error loading file: {e}")
+                continue
+            source = "cache" if audio['cached'] else "streaming"
+            print(f"      Duration: {audio['duration']:.2f}s ({source}, ready in {audio['ready_ms']:.0f} ms)")
+
+            if normalize and gain is not None:
+                # Already applied as the voice gain, nothing to compute
+                print(f"      Manifest gain: {gain:.2f}x")
+            elif normalize:
+                target_peak = 0.9  # Target peak level for files without a manifest gain (90% of max to avoid clipping)
+                current_peak = np.abs(audio['voice'].samples).max()
+                if current_peak > 0:
+                    # Calculate gain to reach target peak (applied by the mixer, no copy)
+                    audio['voice'].gain = target_peak / current_peak
+                    print(f"      Peak: {current_peak:.3f} -> {target_peak:.3f} (gain: {audio['voice'].gain:.2f}x)")
+            loaded_audio.append(audio)
+
+        if not loaded_audio:
+            print("Error: No audio files loaded successfully")
+            active_mixer.close()
+            pool.shutdown()
+            return
+
+        channels_used = [audio['channel'] for audio in loaded_audio]
+        print(f"\nPlaying on channel(s): {', '.join(map(str, sorted(channels_used)))}")
+        print(f"Total playback duration: {max(audio['duration'] for audio in loaded_audio):.2f} seconds")
+
+        # Every file's first blocks are ready, so all voices start in the same output block and
+        # the speakers stay in sync (the mixer's play_together does the same for the sounds server)
+        voices = active_mixer.add_voices([audio['voice'] for audio in loaded_audio], replace=False)
+        while voices[0].first_output_ns is None and active_mixer.active_voices():
+            time.sleep(0.001)
+        if voices[0].first_output_ns is not None:
+            print(f"Time to first sound: {(voices[0].first_output_ns - START_NS) / 1e6:.0f} ms from launch")
+        active_mixer.wait_until_idle()  # Wait for playback to finish
+        active_mixer.close()
+
+        # Fill the cache for next time only now, so playback never competed with a second decode
+        uncached = [audio['file'] for audio in loaded_audio if not audio['cached']]
+        if uncached:
+            print(f"\nCaching {len(uncached)} file(s) for next time...")
+            for audio_file in uncached:
+                pool.submit(load_asset, audio_file, sample_rate)
+        pool.shutdown()
         print("\nPlayback complete!")
     except KeyboardInterrupt:
         # This might not be reached due to signal handler, but just in case
-        sd.stop()
+        stop_playback()
         print("\nPlayback interrupted")
         sys.exit(0)
 
@@ -244,7 +283,7 @@ Examples:
     parser.add_argument(
         '--normalize', '-n',
         action='store_true',
-        help='Normalize audio levels to equalize volume across all sounds'
+        help="Equalize volume across all sounds using the gains in sound/gains.json"
     )
 
     parser.add_argument(
@@ -288,9 +327,14 @@ Examples:
 
         audio_specs.append((file_path, channel))
 
+    # A numeric --device is an index, anything else is a (partial) name
+    device = args.device
+    if device is not None and device.isdigit():
+        device = int(device)
+
     # Play audio
     try:
-        play_audio_to_channels(audio_specs, device=args.device, normalize=args.normalize)
+        play_audio_to_channels(audio_specs, device=device, normalize=args.normalize)
     except Exception as e:
         print(f"Error: {e}")
         import traceback
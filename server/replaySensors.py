@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Replay a captureSensors.py CSV through the real prop and scene logic.
+
+The readings in a capture are fed, at their recorded times, into the same
+SensorQueues detectors, cooldowns, zone scheduler and timelines that the
+live servers run (hauntedHouseLoop2025.py and hauntedHouseSounds2025.py).
+Actuator publishes and scene playback are recorded instead of being sent
+to MQTT or the speakers, and the result is a list of what would have fired
+and when.
+
+Everything runs on an event loop with a virtual clock. asyncio.sleep(),
+the timelines, the scheduler's staleness timeouts and the handlers'
+cooldowns all follow it. At --speed 0 (the default) the clock jumps
+straight to the next timer whenever the loop is idle, so a whole night
+replays in seconds. --speed 1 replays in real time, and --speed N runs
+N times faster.
+
+Usage:
+    uv run replaySensors.py data/sensor_data_20251031_180000.csv
+    uv run replaySensors.py capture.csv --speed 60         # One minute per second
+    uv run replaySensors.py capture.csv --no-sounds        # Props only
+    uv run replaySensors.py capture.csv --output fired.csv --verbose
+
+The output CSV format is:
+    timestamp,handler,name,action
+"""
+
+import argparse
+import asyncio
+import csv
+import selectors
+import sys
+import time
+from datetime import datetime, timedelta
+from houseConfig import SENSOR_IDS, PROP_NAMES, SENSOR_THRESHOLD, DETECT_HIGHS, DETECT_WINDOW, PATH_MODEL_FILE
+from pathModel import PathModel, Prearmer
+from sensorQueues import SensorQueues
+from supervisor import Supervisor
+
+TAIL_SECONDS = 60  # Keep running this long after the last reading so running props finish
+
+
+class VirtualSelector(selectors.DefaultSelector):
+    """Selector that advances the loop's virtual clock instead of sleeping."""
+
+    def __init__(self, speed):
+        super().__init__()
+        self.speed = speed  # 0 = don't sleep at all
+        self.loop = None
+        self._anchor = None  # (real, virtual) time when the replay started, with a speed
+
+    def select(self, timeout=None):
+        ready = super().select(0)
+        if ready or timeout == 0 or self.loop is None:
+            return ready
+        if timeout is None:  # Nothing scheduled, only another thread can wake us
+            return super().select(None)
+        if self.speed:
+            # Sleep until the real time the next timer is due at. Pacing against a fixed anchor
+            # keeps the poller's millisecond rounding from adding up over many short waits.
+            if self._anchor is None:
+                self._anchor = (time.monotonic(), self.loop.virtual_time)
+            real_start, virtual_start = self._anchor
+            wait = real_start + (self.loop.virtual_time + timeout - virtual_start) / self.speed - time.monotonic()
+            if wait > 0:
+                ready = super().select(wait)
+                if ready:
+                    now = virtual_start + (time.monotonic() - real_start) * self.speed
+                    self.loop.virtual_time = min(max(now, self.loop.virtual_time), self.loop.virtual_time + timeout)
+                    return ready
+        self.loop.virtual_time += timeout
+        return []
+
+
+class VirtualClockLoop(asyncio.SelectorEventLoop):
+    """Event loop whose time() is a virtual clock starting at 0."""
+
+    def __init__(self, speed=0):
+        """
+        Args:
+            speed: Virtual seconds per real second, 0 for as fast as possible
+        """
+        self.virtual_time = 0.0
+        selector = VirtualSelector(speed)
+        super().__init__(selector)
+        selector.loop = self
+
+    def time(self):
+        return self.virtual_time
+
+
+def load_capture(path, device_ids):
+    """
+    Read a captureSensors.py CSV.
+
+    Args:
+        path: CSV with timestamp,device_id,device_name,sensor_value rows
+        device_ids: Devices to keep
+
+    Returns:
+        (start datetime, [(seconds since start, device_id, payload bytes), ...]) sorted by time
+    """
+    rows = []
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            if row["device_id"] not in device_ids:
+                continue
+            stamp = datetime.strptime(row["timestamp"], "%Y-%m-%d %H:%M:%S.%f")
+            rows.append((stamp, row["device_id"], row["sensor_value"].strip().encode()))
+    if not rows:
+        return None, []
+    rows.sort(key=lambda row: row[0])
+    start = rows[0][0]
+    return start, [((stamp - start).total_seconds(), device_id, payload) for stamp, device_id, payload in rows]
+
+
+class Recorder:
+    """Stands in for the MQTT link and the audio player, noting what would have fired."""
+
+    def __init__(self, loop, start, actuator_names=None, verbose=False):
+        """
+        Args:
+            loop: The VirtualClockLoop
+            start: Capture time (datetime) of virtual time 0
+            actuator_names: {topic: prop name} for the output (the topic's device ID otherwise)
+            verbose: Print the handlers' log lines
+        """
+        self.loop = loop
+        self.start = start
+        self.verbose = verbose
+        self.events = []  # (virtual seconds, handler, name, action)
+        self._actuator_names = actuator_names or {}
+
+    def wall(self, seconds):
+        return (self.start + timedelta(seconds=seconds)).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+
+    def log(self, message):
+        """Handler log lines, stamped with the capture's time instead of now (printed with --verbose)."""
+        if self.verbose:
+            self.report(message)
+
+    def report(self, message):
+        print(f"[{self.wall(self.loop.time())}] {message}")
+
+    def publish(self, topic, payload):
+        name = self._actuator_names.get(topic, topic.split("/")[1])
+        self.events.append((self.loop.time(), "props", name, payload))
+
+    async def play(self, scene_name, device_name, received_ns):
+        self.events.append((self.loop.time(), "sounds", scene_name, "play"))
+
+
+async def feed(sensor_queues, readings):
+    """Hand each reading to the detectors at its recorded (virtual) time."""
+    loop = asyncio.get_running_loop()
+    for offset, device_id, payload in readings:
+        delay = offset - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        sensor_queues.put_threadsafe(device_id, payload, int(offset * 1e9))
+    await asyncio.sleep(TAIL_SECONDS)
+
+
+def replay(path, speed=0, run_props=True, run_sounds=True, verbose=False, path_model=PATH_MODEL_FILE):
+    """
+    Replay one capture.
+
+    Args:
+        path: captureSensors.py CSV
+        speed: Virtual seconds per real second, 0 for as fast as possible
+        run_props, run_sounds: Which handlers to replay
+        verbose: Print the handlers' own log lines
+        path_model: pathModel.py model whose predictions are scored (house order if missing)
+
+    Returns:
+        (Recorder, handler modules, SensorQueues, Prearmer, capture length in seconds, real seconds taken)
+    """
+    # Imported here so a props-only replay doesn't need the audio stack
+    props = sounds = None
+    handlers = []
+    if run_props:
+        import hauntedHouseLoop2025 as props
+        handlers.append(props)
+    if run_sounds:
+        import hauntedHouseSounds2025 as sounds
+        handlers.append(sounds)
+
+    start, readings = load_capture(path, set(SENSOR_IDS))
+    if not readings:
+        return None, handlers, None, None, 0.0, 0.0
+
+    loop = VirtualClockLoop(speed)
+    asyncio.set_event_loop(loop)
+    actuator_names = {}
+    if props is not None:  # Name each actuator topic after the prop whose timeline publishes to it
+        actuator_names = {topic: PROP_NAMES[device_id]
+                          for device_id, cues in props.PROP_TIMELINES.items() for _, topic, _ in cues}
+    recorder = Recorder(loop, start, actuator_names, verbose)
+    sensor_queues = SensorQueues(SENSOR_IDS, DETECT_HIGHS, DETECT_WINDOW, SENSOR_THRESHOLD)
+    sensor_queues.bind(loop)
+    supervisor = Supervisor("replay", loop, log=recorder.report)  # Handler failures are always shown
+
+    for handler in handlers:
+        handler.log = recorder.log  # Stamp the handlers' log lines with the capture's time
+    if props is not None:
+        props.attach(recorder, sensor_queues, clock_fn=loop.time)
+        props.create_tasks(supervisor)
+    if sounds is not None:
+        sounds.attach(sensor_queues, clock_fn=loop.time, player=recorder.play)
+        sounds.create_tasks(supervisor)
+    # Predictions are scored, but nothing is warmed: there is no audio to page in
+    prearmer = Prearmer(PathModel.load(path_model, SENSOR_IDS), clock=loop.time, log=recorder.report)
+    prearmer.create_tasks(supervisor, sensor_queues, PROP_NAMES)
+
+    real_start = time.perf_counter()
+    try:
+        loop.run_until_complete(feed(sensor_queues, readings))
+    finally:
+        supervisor.cancel_all()
+        loop.run_until_complete(asyncio.sleep(0))  # Let the cancelled tasks finish
+        loop.close()
+    prearmer.expire(float('inf'))
+    return recorder, handlers, sensor_queues, prearmer, readings[-1][0], time.perf_counter() - real_start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a sensor capture through the prop and scene logic.')
+    parser.add_argument('capture', help='CSV written by captureSensors.py')
+    parser.add_argument('--speed', type=float, default=0,
+                        help='Virtual seconds per real second, 0 = as fast as possible (default: 0)')
+    parser.add_argument('--no-props', action='store_true', help="Don't replay the actuator handlers")
+    parser.add_argument('--no-sounds', action='store_true', help="Don't replay the audio handlers")
+    parser.add_argument('--output', help='Also write what fired to this CSV')
+    parser.add_argument('--verbose', action='store_true', help="Print the handlers' log lines")
+    parser.add_argument('--path-model', default=PATH_MODEL_FILE,
+                        help=f'Path model whose predictions are scored (default: {PATH_MODEL_FILE}, else the house order)')
+    args = parser.parse_args()
+    if args.no_props and args.no_sounds:
+        parser.error("Nothing to replay")
+
+    recorder, handlers, sensor_queues, prearmer, length, elapsed = replay(
+        args.capture, args.speed, not args.no_props, not args.no_sounds, args.verbose, args.path_model)
+    if recorder is None:
+        print(f"No readings from known sensors in {args.capture}")
+        sys.exit(1)
+
+    virtual = length + TAIL_SECONDS
+    print(f"\nReplayed {length / 3600:.2f} h of {args.capture} (+{TAIL_SECONDS}s tail) in {elapsed:.2f}s "
+          f"({virtual / elapsed if elapsed else float('inf'):.0f}x)")
+    print("=" * 60)
+    for offset, handler, name, action in recorder.events:
+        print(f"  {recorder.wall(offset)}  {handler:<6}  {name:<10}  {action}")
+
+    print("\nPer prop (triggers / suppressed by cooldown / suppressed busy):")
+    for handler in handlers:
+        label = "props" if handler.__name__ == "hauntedHouseLoop2025" else "sounds"
+        for device_id, count in handler.triggers.items():
+            print(f"  {label:<6}  {PROP_NAMES.get(device_id, device_id):<10}  {count:4d} / "
+                  f"{handler.suppressed_cooldown[device_id]:4d} / {handler.suppressed_busy[device_id]:4d}")
+    print(sensor_queues.summary(PROP_NAMES))
+    print(prearmer.summary(PROP_NAMES))
+
+    if args.output:
+        with open(args.output, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["timestamp", "handler", "name", "action"])
+            for offset, handler, name, action in recorder.events:
+                writer.writerow([recorder.wall(offset), handler, name, action])
+        print(f"\nWrote {len(recorder.events)} event(s) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Polyphase windowed-sinc resampler in NumPy.
+
+Replaces the np.interp resampling that the players used to do. Linear
+interpolation over a full np.linspace allocates several float64 arrays the
+length of the track and lets everything above the new Nyquist frequency
+alias back into the audible band. This resampler uses a Kaiser-windowed
+sinc low-pass split into polyphase branches and works in fixed-size
+blocks, so memory stays bounded and it can also run on a stream.
+
+Usage:
+    # Whole buffer (what audioAssets uses when transcoding into the cache)
+    samples_44k = resample(samples_24k, 24000, 44100)
+
+    # Streaming, one block at a time (e.g. long ambient beds)
+    resampler = PolyphaseResampler(48000, 44100)
+    for block in blocks:
+        out = resampler.process(block)
+    tail = resampler.flush()
+"""
+
+import math
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+TAPS_PER_PHASE = 32  # Filter length per polyphase branch when upsampling (scaled up when downsampling)
+KAISER_BETA = 8.6  # ~80 dB stopband attenuation
+ROLLOFF = 0.92  # Cutoff as a fraction of the lower Nyquist frequency
+BLOCK_SIZE = 65536  # Input frames per block in resample()
+
+
+def _design_phases(up, down, taps_per_phase, beta, rolloff):
+    """
+    Design the low-pass prototype at the upsampled rate and split it into `up` branches.
+
+    Returns:
+        (up, taps_per_phase) float32 array; row p holds branch p reversed, ready to be
+        dotted with an ascending window of input samples
+    """
+    length = up * taps_per_phase
+    cutoff = rolloff * 0.5 / max(up, down)  # Cycles per upsampled sample
+    # Symmetric odd-length filter centred on tap length // 2 with its (near-zero) last tap dropped,
+    # so the group delay is a whole number of upsampled samples
+    k = np.arange(length) - length // 2
+    prototype = 2 * cutoff * np.sinc(2 * cutoff * k) * np.kaiser(length + 1, beta)[:length]
+    prototype *= up / prototype.sum()  # Unity DC gain after zero-stuffing by `up`
+    branches = prototype.reshape(taps_per_phase, up).T  # branches[p, t] = prototype[p + t * up]
+    return np.ascontiguousarray(branches[:, ::-1], dtype=np.float32)
+
+
+class PolyphaseResampler:
+    """Stateful rational-ratio resampler; feed it blocks with process(), then flush()."""
+
+    def __init__(self, source_rate, target_rate, taps_per_phase=TAPS_PER_PHASE, beta=KAISER_BETA, rolloff=ROLLOFF):
+        g = math.gcd(int(source_rate), int(target_rate))
+        self.source_rate = int(source_rate)
+        self.target_rate = int(target_rate)
+        self.up = self.target_rate // g
+        self.down = self.source_rate // g
+        # When downsampling the cutoff is set by the output rate, so widen the filter to keep
+        # the same number of taps per cutoff period
+        self.taps = taps_per_phase * max(1, -(-self.down // self.up))
+        self.phases = _design_phases(self.up, self.down, self.taps, beta, rolloff)
+        self.delay = (self.up * self.taps) // 2  # Group delay in upsampled samples
+        self.reset()
+
+    def reset(self):
+        """Forget all history (e.g. before looping back to the start of a file)."""
+        self._buffer = np.zeros(self.taps - 1, dtype=np.float32)  # Zeros stand in for samples before the start
+        self._buffer_start = -(self.taps - 1)  # Absolute input index of _buffer[0]
+        self._inputs = 0  # Input frames received so far
+        self._outputs = 0  # Output frames produced so far
+
+    def output_length(self, input_frames):
+        """Number of output frames that input_frames of input resample to."""
+        return -(-input_frames * self.up // self.down)
+
+    def process(self, block):
+        """
+        Resample the next block of mono input.
+
+        Returns:
+            float32 array with every output frame that the input so far fully determines
+        """
+        block = np.asarray(block, dtype=np.float32)
+        if self.up == self.down:
+            self._inputs += len(block)
+            self._outputs += len(block)
+            return block.copy()
+        self._buffer = np.concatenate((self._buffer, block))
+        self._inputs += len(block)
+        return self._emit(self._buffer_start + len(self._buffer))
+
+    def flush(self):
+        """Return the remaining output frames, padding the input with silence."""
+        if self.up == self.down:
+            return np.zeros(0, dtype=np.float32)
+        total = self.output_length(self._inputs)
+        self._buffer = np.concatenate((self._buffer, np.zeros(self.taps, dtype=np.float32)))
+        return self._emit(self._buffer_start + len(self._buffer), limit=total)
+
+    def _emit(self, available_end, limit=None):
+        """Produce outputs whose input windows end before available_end (absolute index)."""
+        up, down = self.up, self.down
+        start = self._outputs
+        # Output m needs input index (m * down + delay) // up, which must be < available_end
+        stop = (available_end * up - self.delay - 1) // down + 1
+        if limit is not None:
+            stop = min(stop, limit)
+        count = stop - start
+        if count <= 0:
+            return np.zeros(0, dtype=np.float32)
+
+        out = np.empty(count, dtype=np.float32)
+        windows = sliding_window_view(self._buffer, self.taps)  # View, no copy
+
+        # Outputs `up` apart share a polyphase branch and their windows are `down` inputs apart,
+        # so each branch is a single strided matrix-vector product
+        for r in range(min(up, count)):
+            n = (start + r) * down + self.delay
+            phase = n % up
+            first = n // up - (self.taps - 1) - self._buffer_start
+            branch_count = len(range(r, count, up))
+            out[r::up] = windows[first:first + (branch_count - 1) * down + 1:down] @ self.phases[phase]
+
+        self._outputs = stop
+
+        # Keep only the history the next output will need
+        next_first = (stop * down + self.delay) // up - (self.taps - 1)
+        drop = max(0, next_first - self._buffer_start)
+        if drop:
+            self._buffer = self._buffer[drop:]
+            self._buffer_start += drop
+        return out
+
+
+def resample(samples, source_rate, target_rate, block_size=BLOCK_SIZE):
+    """
+    Resample a whole mono buffer in fixed-size blocks.
+
+    Args:
+        samples: 1-D array of mono samples
+        source_rate: Sample rate of samples
+        target_rate: Desired sample rate
+        block_size: Input frames processed per block (bounds temporary memory)
+
+    Returns:
+        float32 array of length ceil(len(samples) * target_rate / source_rate)
+    """
+    if source_rate == target_rate:
+        return np.asarray(samples, dtype=np.float32)
+
+    resampler = PolyphaseResampler(source_rate, target_rate)
+    out = np.empty(resampler.output_length(len(samples)), dtype=np.float32)
+    written = 0
+    for start in range(0, len(samples), block_size):
+        block = resampler.process(samples[start:start + block_size])
+        out[written:written + len(block)] = block
+        written += len(block)
+    tail = resampler.flush()
+    out[written:written + len(tail)] = tail
+    return out
@@ -0,0 +1,185 @@
+"""
+Event-driven motion detection for sensor messages arriving on paho's network thread.
+
+on_message runs on paho's thread, so it must not touch asyncio objects
+directly. put_threadsafe() schedules the reading on the event loop with
+loop.call_soon_threadsafe(), where it immediately updates that sensor's
+streaming Detector (see detector.py). There is one detector per sensor, and
+its detections fan out to every listener of that sensor (e.g. the prop
+handler and the sound handler), so all of them see the same detection at
+the same time. A sensor nobody listens to costs a fixed few bytes of
+detector state instead of a growing list.
+
+Counters per sensor: readings received, processed by the detector,
+dropped (malformed payload, or no event loop yet), detections and
+detections a listener overflowed (dropped because its queue was full), plus
+the smoothed time between readings and its jitter (see metrics.py).
+
+Usage:
+    sensor_queues = SensorQueues([PROP1, PROP3], n=2, m=2)
+    link.route_sensors(sensor_queues.device_ids, sensor_queues.put_threadsafe)  # See mqttLink.py
+
+    door = sensor_queues.listen(PROP1)
+
+    async def process_queue_PROP1():
+        while True:
+            received_ns = await door.get()
+            ...
+            door.reset()  # Ignore detections from readings that came in during a cooldown
+
+    sensor_queues.bind(loop)  # Before link.start()
+    log(sensor_queues.summary())
+"""
+
+import asyncio
+from detector import Detector
+
+QUEUE_SIZE = 8  # Detections buffered per listener while its prop is busy (oldest dropped first)
+ARRIVAL_SMOOTHING = 1 / 16  # EWMA weight of each new inter-arrival gap (the RFC 3550 jitter gain)
+
+
+class DetectionListener:
+    """One consumer's queue of detections for one sensor."""
+
+    def __init__(self, detector, maxsize):
+        self.queue = asyncio.Queue(maxsize)
+        self._detector = detector
+        self._first_reading = 0  # Detections must come from readings at or after this count
+        self.overflowed = 0  # Oldest detections dropped because the queue was full
+
+    async def get(self):
+        """
+        Wait for the sensor's next detection.
+
+        Returns:
+            Monotonic receipt time (ns) of the reading that completed the detection
+        """
+        return await self.queue.get()
+
+    def reset(self):
+        """
+        Drop queued detections and ignore new ones until the detector's whole window
+        has been refilled with readings that arrive after this call.
+        """
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self._first_reading = self._detector.readings + self._detector.m
+
+    def _offer(self, received_ns):
+        if self._detector.readings < self._first_reading:
+            return
+        if self.queue.full():
+            self.queue.get_nowait()  # Keep the newest detection
+            self.overflowed += 1
+        self.queue.put_nowait(received_ns)
+
+
+class SensorQueues:
+    """One Detector per sensor, fed from another thread, fanning detections out to listeners."""
+
+    def __init__(self, device_ids, n=2, m=2, threshold=0, maxsize=QUEUE_SIZE):
+        """
+        Args:
+            device_ids: Sensors to track
+            n, m: Detection rule, fire when n of the last m readings are high
+            threshold: A reading is high when it is greater than this
+            maxsize: Detections buffered per listener
+        """
+        self.maxsize = maxsize
+        self.detectors = {device_id: Detector(n, m, threshold) for device_id in device_ids}
+        self.listeners = {device_id: [] for device_id in device_ids}
+        self.received = dict.fromkeys(self.detectors, 0)  # Readings handed to the event loop
+        self.processed = dict.fromkeys(self.detectors, 0)  # Readings run through the detector
+        self.dropped = dict.fromkeys(self.detectors, 0)  # Readings discarded (malformed, or no loop)
+        self.detections = dict.fromkeys(self.detectors, 0)  # Times the detector fired
+        self.last_ns = dict.fromkeys(self.detectors, 0)  # Receipt time of the previous reading
+        self.gap_ms = dict.fromkeys(self.detectors, 0.0)  # Smoothed time between readings
+        self.jitter_ms = dict.fromkeys(self.detectors, 0.0)  # Smoothed |gap - mean gap|
+        self._loop = None
+
+    @property
+    def device_ids(self):
+        return list(self.detectors)
+
+    def bind(self, loop):
+        """Set the event loop the consumers run on (call before messages start arriving)."""
+        self._loop = loop
+
+    def __contains__(self, device_id):
+        return device_id in self.detectors
+
+    def listen(self, device_id):
+        """Return a new DetectionListener that receives every detection of a sensor."""
+        listener = DetectionListener(self.detectors[device_id], self.maxsize)
+        self.listeners[device_id].append(listener)
+        return listener
+
+    def put_threadsafe(self, device_id, payload, received_ns):
+        """
+        Hand one reading to the event loop from any thread (normally paho's on_message).
+
+        Args:
+            device_id: Sensor the reading came from
+            payload: Raw MQTT payload, e.g. b"1"
+            received_ns: time.monotonic_ns() when the message was received
+
+        Returns:
+            True if the sensor is tracked
+        """
+        if device_id not in self.detectors:
+            return False
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            self.dropped[device_id] += 1
+            return True
+        loop.call_soon_threadsafe(self._update, device_id, payload, received_ns)
+        return True
+
+    def _update(self, device_id, payload, received_ns):
+        # Runs on the event loop thread, so detector state is never shared between threads
+        self.received[device_id] += 1
+        last_ns = self.last_ns[device_id]
+        self.last_ns[device_id] = received_ns
+        if last_ns:
+            gap_ms = (received_ns - last_ns) / 1e6
+            mean_ms = self.gap_ms[device_id] or gap_ms
+            self.jitter_ms[device_id] += (abs(gap_ms - mean_ms) - self.jitter_ms[device_id]) * ARRIVAL_SMOOTHING
+            self.gap_ms[device_id] = mean_ms + (gap_ms - mean_ms) * ARRIVAL_SMOOTHING
+        try:
+            value = int(payload)  # int() parses ASCII bytes directly, no decode needed
+        except ValueError:
+            self.dropped[device_id] += 1
+            return
+        self.processed[device_id] += 1
+        if not self.detectors[device_id].update(value):
+            return
+
+        self.detections[device_id] += 1
+        for listener in self.listeners[device_id]:
+            listener._offer(received_ns)
+
+    def rate(self, device_id):
+        """Smoothed readings per second of a sensor (0 until it has sent two readings)."""
+        gap_ms = self.gap_ms[device_id]
+        return 1000 / gap_ms if gap_ms else 0.0
+
+    def queue_depth(self, device_id):
+        """Detections waiting in all of a sensor's listener queues."""
+        return sum(listener.queue.qsize() for listener in self.listeners[device_id])
+
+    def overflowed(self, device_id):
+        """Detections dropped from any of a sensor's listener queues because they were full."""
+        return sum(listener.overflowed for listener in self.listeners[device_id])
+
+    def summary(self, names=None):
+        """
+        One human-readable line with the counters of every sensor.
+
+        Args:
+            names: Optional {device_id: label} used instead of the device IDs
+        """
+        names = names or {}
+        parts = [f"{names.get(device_id, device_id)} {self.received[device_id]}/{self.processed[device_id]}/"
+                 f"{self.dropped[device_id]}/{self.detections[device_id]}/{self.overflowed(device_id)}"
+                 for device_id in self.detectors]
+        return "Sensor readings (received/processed/dropped/detections/overflowed): " + ", ".join(parts)
@@ -0,0 +1,237 @@
+"""
+Horizontal scaling of the orchestrator across several worker processes.
+
+One main.py process handles every sensor with one network thread and one
+event loop. For a bigger venue, `main.py --workers N --worker I` runs
+worker I of N. Each worker owns a partition of the devices and subscribes
+to just those devices' sensor topics, so the workers can run on separate
+cores or machines.
+
+Devices are assigned with rendezvous (highest random weight) hashing.
+Every worker computes the same assignment from the same configuration
+without talking to the others, and going from N to N+1 workers only moves
+about 1/(N+1) of the devices. Props that share a resource in
+PROP_RESOURCES are hashed as one group. A zone is then always scheduled by
+a single worker, and its lock never has to be negotiated over the network.
+
+MQTT v5 shared subscriptions ($share/<group>/device/+/sensor) are not used
+for this. The broker balances them per message, so one sensor's readings
+would be split between workers, and the N-of-M detectors need every
+reading of their sensor.
+
+Coordination state is shared through retained topics under house/state/:
+    house/state/cooldown/<MAC>    {"worker": 1, "at": <wall clock>}            when a prop runs
+    house/state/zone/<resource>   {"worker": 1, "holder": "...", "until": ...}  while a prop holds it (empty when released)
+A worker that starts, restarts or takes over devices after a rebalance
+gets the retained messages when it subscribes. It respects cooldowns that
+another worker started, and it waits for zones another worker holds
+(entered into its own ZoneScheduler with hold()). A zone lock expires
+after LOCK_TTL_SECONDS in case its worker died while holding it.
+
+With one configuration, zone locks never cross workers, because props
+sharing a resource are always assigned together. The locks only matter
+while the workers disagree about the assignment. That happens during a
+rolling change of --workers or PROP_RESOURCES, when the old owner of a
+group can still be running one of its props while the new owner
+triggers another prop in the same zone. Until every worker restarts,
+the retained lock keeps those two props from overlapping.
+
+Usage:
+    owned = owned_devices(SENSOR_IDS, workers=3, worker=0, resources=PROP_RESOURCES)
+    link.route_sensors(owned, sensor_queues.put_threadsafe, wildcard=False)
+
+    shared = SharedState(link, worker=0, loop=loop, log=log)  # Before link.start()
+    props.attach(link, sensor_queues, shared=shared)
+"""
+
+import hashlib
+import json
+import time
+
+STATE_TOPIC = "house/state"
+COOLDOWN_TOPIC = STATE_TOPIC + "/cooldown/{device_id}"
+ZONE_TOPIC = STATE_TOPIC + "/zone/{resource}"
+LOCK_TTL_SECONDS = 120.0  # A zone lock older than this is ignored (its worker died holding it)
+REMOTE_HOLDER = "worker{worker}:{resource}"  # ZoneScheduler holder name of another worker's lock
+
+
+def _weight(worker, key):
+    """Stable 64-bit hash of (worker, key); Python's hash() differs between processes."""
+    return int.from_bytes(hashlib.blake2b(f"{worker}/{key}".encode(), digest_size=8).digest(), "big")
+
+
+def owner(key, workers):
+    """
+    Rendezvous hashing: the worker with the highest weight for the key owns it.
+
+    Args:
+        key: Device MAC or group key
+        workers: Number of workers
+
+    Returns:
+        Worker index in range(workers)
+    """
+    return max(range(workers), key=lambda worker: _weight(worker, key))
+
+
+def device_groups(device_ids, resources=None):
+    """
+    Group devices that (transitively) share a resource, so they land on the same worker.
+
+    Args:
+        device_ids: All devices
+        resources: Optional {device_id: set of resource names}, e.g. PROP_RESOURCES
+
+    Returns:
+        {device_id: group key}; a device without shared resources is its own group
+    """
+    parent = {device_id: device_id for device_id in device_ids}
+
+    def find(device_id):
+        while parent[device_id] != device_id:
+            parent[device_id] = parent[parent[device_id]]
+            device_id = parent[device_id]
+        return device_id
+
+    users = {}  # Resource -> first device seen using it
+    for device_id, needs in (resources or {}).items():
+        if device_id not in parent:
+            continue
+        for resource in needs:
+            first = users.setdefault(resource, device_id)
+            a, b = find(first), find(device_id)
+            if a != b:
+                parent[max(a, b)] = min(a, b)  # The smallest MAC names the group, whatever the order
+    return {device_id: find(device_id) for device_id in device_ids}
+
+
+def partition(device_ids, workers, resources=None):
+    """
+    Assign every device to a worker.
+
+    Args:
+        device_ids: All devices
+        workers: Number of workers
+        resources: Optional {device_id: resources}; devices sharing one stay together
+
+    Returns:
+        {worker: [device_ids in their original order]}
+    """
+    groups = device_groups(device_ids, resources)
+    assignment = {worker: [] for worker in range(workers)}
+    for device_id in device_ids:
+        assignment[owner(groups[device_id], workers)].append(device_id)
+    return assignment
+
+
+def owned_devices(device_ids, workers, worker, resources=None):
+    """The devices worker owns out of device_ids (see partition())."""
+    return partition(device_ids, workers, resources)[worker]
+
+
+class SharedState:
+    """Publishes this worker's cooldowns and zone locks as retained messages and applies the other workers'."""
+
+    def __init__(self, link, worker, loop, log=print):
+        """
+        Args:
+            link: MqttLink (subscribes to house/state/#, so create this before link.start())
+            worker: This worker's index
+            loop: Event loop the handlers run on (updates from the network thread are applied there)
+            log: Called with one line per remote lock and per lock that expired
+        """
+        self.link = link
+        self.worker = worker
+        self.loop = loop
+        self.log = log
+        self.last_run_time = {}  # Set by track(): the handler's {device_id: monotonic last run}
+        self.clock = time.monotonic
+        self.scheduler = None
+        self.published = 0
+        self.applied = 0  # Other workers' updates applied
+        self._remote = {}  # Resource -> ZoneScheduler holder name of the worker holding it
+        self._expiry = {}  # Resource -> TimerHandle releasing another worker's lock
+        link.subscribe(STATE_TOPIC + "/#", self._on_message)
+
+    def track(self, last_run_time, scheduler=None, clock=time.monotonic):
+        """
+        Share a handler's cooldowns and (optionally) its zone scheduler's locks.
+
+        Args:
+            last_run_time: The handler's {device_id: last run} dict, updated in place from other workers
+            scheduler: ZoneScheduler whose grants and releases are published, and which holds other workers' locks
+            clock: The clock last_run_time is kept in
+        """
+        self.last_run_time = last_run_time
+        self.clock = clock
+        self.scheduler = scheduler
+        if scheduler is not None:
+            scheduler.on_change = self._zone_changed
+
+    def ran(self, device_id):
+        """Tell the other workers a prop just ran (call right after setting last_run_time)."""
+        self._publish(COOLDOWN_TOPIC.format(device_id=device_id),
+                      json.dumps({"worker": self.worker, "at": time.time()}))
+
+    def _zone_changed(self, name, resources, held):
+        # Only another worker that (still or already) owns a prop in this zone acts on it, see the module docstring
+        payload = json.dumps({"worker": self.worker, "holder": str(name), "until": time.time() + LOCK_TTL_SECONDS})
+        for resource in resources:
+            self._publish(ZONE_TOPIC.format(resource=resource), payload if held else "")
+
+    def _publish(self, topic, payload):
+        self.link.publish(topic, payload, retain=True)
+        self.published += 1
+
+    def _on_message(self, topic, payload):
+        # Network thread: hand over to the event loop, which owns last_run_time and the scheduler
+        self.loop.call_soon_threadsafe(self._apply, topic, payload)
+
+    def _apply(self, topic, payload):
+        kind, _, key = topic[len(STATE_TOPIC) + 1:].partition("/")
+        try:
+            state = json.loads(payload) if payload else None
+        except ValueError:
+            return
+        if state is not None and state.get("worker") == self.worker:
+            return  # Our own retained message coming back
+        if kind == "cooldown" and state is not None and key in self.last_run_time:
+            # Wall clock across machines, converted to this process's clock; never moves a cooldown back
+            ran_at = self.clock() - (time.time() - state["at"])
+            if ran_at > self.last_run_time[key]:
+                self.last_run_time[key] = ran_at
+                self.applied += 1
+        elif kind == "zone" and self.scheduler is not None:
+            self._apply_zone(key, state)
+
+    def _apply_zone(self, resource, state):
+        timer = self._expiry.pop(resource, None)
+        if timer is not None:
+            timer.cancel()
+        previous = self._remote.pop(resource, None)  # One outside holder per resource, whichever worker holds it now
+        if previous is not None:
+            self.scheduler.release(previous)
+        if state is None:
+            return  # Released
+        remaining = state["until"] - time.time()
+        if remaining <= 0:
+            return  # Stale lock of a worker that went away
+        name = REMOTE_HOLDER.format(worker=state["worker"], resource=resource)
+        self.scheduler.hold(name, {resource})
+        self._remote[resource] = name
+        self._expiry[resource] = self.loop.call_later(remaining, self._expire, name, resource)
+        self.applied += 1
+        self.log(f"Zone {resource} held by worker {state['worker']} ({state['holder']})")
+
+    def _expire(self, name, resource):
+        self._expiry.pop(resource, None)
+        if self._remote.get(resource) == name:
+            del self._remote[resource]
+            self.log(f"Zone lock {resource} of {name.split(':')[0]} expired")
+            self.scheduler.release(name)
+
+    def summary(self):
+        """One human-readable line with the shared-state counters."""
+        remote = sorted(self._remote.values())
+        return (f"Shared state (worker {self.worker}): {self.published} published, {self.applied} applied, "
+                f"remote locks: {', '.join(remote) if remote else 'none'}")
@@ -0,0 +1,156 @@
+"""
+In-process supervision of the servers' long-running asyncio tasks.
+
+A handler coroutine that raised used to die silently while the rest of the
+house kept running. Only a whole-process crash was noticed, by
+runHouse.sh/runLoop.sh/runSounds.sh, and that recovery cost a 3 second
+sleep, an MQTT reconnect and reloading every sound. The Supervisor watches
+every task it starts. When one fails, it logs the traceback and restarts
+just that task: immediately the first time, then with exponential backoff
+if it keeps failing. A task that has stayed up for STABLE_SECONDS is
+considered healthy again. Restart counts are kept per task. A heartbeat is
+published over MQTT so a missing server can be spotted from the broker.
+
+Usage:
+    supervisor = Supervisor("house", loop, link.publish, log)
+    supervisor.start("COFFIN", process_queue_PROP3)  # Pass the coroutine function, not a coroutine
+    supervisor.start_heartbeat()
+    ...
+    log(supervisor.summary())
+    supervisor.cancel_all()
+"""
+
+import asyncio
+import json
+import time
+import traceback
+from metrics import family
+
+RESTART_BASE_SECONDS = 0.01  # Second consecutive failure waits this long, then doubles
+RESTART_MAX_SECONDS = 30.0
+STABLE_SECONDS = 60.0  # Up this long since the last restart -> the next failure restarts immediately again
+HEARTBEAT_SECONDS = 5.0
+HEARTBEAT_TOPIC = "server/{name}/heartbeat"
+
+
+def restart_delay(failures, base=RESTART_BASE_SECONDS, cap=RESTART_MAX_SECONDS):
+    """No wait for the first failure in a row, then base, 2*base, 4*base, ... up to cap."""
+    if failures <= 1:
+        return 0.0
+    return min(cap, base * 2 ** (failures - 2))
+
+
+class SupervisedTask:
+    """Bookkeeping for one named task."""
+
+    def __init__(self, name, factory):
+        self.name = name
+        self.factory = factory  # Coroutine function that starts the task afresh
+        self.task = None
+        self.restarts = 0  # Restarts since the server started
+        self.failures = 0  # Failures in a row (reset once the task has been stable)
+        self.started = 0.0  # Monotonic time of the last (re)start
+        self.last_error = None
+
+
+class Supervisor:
+    """Starts named tasks and restarts any that fail, with backoff."""
+
+    def __init__(self, name, loop, publish=None, log=print):
+        """
+        Args:
+            name: Server name for the heartbeat topic (server/<name>/heartbeat)
+            loop: Event loop the tasks run on (it doesn't have to be running yet)
+            publish: Called as publish(topic, payload) for heartbeats (None for no heartbeat)
+            log: Called with one line per failure and restart
+        """
+        self.name = name
+        self.loop = loop
+        self.publish = publish
+        self.log = log
+        self.tasks = {}  # Name -> SupervisedTask
+        self.heartbeats = 0
+        self._started = time.monotonic()
+        self._stopping = False
+
+    def start(self, name, factory):
+        """
+        Start a supervised task.
+
+        Args:
+            name: Unique label used in logs, restart counts and the heartbeat
+            factory: Coroutine function called (with no arguments) for every (re)start
+        """
+        supervised = SupervisedTask(name, factory)
+        self.tasks[name] = supervised
+        self._spawn(supervised)
+        return supervised
+
+    def start_heartbeat(self, interval=HEARTBEAT_SECONDS):
+        """Publish the heartbeat every interval seconds (supervised like any other task)."""
+        if self.publish is not None:
+            self.start("heartbeat", lambda: self._heartbeat(interval))
+
+    def cancel_all(self):
+        """Cancel every task without restarting it (for shutdown)."""
+        self._stopping = True
+        for supervised in self.tasks.values():
+            if supervised.task is not None:
+                supervised.task.cancel()
+
+    def _spawn(self, supervised):
+        supervised.started = time.monotonic()
+        supervised.task = self.loop.create_task(supervised.factory(), name=supervised.name)
+        supervised.task.add_done_callback(lambda task: self._on_done(supervised, task))
+
+    def _on_done(self, supervised, task):
+        if self._stopping or task.cancelled():
+            return
+        error = task.exception()
+        if error is None:
+            self.log(f"Task {supervised.name} finished")
+            return
+
+        if time.monotonic() - supervised.started >= STABLE_SECONDS:
+            supervised.failures = 0
+        supervised.failures += 1
+        supervised.restarts += 1
+        supervised.last_error = repr(error)
+        delay = restart_delay(supervised.failures)
+        details = "".join(traceback.format_exception(error)).rstrip()
+        self.log(f"Task {supervised.name} failed, restart #{supervised.restarts} in {delay * 1000:.0f} ms:\n{details}")
+        if delay:
+            self.loop.call_later(delay, self._restart, supervised)
+        else:
+            self.loop.call_soon(self._restart, supervised)
+
+    def _restart(self, supervised):
+        if not self._stopping:
+            self._spawn(supervised)
+
+    async def _heartbeat(self, interval):
+        topic = HEARTBEAT_TOPIC.format(name=self.name)
+        while True:
+            self.publish(topic, json.dumps({
+                "uptime": round(time.monotonic() - self._started, 1),
+                "running": sum(1 for s in self.tasks.values() if s.task is not None and not s.task.done()),
+                "restarts": {name: s.restarts for name, s in self.tasks.items() if s.restarts},
+            }))
+            self.heartbeats += 1
+            await asyncio.sleep(interval)
+
+    def metrics(self):
+        """Per-task restart counts and running state for the /metrics endpoint."""
+        tasks = list(self.tasks.values())
+        return [
+            family("haunted_task_restarts_total", "counter", "Times a supervised task failed and was restarted",
+                   [({"task": s.name}, s.restarts) for s in tasks]),
+            family("haunted_task_running", "gauge", "1 while a supervised task is running",
+                   [({"task": s.name}, int(s.task is not None and not s.task.done())) for s in tasks]),
+        ]
+
+    def summary(self):
+        """One human-readable line with the restart counts."""
+        restarted = [f"{s.name} {s.restarts}" for s in self.tasks.values() if s.restarts]
+        return (f"Supervisor: {len(self.tasks)} task(s), "
+                f"restarts: {', '.join(restarted) if restarted else 'none'}, {self.heartbeats} heartbeat(s)")
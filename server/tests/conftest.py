@@ -0,0 +1,19 @@
+"""Shared fixtures: coroutines run on replaySensors' virtual clock, so timeouts are exact and instant."""
+
+import pytest
+from replaySensors import VirtualClockLoop
+
+
+@pytest.fixture
+def run():
+    """Run a coroutine to completion on a fresh VirtualClockLoop (loop.time() starts at 0)."""
+    loops = []
+
+    def run(coroutine):
+        loop = VirtualClockLoop()
+        loops.append(loop)
+        return loop.run_until_complete(coroutine)
+
+    yield run
+    for loop in loops:
+        loop.close()
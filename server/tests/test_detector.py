@@ -0,0 +1,62 @@
+"""Tests for the streaming N-of-M detector (detector.py)."""
+
+import random
+import pytest
+from detector import Detector
+
+
+def brute_force(values, n, m, threshold=0):
+    """Reference: at least n of the last m readings above threshold, recounted for every reading."""
+    return [sum(v > threshold for v in values[max(0, i - m + 1):i + 1]) >= n for i in range(len(values))]
+
+
+def test_two_of_two_is_two_consecutive_highs():
+    detector = Detector(2, 2)
+    assert [detector.update(v) for v in (1, 0, 1, 1, 1, 0, 1)] == [False, False, False, True, True, False, False]
+
+
+def test_high_leaves_the_window_after_m_readings():
+    detector = Detector(2, 3)
+    assert [detector.update(v) for v in (1, 0, 1)] == [False, False, True]
+    assert detector.update(0) is False  # Window is now 0, 1, 0: the first high fell out
+    assert detector.highs == 1
+
+
+@pytest.mark.parametrize("n, m", [(1, 1), (2, 2), (2, 3), (3, 5), (4, 8), (5, 16)])
+def test_matches_brute_force_window(n, m):
+    rng = random.Random(n * 100 + m)
+    values = [rng.choice((0, 0, 1)) for _ in range(2000)]
+    detector = Detector(n, m)
+    fired = []
+    for value in values:
+        fired.append(detector.update(value))
+        assert detector.highs == bin(detector.window).count("1")  # Running count never drifts from the mask
+        assert detector.window < 1 << m  # State stays m bits wide
+    assert fired == brute_force(values, n, m)
+
+
+def test_threshold():
+    detector = Detector(1, 1, threshold=50)
+    assert [detector.update(v) for v in (50, 51, 0, 100)] == [False, True, False, True]
+
+
+def test_run_counts_consecutive_highs():
+    detector = Detector(2, 4)
+    for value in (1, 1, 0, 1, 1, 1):
+        detector.update(value)
+    assert detector.run == 3
+    assert detector.readings == 6
+
+
+def test_reset_forgets_readings():
+    detector = Detector(2, 2)
+    detector.update(1)
+    detector.reset()
+    assert (detector.window, detector.highs, detector.run, detector.readings) == (0, 0, 0, 0)
+    assert detector.update(1) is False  # The high from before the reset doesn't count
+
+
+@pytest.mark.parametrize("n, m", [(0, 2), (3, 2), (1, 0)])
+def test_invalid_rule(n, m):
+    with pytest.raises(ValueError):
+        Detector(n, m)
@@ -0,0 +1,67 @@
+"""Tests for the polyphase windowed-sinc resampler (resample.py)."""
+
+import numpy as np
+import pytest
+from resample import PolyphaseResampler, resample
+
+EDGE = 200  # Output frames at each end where the filter still sees the zero padding
+
+
+def tone(frequency, rate, seconds=1.0):
+    return np.sin(2 * np.pi * frequency * np.arange(int(rate * seconds)) / rate).astype(np.float32)
+
+
+@pytest.mark.parametrize("source, target, frequency", [
+    (48000, 44100, 1000),
+    (44100, 48000, 5000),
+    (24000, 44100, 3000),
+    (22050, 44100, 440),
+])
+def test_passband_tone_is_reproduced_in_time(source, target, frequency):
+    out = resample(tone(frequency, source), source, target)
+    assert len(out) == target
+    # Against the same tone sampled at the target rate: no gain error, no delay, under -80 dB error
+    ideal = np.sin(2 * np.pi * frequency * np.arange(len(out)) / target)
+    assert np.abs(out - ideal)[EDGE:-EDGE].max() < 1e-4
+
+
+def test_tone_above_the_new_nyquist_is_removed():
+    # np.interp folds a 23.5 kHz tone back to 20.6 kHz at full level; the filter must remove it
+    out = resample(tone(23500, 48000), 48000, 44100)
+    level_db = 20 * np.log10(np.sqrt(np.mean(out[EDGE:-EDGE] ** 2)))
+    assert level_db < -70
+
+
+@pytest.mark.parametrize("frames", [0, 1, 147, 48000, 100001])
+def test_output_length(frames):
+    assert len(resample(np.zeros(frames, dtype=np.float32), 48000, 44100)) == -(-frames * 147 // 160)
+
+
+def test_streaming_in_uneven_blocks_matches_whole_buffer():
+    rng = np.random.default_rng(5)
+    samples = rng.uniform(-1, 1, 30000).astype(np.float32)
+    whole = resample(samples, 48000, 44100)
+
+    resampler = PolyphaseResampler(48000, 44100)
+    parts, start = [], 0
+    for size in rng.integers(1, 4000, 100):
+        parts.append(resampler.process(samples[start:start + size]))
+        start += size
+        if start >= len(samples):
+            break
+    parts.append(resampler.process(samples[start:]))
+    parts.append(resampler.flush())
+    streamed = np.concatenate(parts)
+    assert len(streamed) == len(whole)
+    np.testing.assert_allclose(streamed, whole, atol=1e-6)
+
+
+def test_block_size_does_not_change_the_result():
+    samples = tone(1234, 44100, 0.5)
+    np.testing.assert_allclose(resample(samples, 44100, 48000, block_size=1000),
+                               resample(samples, 44100, 48000), atol=1e-6)
+
+
+def test_same_rate_is_a_no_op():
+    samples = tone(440, 44100, 0.1)
+    np.testing.assert_array_equal(resample(samples, 44100, 44100), samples)
@@ -0,0 +1,91 @@
+"""Tests for the per-sensor detection fan-out and listener reset (sensorQueues.py)."""
+
+import asyncio
+from sensorQueues import SensorQueues
+
+SENSOR = "60:55:F9:7B:82:40"
+OTHER = "60:55:F9:7B:5F:2C"
+
+
+def feed(sensor_queues, readings, device_id=SENSOR):
+    """Run readings through the pipeline on a bound event loop; returns once they were processed."""
+    async def run():
+        sensor_queues.bind(asyncio.get_running_loop())
+        for i, payload in enumerate(readings):
+            sensor_queues.put_threadsafe(device_id, payload, i + 1)
+        await asyncio.sleep(0)  # Let the call_soon_threadsafe callbacks run
+    asyncio.run(run())
+
+
+def queued(listener):
+    """Receipt times waiting in a listener's queue, oldest first."""
+    items = []
+    while not listener.queue.empty():
+        items.append(listener.queue.get_nowait())
+    return items
+
+
+def test_detection_reaches_every_listener_with_its_receipt_time():
+    sensor_queues = SensorQueues([SENSOR, OTHER], n=2, m=2)
+    first, second = sensor_queues.listen(SENSOR), sensor_queues.listen(SENSOR)
+    other = sensor_queues.listen(OTHER)
+    feed(sensor_queues, [b"0", b"1", b"1"])
+    assert queued(first) == [3]  # Stamp of the reading that completed the detection
+    assert queued(second) == [3]
+    assert queued(other) == []
+    assert sensor_queues.detections[SENSOR] == 1
+
+
+def test_reset_waits_for_m_new_readings():
+    sensor_queues = SensorQueues([SENSOR], n=2, m=3)
+    listener = sensor_queues.listen(SENSOR)
+    feed(sensor_queues, [b"1", b"1"])
+    assert queued(listener) == [2]
+
+    feed(sensor_queues, [b"1"])  # Still detecting: queued again
+    listener.reset()
+    assert listener.queue.empty()  # Detections from before the reset are dropped
+
+    # The detector still has the old highs in its window, so it keeps firing, but the listener
+    # ignores detections until its whole window is made of readings that came after the reset
+    feed(sensor_queues, [b"1", b"1"])
+    assert queued(listener) == []
+    feed(sensor_queues, [b"1"])
+    assert queued(listener) == [1]
+
+
+def test_reset_of_one_listener_leaves_the_others():
+    sensor_queues = SensorQueues([SENSOR], n=2, m=2)
+    resetting, other = sensor_queues.listen(SENSOR), sensor_queues.listen(SENSOR)
+    feed(sensor_queues, [b"1", b"1"])
+    resetting.reset()
+    feed(sensor_queues, [b"1"])
+    assert queued(resetting) == []
+    assert queued(other) == [2, 1]
+
+
+def test_full_queue_keeps_the_newest_detections():
+    sensor_queues = SensorQueues([SENSOR], n=1, m=1, maxsize=2)
+    listener = sensor_queues.listen(SENSOR)
+    feed(sensor_queues, [b"1", b"1", b"1", b"1"])
+    assert queued(listener) == [3, 4]
+    assert listener.overflowed == 2
+    assert sensor_queues.overflowed(SENSOR) == 2
+    assert "A 4/4/0/4/2" in sensor_queues.summary({SENSOR: "A"})
+
+
+def test_malformed_and_untracked_readings():
+    sensor_queues = SensorQueues([SENSOR], n=1, m=1)
+    listener = sensor_queues.listen(SENSOR)
+    feed(sensor_queues, [b"x", b"", b"1"])
+    assert sensor_queues.received[SENSOR] == 3
+    assert sensor_queues.dropped[SENSOR] == 2
+    assert sensor_queues.processed[SENSOR] == 1
+    assert queued(listener) == [3]
+    assert sensor_queues.put_threadsafe("00:00:00:00:00:00", b"1", 0) is False
+
+
+def test_readings_before_bind_are_dropped():
+    sensor_queues = SensorQueues([SENSOR])
+    assert sensor_queues.put_threadsafe(SENSOR, b"1", 0) is True
+    assert sensor_queues.dropped[SENSOR] == 1
@@ -0,0 +1,79 @@
+"""Tests for splitting devices between orchestrator workers (sharding.py)."""
+
+import asyncio
+import pytest
+from mqttLink import MqttLink
+from sharding import SharedState, device_groups, owner, partition
+from transport import InMemoryBroker
+from zoneScheduler import ZoneScheduler
+
+DEVICES = [f"02:00:00:{i >> 16 & 255:02X}:{i >> 8 & 255:02X}:{i & 255:02X}" for i in range(2000)]
+
+
+def assignment(device_ids, workers, resources=None):
+    return {device_id: worker for worker, owned in partition(device_ids, workers, resources).items()
+            for device_id in owned}
+
+
+@pytest.mark.parametrize("workers", [1, 2, 3, 4, 8])
+def test_every_device_has_exactly_one_worker(workers):
+    shares = partition(DEVICES, workers)
+    assert sorted(d for owned in shares.values() for d in owned) == sorted(DEVICES)
+    assert all(len(owned) > 0.6 * len(DEVICES) / workers for owned in shares.values())  # Roughly even
+
+
+def test_assignment_is_deterministic_and_keeps_device_order():
+    assert partition(DEVICES, 4) == partition(list(DEVICES), 4)
+    for owned in partition(DEVICES, 4).values():
+        assert owned == sorted(owned, key=DEVICES.index)
+
+
+@pytest.mark.parametrize("workers", [1, 2, 3, 4, 7])
+def test_adding_a_worker_only_moves_devices_to_it(workers):
+    before = assignment(DEVICES, workers)
+    after = assignment(DEVICES, workers + 1)
+    moved = [d for d in DEVICES if before[d] != after[d]]
+    assert all(after[d] == workers for d in moved)  # Nothing is shuffled between the old workers
+    assert abs(len(moved) / len(DEVICES) - 1 / (workers + 1)) < 0.05  # About 1/(N+1) moves
+
+
+def test_devices_sharing_a_resource_stay_together():
+    resources = {DEVICES[0]: {"fog"}, DEVICES[1]: {"fog", "compressor"}, DEVICES[2]: {"compressor"},
+                 DEVICES[3]: {"scarecrow"}}
+    groups = device_groups(DEVICES[:10], resources)
+    assert groups[DEVICES[0]] == groups[DEVICES[1]] == groups[DEVICES[2]]  # Transitively through DEVICES[1]
+    assert groups[DEVICES[3]] == DEVICES[3]
+    for workers in (2, 3, 5, 8):
+        shares = assignment(DEVICES[:10], workers, resources)
+        assert shares[DEVICES[0]] == shares[DEVICES[1]] == shares[DEVICES[2]]
+        assert shares[DEVICES[0]] == owner(groups[DEVICES[0]], workers)
+
+
+def test_shared_cooldowns_and_zone_locks(run):
+    broker = InMemoryBroker()
+    device = DEVICES[0]
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        workers = []
+        for worker in range(2):
+            link = MqttLink(f"worker{worker}", transport=broker.transport(f"worker{worker}"), log=lambda line: None)
+            shared = SharedState(link, worker, loop, log=lambda line: None)
+            last_run, scheduler = {device: float('-inf')}, ZoneScheduler(60)
+            shared.track(last_run, scheduler, clock=loop.time)
+            link.start()
+            workers.append((shared, last_run, scheduler))
+        (shared0, last_run0, scheduler0), (_, last_run1, scheduler1) = workers
+
+        await asyncio.sleep(100)
+        last_run0[device] = loop.time()
+        shared0.ran(device)
+        assert await scheduler0.acquire("COFFIN", {"coffin-room"})
+        await asyncio.sleep(0)  # Updates from the network side are applied on the loop
+        assert last_run1[device] == pytest.approx(100, abs=1)  # Worker 1 honours worker 0's cooldown
+        assert scheduler1.is_busy("coffin-room")  # and waits for its zone
+
+        scheduler0.release("COFFIN")
+        await asyncio.sleep(0)
+        assert not scheduler1.is_busy("coffin-room")
+    run(main())
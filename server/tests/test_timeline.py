@@ -0,0 +1,93 @@
+"""Tests for the shared timer heap of actuator timelines (timeline.py)."""
+
+import asyncio
+from timeline import Timelines
+
+
+class Recorder:
+    """publish() stand-in that stores (loop time, topic, payload)."""
+
+    def __init__(self):
+        self.sent = []
+
+    def __call__(self, topic, payload):
+        self.sent.append((round(asyncio.get_running_loop().time(), 6), topic, payload))
+
+
+def test_cues_fire_at_their_offsets(run):
+    publish = Recorder()
+    timelines = Timelines(publish, log=lambda line: None)
+
+    async def main():
+        return await timelines.start("PHONE", [(4, "phone", "B8"), (0, "phone", "A11")])
+    assert run(main()) is True
+    assert publish.sent == [(0.0, "phone", "A11"), (4.0, "phone", "B8")]  # Sorted by offset
+    assert timelines.max_drift_ms == 0.0
+
+
+def test_a_stall_does_not_accumulate_drift(run):
+    # A sleep() chain would push every later step back by the stall. Cues are planned from
+    # the timeline's start, so only the cue that was due during the stall is late.
+    publish = Recorder()
+    timelines = Timelines(publish, log=lambda line: None)
+    cues = [(i * 0.5, "fog", str(i)) for i in range(10)]
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        def stall():
+            loop.virtual_time += 0.6  # The loop was blocked for 600 ms, past the 1.5 s cue
+        loop.call_at(1.1, stall)
+        timeline = timelines.start("FOG", cues)
+        await timeline
+        return timeline
+    timeline = run(main())
+    times = [sent[0] for sent in publish.sent]
+    assert times == [0.0, 0.5, 1.0, 1.7, 2.0, 2.5, 3.0, 3.5, 4.0, 4.5]
+    assert [round(drift) for drift in timeline.drifts_ms] == [0, 0, 0, 200, 0, 0, 0, 0, 0, 0]
+    assert round(timelines.max_drift_ms) == 200
+
+
+def test_interleaved_timelines_share_one_heap(run):
+    publish = Recorder()
+    timelines = Timelines(publish, log=lambda line: None)
+
+    async def main():
+        slow = timelines.start("SLOW", [(0, "a", "1"), (10, "a", "2")])
+        await asyncio.sleep(1)
+        fast = timelines.start("FAST", [(0, "b", "1"), (2, "b", "2")])  # Earlier than SLOW's next cue
+        await asyncio.gather(slow, fast)
+    run(main())
+    assert publish.sent == [(0.0, "a", "1"), (1.0, "b", "1"), (3.0, "b", "2"), (10.0, "a", "2")]
+    assert timelines.published == {"a": 2, "b": 2}
+
+
+def test_cancel_skips_remaining_cues(run):
+    publish = Recorder()
+    timelines = Timelines(publish, log=lambda line: None)
+
+    async def main():
+        timeline = timelines.start("COFFIN", [(0, "coffin", "S1"), (5, "coffin", "S2"), (9, "coffin", "S3")])
+        await asyncio.sleep(6)
+        timeline.cancel()
+        await asyncio.sleep(10)
+        return await timeline
+    assert run(main()) is False
+    assert [payload for _, _, payload in publish.sent] == ["S1", "S2"]
+    assert timelines.cancelled == 1
+    assert "0 running" in timelines.summary()
+
+
+def test_publish_error_does_not_stop_the_timeline(run):
+    sent, lines = [], []
+
+    def publish(topic, payload):
+        if payload == "bad":
+            raise OSError("not connected")
+        sent.append(payload)
+    timelines = Timelines(publish, log=lines.append)
+
+    async def main():
+        return await timelines.start("X", [(0, "x", "bad"), (1, "x", "good")])
+    assert run(main()) is True
+    assert sent == ["good"]
+    assert any("Error publishing X cue 1" in line for line in lines)
@@ -0,0 +1,96 @@
+"""Tests for MQTT topic matching and the in-process broker (transport.py)."""
+
+import pytest
+from transport import InMemoryBroker, topic_matches
+
+
+def client(broker, client_id, *topic_filters):
+    """A started transport of the broker that records what it receives as (topic, payload) strings."""
+    transport = broker.transport(client_id)
+    transport.received = []
+    transport.on_message = lambda topic, payload, received_ns: transport.received.append(
+        (topic.decode(), payload.decode()))
+    transport.start()
+    for topic_filter in topic_filters:
+        transport.subscribe(topic_filter)
+    return transport
+
+
+@pytest.mark.parametrize("topic_filter, topic, expected", [
+    ("device/AA/sensor", "device/AA/sensor", True),
+    ("device/AA/sensor", "device/BB/sensor", False),
+    ("device/+/sensor", "device/AA/sensor", True),
+    ("device/+/sensor", "device/AA/actuator", False),
+    ("device/+/sensor", "device/AA/sensor/extra", False),
+    ("device/+", "device", False),
+    ("+/+/sensor", "device/AA/sensor", True),
+    ("device/#", "device/AA/sensor", True),
+    ("device/#", "device/AA", True),
+    ("device/#", "device", True),  # "#" also matches its parent level
+    ("device/#", "devices/AA", False),
+    ("#", "device/AA/sensor", True),
+    ("device/AA/sensor/#", "device/AA/sensor", True),
+])
+def test_topic_matches(topic_filter, topic, expected):
+    assert topic_matches(topic_filter, topic) is expected
+
+
+@pytest.mark.parametrize("topic_filter, expected", [("#", False), ("+/broker/uptime", False),
+                                                     ("$SYS/#", True), ("$SYS/+/uptime", True)])
+def test_dollar_topics_need_an_explicit_first_level(topic_filter, expected):
+    assert topic_matches(topic_filter, "$SYS/broker/uptime") is expected
+
+
+def test_publish_reaches_matching_subscribers_once():
+    broker = InMemoryBroker()
+    overlapping = client(broker, "overlapping", "device/+/sensor", "device/#")
+    actuators = client(broker, "actuators", "device/+/actuator")
+    publisher = client(broker, "publisher")
+    assert publisher.publish("device/AA/sensor", "1") is True
+    assert overlapping.received == [("device/AA/sensor", "1")]  # Once, though two of its filters match
+    assert actuators.received == []
+    assert (broker.published, broker.delivered) == (1, 1)
+
+
+def test_retained_message_is_delivered_on_subscribe():
+    broker = InMemoryBroker()
+    publisher = client(broker, "publisher")
+    publisher.publish("coordination/cooldown/AA", "12.5", retain=True)
+    publisher.publish("coordination/cooldown/BB", "3", retain=False)
+    late = client(broker, "late", "coordination/#")
+    assert late.received == [("coordination/cooldown/AA", "12.5")]
+
+
+def test_empty_retained_payload_clears_it():
+    broker = InMemoryBroker()
+    publisher = client(broker, "publisher")
+    publisher.publish("coordination/zone/fog", "worker0", retain=True)
+    publisher.publish("coordination/zone/fog", "", retain=True)
+    late = client(broker, "late", "coordination/#")
+    assert late.received == []
+    assert "0 retained" in broker.summary()
+
+
+def test_unsubscribe_stops_delivery():
+    broker = InMemoryBroker()
+    subscriber = client(broker, "subscriber", "device/+/sensor", "device/AA/#")
+    publisher = client(broker, "publisher")
+    subscriber.unsubscribe("device/+/sensor")
+    publisher.publish("device/AA/sensor", "1")  # Still matched by the other filter
+    publisher.publish("device/BB/sensor", "1")
+    assert subscriber.received == [("device/AA/sensor", "1")]
+    subscriber.unsubscribe("device/AA/#")
+    publisher.publish("device/AA/sensor", "0")
+    assert subscriber.received == [("device/AA/sensor", "1")]
+
+
+def test_stopped_transport_neither_receives_nor_publishes():
+    broker = InMemoryBroker()
+    subscriber = client(broker, "subscriber", "device/#")
+    publisher = client(broker, "publisher")
+    subscriber.stop()
+    publisher.publish("device/AA/sensor", "1")
+    assert subscriber.received == []
+    assert subscriber.publish("device/AA/actuator", "X1") is False
+    assert subscriber.publish_failures == 1
+    assert broker.published == 1
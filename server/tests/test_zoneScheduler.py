@@ -0,0 +1,108 @@
+"""Tests for the zone-aware prop scheduler (zoneScheduler.py)."""
+
+import asyncio
+from zoneScheduler import ZoneScheduler
+
+
+async def run_prop(scheduler, name, resources, seconds, started, priority=0, delay=0.0):
+    """Request resources after delay, hold them for seconds, and log (name, start time) to started."""
+    await asyncio.sleep(delay)
+    if not await scheduler.acquire(name, resources, priority):
+        return False
+    started.append((name, asyncio.get_running_loop().time()))
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        scheduler.release(name)
+    return True
+
+
+def test_disjoint_zones_run_together(run):
+    scheduler, started = ZoneScheduler(15), []
+
+    async def main():
+        await asyncio.gather(run_prop(scheduler, "COFFIN", {"coffin-room"}, 10, started),
+                             run_prop(scheduler, "SCARECROW", {"scarecrow"}, 10, started))
+    run(main())
+    assert started == [("COFFIN", 0.0), ("SCARECROW", 0.0)]
+
+
+def test_waiters_run_by_priority_then_arrival(run):
+    scheduler, started = ZoneScheduler(60), []
+
+    async def main():
+        await asyncio.gather(
+            run_prop(scheduler, "HOLDER", {"fog"}, 10, started),
+            run_prop(scheduler, "LOW", {"fog"}, 1, started, priority=0, delay=1),
+            run_prop(scheduler, "HIGH", {"fog"}, 1, started, priority=2, delay=2),
+            run_prop(scheduler, "LOW2", {"fog"}, 1, started, priority=0, delay=3),
+        )
+    run(main())
+    assert started == [("HOLDER", 0.0), ("HIGH", 10.0), ("LOW", 11.0), ("LOW2", 12.0)]
+
+
+def test_stale_request_gives_up(run):
+    scheduler, started = ZoneScheduler(15), []
+
+    async def main():
+        return await asyncio.gather(run_prop(scheduler, "HOLDER", {"fog"}, 20, started),
+                                    run_prop(scheduler, "LATE", {"fog"}, 1, started, delay=1))
+    assert run(main()) == [True, False]
+    assert started == [("HOLDER", 0.0)]
+    assert scheduler.expired == {"LATE": 1}
+    assert scheduler.holders == {}
+
+
+def test_waiting_request_reserves_its_resources(run):
+    # HIGH needs fog and compressor; fog is busy. A lower-priority prop that only needs the
+    # compressor must not take it in the meantime, or HIGH could be starved indefinitely.
+    scheduler, started = ZoneScheduler(60), []
+
+    async def main():
+        await asyncio.gather(
+            run_prop(scheduler, "HOLDER", {"fog"}, 10, started),
+            run_prop(scheduler, "HIGH", {"fog", "compressor"}, 5, started, priority=2, delay=1),
+            run_prop(scheduler, "LOW", {"compressor"}, 1, started, priority=0, delay=2),
+        )
+    run(main())
+    assert started == [("HOLDER", 0.0), ("HIGH", 10.0), ("LOW", 15.0)]
+
+
+def test_same_prop_cannot_run_twice(run):
+    scheduler = ZoneScheduler(15)
+
+    async def main():
+        assert await scheduler.acquire("COFFIN", {"coffin-room"})
+        assert await scheduler.acquire("COFFIN", {"coffin-room"}) is False
+        scheduler.release("COFFIN")
+        assert await scheduler.acquire("COFFIN", {"coffin-room"})
+    run(main())
+
+
+def test_outside_hold_blocks_local_props_and_is_not_reported(run):
+    scheduler, started, changes = ZoneScheduler(60), [], []
+    scheduler.on_change = lambda name, resources, held: changes.append((name, set(resources), held))
+
+    async def main():
+        scheduler.hold("worker1:fog", {"fog"})
+        asyncio.get_running_loop().call_later(5, scheduler.release, "worker1:fog")
+        await run_prop(scheduler, "LOCAL", {"fog"}, 1, started)
+    run(main())
+    assert started == [("LOCAL", 5.0)]
+    assert changes == [("LOCAL", {"fog"}, True), ("LOCAL", {"fog"}, False)]  # Only local grants and releases
+
+
+def test_cancelled_waiter_frees_its_reservation(run):
+    scheduler, started = ZoneScheduler(60), []
+
+    async def main():
+        holder = asyncio.ensure_future(run_prop(scheduler, "HOLDER", {"fog"}, 10, started))
+        waiter = asyncio.ensure_future(run_prop(scheduler, "HIGH", {"fog", "compressor"}, 1, started, priority=5))
+        await asyncio.sleep(1)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        await run_prop(scheduler, "LOW", {"compressor"}, 1, started)  # Not blocked by the cancelled reservation
+        await holder
+    run(main())
+    assert started == [("HOLDER", 0.0), ("LOW", 1.0)]
+    assert scheduler.holders == {}
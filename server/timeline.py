@@ -0,0 +1,154 @@
+"""
+Monotonic-clock timelines for multi-step actuator sequences.
+
+A scene like "A11, wait 4 s, B8" used to be written as publish_event()
+calls separated by await asyncio.sleep(), which lets every step's error
+accumulate and can't be stopped halfway. Here a timeline is a list of
+(offset_seconds, topic, payload) cues that are all scheduled up front
+against the event loop's monotonic clock (time.monotonic() on CPython).
+Every running timeline shares one timer heap and one pending loop timer,
+a timeline can be cancelled at any point, and each cue's drift from its
+planned time is measured and logged.
+
+Usage:
+    timelines = Timelines(client.publish, log)
+    phone = timelines.start("PHONE", [
+        (0, f"device/{PROP6}/actuator", "A11"),
+        (4, f"device/{PROP6}/actuator", "B8"),
+    ])
+    await phone  # Finishes after the last cue (or when cancelled)
+    phone.cancel()  # Drop any cues that have not fired yet
+    log(timelines.summary())
+"""
+
+import asyncio
+import heapq
+import itertools
+
+
+class Timeline:
+    """One started sequence of cues; await it to wait for the last cue."""
+
+    def __init__(self, owner, name, cues, start, future):
+        self.name = name
+        self.cues = sorted(cues, key=lambda cue: cue[0])
+        self.start = start  # Monotonic time that offset 0 maps to
+        self.fired = 0  # Cues published so far
+        self.drifts_ms = []  # Actual minus planned time of each fired cue
+        self.cancelled = False
+        self._owner = owner
+        self._future = future
+
+    @property
+    def done(self):
+        return self._future.done()
+
+    def cancel(self):
+        """Stop the timeline; cues that have not fired yet are skipped."""
+        if not self._future.done():
+            self.cancelled = True
+            self._owner.cancelled += 1
+            self._future.set_result(False)  # Its remaining cues are dropped from the heap lazily
+
+    def __await__(self):
+        """Resolves to True when every cue fired, False if the timeline was cancelled."""
+        return self._future.__await__()
+
+
+class Timelines:
+    """Runs every timeline's cues off a single timer heap on the event loop."""
+
+    def __init__(self, publish, log=print, topics=()):
+        """
+        Args:
+            publish: Called as publish(topic, payload) for each cue
+            log: Called with one line per fired cue
+            topics: Topics to preallocate publish counters for (others are added on first use)
+        """
+        self.publish = publish
+        self.log = log
+        self.fired = 0  # Cues published by all timelines
+        self.published = dict.fromkeys(topics, 0)  # Cues published per topic
+        self.cancelled = 0  # Timelines cancelled before their last cue
+        self.max_drift_ms = 0.0  # Worst cue drift seen
+        self._heap = []  # (due, seq, timeline, cue index)
+        self._seq = itertools.count()
+        self._timer = None  # The one pending loop.call_at handle
+        self._timer_due = None
+        self._running = set()
+
+    def start(self, name, cues, delay=0.0):
+        """
+        Schedule a list of cues.
+
+        Args:
+            name: Label for logs
+            cues: List of (offset_seconds, topic, payload)
+            delay: Seconds from now that offset 0 maps to
+
+        Returns:
+            The running Timeline
+        """
+        loop = asyncio.get_running_loop()
+        timeline = Timeline(self, name, cues, loop.time() + delay, loop.create_future())
+        if not timeline.cues:
+            timeline._future.set_result(True)
+            return timeline
+
+        for index, (offset, _, _) in enumerate(timeline.cues):
+            heapq.heappush(self._heap, (timeline.start + offset, next(self._seq), timeline, index))
+        self._running.add(timeline)
+        timeline._future.add_done_callback(lambda _: self._running.discard(timeline))
+        self._arm(loop)
+        return timeline
+
+    def cancel_all(self):
+        """Cancel every running timeline (e.g. on shutdown)."""
+        for timeline in list(self._running):
+            timeline.cancel()
+
+    def _arm(self, loop):
+        """Make sure the loop timer is set for the earliest cue in the heap."""
+        while self._heap and self._heap[0][2].done:
+            heapq.heappop(self._heap)  # Cancelled timelines' cues
+        if not self._heap:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = self._timer_due = None
+            return
+        due = self._heap[0][0]
+        if self._timer is not None and self._timer_due <= due:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = loop.call_at(due, self._fire, loop)
+        self._timer_due = due
+
+    def _fire(self, loop):
+        """Publish every cue that is due, then re-arm for the next one."""
+        self._timer = self._timer_due = None
+        while self._heap and self._heap[0][0] <= loop.time():
+            due, _, timeline, index = heapq.heappop(self._heap)
+            if timeline.done:
+                continue
+            _, topic, payload = timeline.cues[index]
+            drift_ms = (loop.time() - due) * 1000
+            try:
+                self.publish(topic, payload)
+            except Exception as e:
+                self.log(f"Error publishing {timeline.name} cue {index + 1}: {e}")
+            timeline.fired += 1
+            timeline.drifts_ms.append(drift_ms)
+            self.fired += 1
+            self.published[topic] = self.published.get(topic, 0) + 1
+            self.max_drift_ms = max(self.max_drift_ms, drift_ms)
+            self.log(f"Published event: {payload} to topic {topic} "
+                     f"({timeline.name} cue {index + 1}/{len(timeline.cues)}, drift {drift_ms:+.1f} ms)")
+            if timeline.fired == len(timeline.cues):
+                timeline._future.set_result(True)
+        self._arm(loop)
+
+    def summary(self):
+        """One human-readable line with cue counts and the worst drift."""
+        return (f"Timelines: {self.fired} cue(s) fired, {len(self._running)} running, "
+                f"{self.cancelled} cancelled, max drift {self.max_drift_ms:.1f} ms")
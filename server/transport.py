@@ -0,0 +1,343 @@
+"""
+Pluggable MQTT transports for MqttLink.
+
+MqttLink only needs a small interface from its connection: start and stop
+it, subscribe to (and unsubscribe from) a filter, publish, and be called back when it connects,
+when a subscription is acknowledged, when the connection drops and when a
+message arrives. Two transports implement it:
+
+PahoTransport is the real network client. It runs the paho loop on its own
+thread and reconnects with exponential backoff plus full jitter. Publishes
+are QoS 0, so paho does not queue them while the connection is down: a cue
+published during an outage is dropped, logged and counted in
+publish_failures.
+
+InMemoryBroker is an in-process pub/sub broker with MQTT topic matching
+(+ and # wildcards, retained messages). Its transports deliver a publish
+synchronously on the publisher's thread, so the orchestrator, the capture
+tool and the load generator can run without the house network, with zero
+network overhead, and be profiled in isolation.
+
+Callbacks may run on any thread (paho's network thread, or whichever
+thread published to the in-memory broker). Topics are passed to on_message
+as raw bytes and payloads as bytes, as paho delivers them.
+
+Usage:
+    transport = PahoTransport("server_house", MQTT_BROKER)  # Real broker (MqttLink's default)
+
+    broker = InMemoryBroker()                                # Everything in this process
+    link = MqttLink("server_house", transport=broker.transport("server_house"))
+    sensor = broker.transport("fake_sensor").start()
+    sensor.publish(f"device/{PROP5}/sensor", "1")
+"""
+
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+import paho.mqtt.client as mqtt
+from paho.mqtt.client import CallbackAPIVersion
+
+RECONNECT_BASE_SECONDS = 0.5  # First reconnect waits up to this long
+RECONNECT_MAX_SECONDS = 30.0  # Backoff cap
+KEEPALIVE_SECONDS = 10  # Broker ping interval, also bounds how long a dead connection goes unnoticed
+
+
+def backoff_delay(attempt, base=RECONNECT_BASE_SECONDS, cap=RECONNECT_MAX_SECONDS):
+    """Exponential backoff with full jitter: uniform between 0 and min(cap, base * 2^attempt)."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def topic_matches(topic_filter, topic):
+    """
+    MQTT topic matching.
+
+    Args:
+        topic_filter: Subscription filter, e.g. "device/+/sensor" or "device/#"
+        topic: Topic a message was published to
+
+    Returns:
+        True if the filter matches the topic. As in MQTT, a wildcard in the
+        first level doesn't match topics starting with "$".
+    """
+    if topic.startswith("$") and topic_filter[:1] in ("+", "#"):
+        return False
+    filter_levels = topic_filter.split("/")
+    topic_levels = topic.split("/")
+    for i, level in enumerate(filter_levels):
+        if level == "#":
+            return True  # Also matches the parent level itself ("device/#" matches "device")
+        if i >= len(topic_levels) or (level != "+" and level != topic_levels[i]):
+            return False
+    return len(filter_levels) == len(topic_levels)
+
+
+def raw_topic(message):
+    """
+    The topic of a paho MQTTMessage as the bytes that were received, without decoding it.
+
+    MQTTMessage.topic decodes (and validates) UTF-8 on every access. The raw bytes are
+    in the private _topic attribute, which paho-mqtt 1.6 through 2.1 set. If a later
+    paho drops it, this falls back to encoding .topic, which is slower but still correct.
+    """
+    topic = getattr(message, "_topic", None)
+    return topic if isinstance(topic, bytes) else message.topic.encode()
+
+
+def _as_bytes(payload):
+    """Encode a payload the way paho does: str as UTF-8, numbers as their text, None as empty."""
+    if payload is None:
+        return b""
+    if isinstance(payload, (bytes, bytearray)):
+        return bytes(payload)
+    if isinstance(payload, str):
+        return payload.encode()
+    return str(payload).encode()
+
+
+class Transport(ABC):
+    """What MqttLink needs from a connection. Subclasses must implement start, stop, (un)subscribe and publish."""
+
+    def __init__(self, client_id):
+        self.client_id = client_id
+        self.address = "in-process"  # Where the broker is, for log lines
+        self.on_connect = lambda: None  # After every (re)connect, before any subscription is restored
+        self.on_subscribed = lambda topic_filter: None  # The broker acknowledged a subscribe()
+        self.on_disconnect = lambda: None  # The connection dropped (may be called more than once)
+        self.on_message = lambda topic, payload, received_ns: None  # Raw topic bytes, payload bytes
+        self.publish_failures = 0  # Publishes dropped because the transport wasn't connected
+
+    @abstractmethod
+    def start(self):
+        """Connect (in the background for network transports) and return self."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def stop(self):
+        """Disconnect for good."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def subscribe(self, topic_filter):
+        """Subscribe; on_subscribed(topic_filter) is called once the broker acknowledges it."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def unsubscribe(self, topic_filter):
+        """Stop receiving messages that only this filter matched."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def publish(self, topic, payload, retain=False):
+        """Publish from any thread; returns False (and counts a publish failure) if it was dropped."""
+        raise NotImplementedError
+
+
+class PahoTransport(Transport):
+    """One paho client with self-managed reconnects on a network thread."""
+
+    def __init__(self, client_id, broker, port=1883, log=print):
+        super().__init__(client_id)
+        self.broker = broker
+        self.port = port
+        self.address = broker
+        self.log = log
+        self.client = mqtt.Client(CallbackAPIVersion.VERSION2, client_id=client_id)
+        self.client.on_connect = self._on_connect
+        self.client.on_subscribe = self._on_subscribe
+        self.client.on_disconnect = self._on_disconnect
+        self.client.on_message = self._on_message
+        self._pending = {}  # Subscribe message ID -> topic filter
+        self._attempt = 0  # Failed connects in a row; reset once the broker accepts us
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the network thread; it connects (retrying until the broker answers) in the background."""
+        self._thread = threading.Thread(target=self._run, daemon=True, name="mqtt")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Disconnect and stop the network thread."""
+        self._stop.set()
+        try:
+            self.client.disconnect()
+        except Exception:
+            pass
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+
+    def subscribe(self, topic_filter):
+        _, mid = self.client.subscribe(topic_filter)
+        self._pending[mid] = topic_filter
+
+    def unsubscribe(self, topic_filter):
+        self.client.unsubscribe(topic_filter)
+
+    def publish(self, topic, payload, retain=False):
+        """
+        Publish from any thread at QoS 0.
+
+        paho only queues QoS 1 and 2 messages while disconnected, so a QoS 0 publish during
+        an outage fails with MQTT_ERR_NO_CONN and is lost. It is logged and counted instead
+        of being retried: a prop cue that arrives seconds late would be worse than none.
+
+        Returns:
+            True if the message was handed to the network
+        """
+        rc = self.client.publish(topic, payload, retain=retain).rc
+        if rc == mqtt.MQTT_ERR_SUCCESS:
+            return True
+        self.publish_failures += 1
+        self.log(f"MQTT publish of {payload!r} to {topic} dropped ({mqtt.error_string(rc)})")
+        return False
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.client.connect(self.broker, self.port, keepalive=KEEPALIVE_SECONDS)
+            except OSError as e:
+                delay = backoff_delay(self._attempt)
+                self._attempt += 1
+                self.log(f"MQTT connect to {self.broker} failed ({e}), retrying in {delay:.1f}s")
+                self._stop.wait(delay)
+                continue
+
+            # The backoff only resets in _on_connect: a broker that accepts TCP and then drops
+            # the connection before CONNACK would otherwise be retried in a tight loop
+            rc = mqtt.MQTT_ERR_SUCCESS
+            while not self._stop.is_set() and rc == mqtt.MQTT_ERR_SUCCESS:
+                rc = self.client.loop(timeout=1.0)
+            if self._stop.is_set():
+                break
+
+            self.on_disconnect()
+            delay = backoff_delay(self._attempt)
+            self._attempt += 1
+            self.log(f"MQTT connection lost ({mqtt.error_string(rc)}), reconnecting in {delay:.1f}s")
+            self._stop.wait(delay)
+
+    def _on_connect(self, client, userdata, flags, reason_code, properties=None):
+        if reason_code.is_failure:
+            self.log(f"MQTT broker refused the connection: {reason_code}")
+            return
+        self._attempt = 0
+        self._pending.clear()
+        self.on_connect()
+
+    def _on_subscribe(self, client, userdata, mid, reason_codes, properties=None):
+        topic_filter = self._pending.pop(mid, None)
+        if topic_filter is not None:
+            self.on_subscribed(topic_filter)
+
+    def _on_disconnect(self, client, userdata, flags, reason_code, properties=None):
+        self.on_disconnect()
+
+    def _on_message(self, client, userdata, message, properties=None):
+        # Stamp receipt for latency tracking; the raw topic bytes skip paho's decode
+        self.on_message(raw_topic(message), message.payload, time.monotonic_ns())
+
+
+class InMemoryBroker:
+    """In-process MQTT-style broker: wildcard subscriptions and retained messages, no network."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = []  # (topic filter, transport)
+        self._matches = {}  # Topic -> transports subscribed to it, rebuilt lazily after (un)subscribes
+        self._retained = {}  # Topic -> payload bytes
+        self.published = 0
+        self.delivered = 0
+
+    def transport(self, client_id):
+        """A new client of this broker (call start() on it to connect)."""
+        return InMemoryTransport(self, client_id)
+
+    def _subscribe(self, transport, topic_filter):
+        with self._lock:
+            if (topic_filter, transport) not in self._subscriptions:
+                self._subscriptions.append((topic_filter, transport))
+                self._matches.clear()
+            retained = [(topic, payload) for topic, payload in self._retained.items()
+                        if topic_matches(topic_filter, topic)]
+        transport.on_subscribed(topic_filter)
+        # As on a real broker, a new subscription receives the matching retained messages
+        for topic, payload in retained:
+            transport._deliver(topic.encode(), payload, time.monotonic_ns())
+
+    def _unsubscribe(self, transport, topic_filter):
+        with self._lock:
+            if (topic_filter, transport) in self._subscriptions:
+                self._subscriptions.remove((topic_filter, transport))
+                self._matches.clear()
+
+    def _disconnect(self, transport):
+        with self._lock:
+            self._subscriptions = [(f, t) for f, t in self._subscriptions if t is not transport]
+            self._matches.clear()
+
+    def _subscribers(self, topic):
+        subscribers = self._matches.get(topic)
+        if subscribers is None:
+            # One entry per transport even if several of its filters match, like a broker with overlapping subscriptions
+            subscribers = tuple(dict.fromkeys(t for f, t in self._subscriptions if topic_matches(f, topic)))
+            self._matches[topic] = subscribers
+        return subscribers
+
+    def _publish(self, topic, payload, retain):
+        payload = _as_bytes(payload)
+        with self._lock:
+            if retain:
+                if payload:
+                    self._retained[topic] = payload
+                else:
+                    self._retained.pop(topic, None)  # An empty retained message clears it
+            subscribers = self._subscribers(topic)
+            self.published += 1
+            self.delivered += len(subscribers)
+        if subscribers:
+            raw_topic = topic.encode()
+            received_ns = time.monotonic_ns()
+            for transport in subscribers:
+                transport._deliver(raw_topic, payload, received_ns)
+
+    def summary(self):
+        """One human-readable line with the broker's counters."""
+        return (f"In-memory broker: {self.published} publish(es), {self.delivered} deliveries, "
+                f"{len(self._subscriptions)} subscription(s), {len(self._retained)} retained")
+
+
+class InMemoryTransport(Transport):
+    """Client of an InMemoryBroker. Publishes are delivered synchronously on the publisher's thread."""
+
+    def __init__(self, broker, client_id):
+        super().__init__(client_id)
+        self.broker = broker
+        self.connected = False
+
+    def start(self):
+        self.connected = True
+        self.on_connect()
+        return self
+
+    def stop(self):
+        self.connected = False
+        self.broker._disconnect(self)
+
+    def subscribe(self, topic_filter):
+        self.broker._subscribe(self, topic_filter)
+
+    def unsubscribe(self, topic_filter):
+        self.broker._unsubscribe(self, topic_filter)
+
+    def publish(self, topic, payload, retain=False):
+        if not self.connected:
+            self.publish_failures += 1
+            return False
+        self.broker._publish(topic, payload, retain)
+        return True
+
+    def _deliver(self, topic, payload, received_ns):
+        if self.connected:
+            self.on_message(topic, payload, received_ns)
@@ -0,0 +1,177 @@
+"""
+Zone-aware scheduling of props that share physical resources.
+
+Each prop declares the zones/resources it uses while it runs (its room, the
+air compressor, the fog machine, a speaker group). Props whose resources
+don't overlap run at the same time; a prop that needs a busy resource waits
+in a priority queue (higher priority first, then first come first served)
+and gives up once its request is older than the staleness timeout, because
+by then the visitors who triggered it have moved on.
+
+A waiting request reserves the resources it needs, so a stream of
+lower-priority props can't starve it by grabbing them one at a time.
+
+Resources held outside this scheduler (by another orchestrator worker, see
+sharding.py) are entered with hold() and freed with release(). Local props
+queue behind them like behind any running prop. on_change is told about
+every local grant and release, so they can be shared with other workers.
+
+Usage:
+    scheduler = ZoneScheduler(stale_seconds=15)
+
+    if await scheduler.acquire("COFFIN", {"coffin-room", "compressor"}, priority=1):
+        try:
+            await timelines.start("Coffin", cues)
+        finally:
+            scheduler.release("COFFIN")
+
+    log(scheduler.summary())
+"""
+
+import asyncio
+import itertools
+
+STALE_SECONDS = 15.0  # A request still waiting after this long is dropped
+
+
+class _Request:
+    __slots__ = ('name', 'resources', 'priority', 'seq', 'queued_at', 'future')
+
+    def __init__(self, name, resources, priority, seq, queued_at, future):
+        self.name = name
+        self.resources = resources
+        self.priority = priority
+        self.seq = seq
+        self.queued_at = queued_at
+        self.future = future
+
+    def __lt__(self, other):
+        return (-self.priority, self.seq) < (-other.priority, other.seq)
+
+
+class ZoneScheduler:
+    """Grants props exclusive use of their declared resources, queueing conflicts by priority."""
+
+    def __init__(self, stale_seconds=STALE_SECONDS):
+        self.stale_seconds = stale_seconds
+        self.on_change = None  # Called as on_change(name, resources, held) for every local grant and release
+        self.holders = {}  # Prop name -> frozenset of resources it holds
+        self.granted = {}  # Prop name -> runs started
+        self.expired = {}  # Prop name -> requests dropped as stale
+        self.waited = {}  # Prop name -> total seconds spent queued before running
+        self._busy = set()  # Resources currently held
+        self._waiting = []  # Queued _Requests (ordered by priority when dispatching)
+        self._seq = itertools.count()
+        self._outside = set()  # Holder names entered with hold()
+
+    def acquire(self, name, resources, priority=0, stale_seconds=None):
+        """
+        Request a prop's resources.
+
+        Args:
+            name: Prop name (one run per name at a time)
+            resources: Iterable of resource/zone names the prop needs
+            priority: Higher runs first when requests conflict
+            stale_seconds: Override the scheduler's staleness timeout for this request
+
+        Returns:
+            Awaitable that resolves to True once the resources are held (call release()
+            when done), or False if the request went stale or the prop is already running
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if name in self.holders:
+            future.set_result(False)
+            return future
+
+        request = _Request(name, frozenset(resources), priority, next(self._seq), loop.time(), future)
+        self._waiting.append(request)
+        self._dispatch()
+        if future.done():
+            return future
+        return self._wait(request, self.stale_seconds if stale_seconds is None else stale_seconds)
+
+    async def _wait(self, request, stale_seconds):
+        try:
+            return await asyncio.wait_for(asyncio.shield(request.future), stale_seconds)
+        except asyncio.TimeoutError:
+            if request.future.done():
+                return request.future.result()  # Granted just as the timeout fired
+            request.future.cancel()
+            self.expired[request.name] = self.expired.get(request.name, 0) + 1
+            self._dispatch()  # Its reservation no longer blocks anyone
+            return False
+        except asyncio.CancelledError:
+            # The waiting task was cancelled; don't leave resources held by nobody
+            if request.future.done() and not request.future.cancelled():
+                self.release(request.name)
+            else:
+                request.future.cancel()
+                self._dispatch()
+            raise
+
+    def hold(self, name, resources):
+        """
+        Mark resources as held by someone outside this scheduler until release(name).
+
+        Args:
+            name: Holder name, distinct from every local prop name
+            resources: Iterable of resource/zone names
+        """
+        self.holders[name] = frozenset(resources)
+        self._outside.add(name)
+        self._busy |= self.holders[name]
+
+    def release(self, name):
+        """Free a prop's resources and start whichever waiting props can now run."""
+        resources = self.holders.pop(name, None)
+        if resources is None:
+            return
+        # Rebuilt rather than subtracted: an outside hold() may overlap a local holder
+        self._busy = set().union(*self.holders.values())
+        if name in self._outside:
+            self._outside.discard(name)
+        elif self.on_change is not None:
+            self.on_change(name, resources, False)
+        self._dispatch()
+
+    def _dispatch(self):
+        """Grant waiting requests in priority order while their resources are free."""
+        now = asyncio.get_running_loop().time()
+        reserved = set()  # Resources wanted by a higher-priority request that has to keep waiting
+        still_waiting = []
+        for request in sorted(self._waiting):
+            if request.future.done():
+                continue  # Expired
+            if self._busy.isdisjoint(request.resources) and reserved.isdisjoint(request.resources):
+                self._busy |= request.resources
+                self.holders[request.name] = request.resources
+                self.granted[request.name] = self.granted.get(request.name, 0) + 1
+                self.waited[request.name] = self.waited.get(request.name, 0.0) + now - request.queued_at
+                request.future.set_result(True)
+                if self.on_change is not None:
+                    self.on_change(request.name, request.resources, True)
+            else:
+                reserved |= request.resources
+                still_waiting.append(request)
+        self._waiting = still_waiting
+
+    def is_busy(self, resource):
+        """Return True if a running prop holds the resource."""
+        return resource in self._busy
+
+    def summary(self, labels=None):
+        """
+        One human-readable line with runs, stale drops and average wait per prop.
+
+        Args:
+            labels: Optional {name: label} used instead of the prop names
+        """
+        labels = labels or {}
+        parts = []
+        for name in sorted(set(self.granted) | set(self.expired), key=str):
+            runs = self.granted.get(name, 0)
+            average_wait = self.waited.get(name, 0.0) / runs if runs else 0.0
+            parts.append(f"{labels.get(name, name)} {runs} run(s)/{self.expired.get(name, 0)} stale/"
+                         f"{average_wait:.1f}s avg wait")
+        return "Scheduler: " + (", ".join(parts) if parts else "no requests")